@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from accounts.models import Profile
+from accounts.models import OutboxEmail, Profile
 
 
 admin.site.register(Profile)
+admin.site.register(OutboxEmail)
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.utils.translation import ugettext as _
+from rest_framework import exceptions
+from rest_framework_jwt.authentication import (
+    JSONWebTokenAuthentication, jwt_get_username_from_payload,
+)
+
+from accounts.cache import user_cache
+
+
+class CachedJSONWebTokenAuthentication(JSONWebTokenAuthentication):
+    """
+    JSON Web Token authentication that reads the user, and its profile,
+    from the user cache instead of the database when it can
+
+    A cached user is only used for the username its token was issued for,
+    so a renamed user falls back to the database like any cache miss, and
+    only while it is active.
+    """
+
+    def authenticate_credentials(self, payload):
+        user_id = payload.get('user_id')
+        username = jwt_get_username_from_payload(payload)
+        if user_id is None or not username:
+            return super(
+                CachedJSONWebTokenAuthentication, self
+            ).authenticate_credentials(payload)
+
+        user = user_cache.get(user_id)
+        if user is not None and user.username == username:
+            if not user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User account is disabled.'))
+            return user
+
+        try:
+            user = User.objects.select_related('profile').get(
+                id=user_id, username=username)
+        except User.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid signature.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User account is disabled.'))
+        user_cache.set(user)
+        return user
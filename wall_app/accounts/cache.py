@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.cache import caches
+
+
+class UserCache(object):
+    """
+    Caches active users, with their profile, by user id
+
+    Entries expire after the timeout of the cache and are dropped with
+    invalidate() whenever the user or profile changes in a way requests
+    must see at once: a profile update or deletion, an activation or a
+    change of the post counter.
+    """
+    KEY = 'auth:user:{user_id}'
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, user_id):
+        """Returns the cached user with the given id, or None"""
+        return self.cache.get(self.KEY.format(user_id=user_id))
+
+    def set(self, user):
+        """Caches a user and the profile loaded with it"""
+        self.cache.set(self.KEY.format(user_id=user.id), user)
+
+    def invalidate(self, user_id):
+        """Drops the cached user with the given id"""
+        self.cache.delete(self.KEY.format(user_id=user_id))
+
+    def invalidate_many(self, user_ids):
+        """Drops the cached users with the given ids"""
+        self.cache.delete_many(
+            [self.KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+user_cache = UserCache(settings.USER_CACHE_ALIAS)
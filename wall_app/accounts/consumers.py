@@ -0,0 +1,19 @@
+from django.conf import settings
+
+from accounts.mail import get_next_attempt_delay, send_pending, wake_worker
+
+
+def send_outbox(message):
+    """
+    Worker consumer sending a batch of the due emails of the outbox
+
+    A full batch may have left more emails due, so the worker is woken up
+    again straight away; after failures it is woken up when the next
+    retry is due.
+    """
+    batch_size = settings.OUTBOX_BATCH_SIZE
+    num_sent, num_failed = send_pending(batch_size)
+    if num_sent + num_failed == batch_size:
+        wake_worker()
+    elif num_failed:
+        wake_worker(get_next_attempt_delay())
@@ -0,0 +1,169 @@
+"""
+Outbox of the emails the app sends
+
+Views queue emails with queue_email(); the outbox worker consumer, or the
+drain_outbox command, sends them with send_pending() through the transport
+named by the EMAIL_TRANSPORT setting, so no request waits on the mail
+provider.
+"""
+from datetime import timedelta
+
+from channels import Channel
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+import sendgrid
+from sendgrid.helpers.mail import Content, Email, Mail
+
+from accounts.models import OutboxEmail
+
+
+FROM_EMAIL = 'admin@wallie.com'
+
+# Emails sent by LocmemTransport, for tests and offline runs
+outbox = []
+
+
+class SendGridTransport(object):
+    """Sends emails as HTML through the SendGrid API"""
+
+    def __init__(self):
+        self.client = sendgrid.SendGridAPIClient(
+            apikey=settings.SENDGRID_API_KEY)
+
+    def send(self, email):
+        mail = Mail(
+            Email(FROM_EMAIL), email.subject, Email(email.to_email),
+            Content('text/html', email.body))
+        self.client.client.mail.send.post(request_body=mail.get())
+
+
+class LocmemTransport(object):
+    """Keeps emails in accounts.mail.outbox instead of sending them"""
+
+    def send(self, email):
+        outbox.append(email)
+
+
+def get_transport():
+    """Returns an instance of the transport set by EMAIL_TRANSPORT"""
+    return import_string(settings.EMAIL_TRANSPORT)()
+
+
+def queue_email(to_email, subject, body):
+    """
+    Stores an email in the outbox and wakes the worker up once the
+    current transaction commits
+
+    Args:
+        to_email -- the address of the recipient
+        subject -- the subject of the email
+        body -- the HTML body of the email
+    Returns:
+        the queued OutboxEmail
+    """
+    email = OutboxEmail.objects.create(
+        to_email=to_email, subject=subject, body=body)
+    transaction.on_commit(wake_worker)
+    return email
+
+
+def wake_worker(delay=None):
+    """
+    Asks the outbox worker to send the emails that are due
+
+    Args:
+        delay -- seconds to wait first, through the delay server
+    """
+    if delay is None:
+        Channel(settings.OUTBOX_CHANNEL_NAME).send({})
+        return
+    Channel('asgi.delay').send({
+        'channel': settings.OUTBOX_CHANNEL_NAME,
+        'content': {},
+        'delay': int(delay * 1000),
+    })
+
+
+def get_retry_delay(attempts):
+    """Returns the seconds to wait after the given number of failed
+    attempts"""
+    return settings.OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def claim_due_emails(batch_size):
+    """
+    Returns up to batch_size due emails, leased to the caller
+
+    The emails are pushed out of reach of other workers for a while, so
+    no email is sent twice. The worker is also asked to wake up once the
+    lease runs out, so an email whose worker dies is picked up again
+    without waiting for another email to be queued.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects.select_for_update()
+            .filter(status=OutboxEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        lease_end = now + timedelta(seconds=settings.OUTBOX_LEASE)
+        OutboxEmail.objects.filter(
+            id__in=[email.id for email in emails]
+        ).update(next_attempt_at=lease_end)
+        if emails:
+            transaction.on_commit(
+                lambda: wake_worker(settings.OUTBOX_LEASE))
+    return emails
+
+
+def send_pending(batch_size=None, transport=None):
+    """
+    Sends a batch of the due emails of the outbox
+
+    Failed emails are retried later, after get_retry_delay(), and given
+    up on after OUTBOX_MAX_ATTEMPTS attempts.
+
+    Args:
+        batch_size -- the most emails to send, OUTBOX_BATCH_SIZE if None
+        transport -- the transport to send with, get_transport() if None
+    Returns:
+        the number of emails sent and the number that failed
+    """
+    emails = claim_due_emails(batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0, 0
+    transport = transport or get_transport()
+
+    num_sent = num_failed = 0
+    for email in emails:
+        email.attempts += 1
+        try:
+            transport.send(email)
+        except Exception as error:
+            num_failed += 1
+            email.last_error = repr(error)
+            if email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                email.status = OutboxEmail.FAILED
+            else:
+                email.next_attempt_at = timezone.now() + timedelta(
+                    seconds=get_retry_delay(email.attempts))
+        else:
+            num_sent += 1
+            email.status = OutboxEmail.SENT
+            email.sent_at = timezone.now()
+        email.save()
+    return num_sent, num_failed
+
+
+def get_next_attempt_delay():
+    """Returns the seconds until the next pending email is due, or None
+    when the outbox is empty"""
+    next_attempt_at = OutboxEmail.objects.filter(
+        status=OutboxEmail.PENDING
+    ).order_by('next_attempt_at').values_list(
+        'next_attempt_at', flat=True).first()
+    if next_attempt_at is None:
+        return None
+    return max((next_attempt_at - timezone.now()).total_seconds(), 0)
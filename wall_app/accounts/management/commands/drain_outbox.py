@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from accounts.mail import send_pending
+
+
+class Command(BaseCommand):
+    help = 'Sends every email of the outbox that is due, batch by batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Number of emails claimed at a time, OUTBOX_BATCH_SIZE '
+                 'by default')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            num_sent, num_failed = send_pending(options['batch_size'])
+            if not num_sent + num_failed:
+                break
+            total_sent += num_sent
+            total_failed += num_failed
+        self.stdout.write('{sent} emails sent, {failed} failed'.format(
+            sent=total_sent, failed=total_failed))
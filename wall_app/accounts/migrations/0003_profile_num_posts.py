@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 20:18
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20170410_2333'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='num_posts',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def backfill_num_posts(apps, schema_editor):
+    """Stores the current number of posts of every author"""
+    Post = apps.get_model('core', 'Post')
+    Profile = apps.get_model('accounts', 'Profile')
+    counts = Post.objects.order_by().values_list('author').annotate(
+        num_posts=models.Count('id'))
+    for user_id, num_posts in counts.iterator():
+        Profile.objects.filter(user_id=user_id).update(num_posts=num_posts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_num_posts'),
+        ('core', '0005_auto_20170411_0821'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_num_posts, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,13 @@
 from __future__ import unicode_literals
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.cache import user_cache
+from core.versions import ContentVersions, content_versions
 
 
 class Base(models.Model):
@@ -9,9 +15,23 @@ class Base(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now=True)
 
+    # Denormalized counters are only ever changed with F() expressions, so
+    # saving an existing instance must not write back its in-memory copy.
+    COUNTER_FIELDS = ()
+
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        if (self.COUNTER_FIELDS and not self._state.adding and
+                kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and
+                field.name not in self.COUNTER_FIELDS
+            ]
+        return super(Base, self).save(*args, **kwargs)
+
 
 class Profile(Base):
     """Represents a user on the site"""
@@ -35,6 +55,87 @@ class Profile(Base):
         choices=STATUS_CHOICES,
         default=ACTIVE
     )
+    num_posts = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('num_posts',)
 
     def __unicode__(self):
         return '{user_name}'.format(user_name=self.user.username)
+
+    @staticmethod
+    def update_num_posts(user, delta):
+        """
+        Adjusts the stored post count of a user's profile in the database
+
+        The in-memory profile of the user, if already loaded, is updated
+        too so it can be serialized without being fetched again. Once the
+        transaction commits, the cached copy of the user is dropped and the
+        version of the profile moved, so no request caches the old count
+        again in between.
+
+        Args:
+            user -- a user object
+            delta -- the number of posts to add, negative to remove
+        """
+        Profile.objects.filter(user_id=user.id).update(
+            num_posts=models.F('num_posts') + delta)
+        user_id = user.id
+        transaction.on_commit(lambda: user_cache.invalidate(user_id))
+        content_versions.bump(ContentVersions.user(user.id))
+        if User.profile.is_cached(user):
+            user.profile.num_posts += delta
+
+
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=User)
+def uncache_changed_user(sender, instance, **kwargs):
+    """
+    Drops the cached copy of a user once a change to the user or its
+    profile commits, wherever it was made, e.g. a deactivation in the admin
+    """
+    user_id = instance.id if sender is User else instance.user_id
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+class OutboxEmail(Base):
+    """
+    An email waiting to be sent, or sent, by the outbox worker
+
+    Emails are queued in the same transaction as the change they are about
+    and sent in batches by accounts.mail.send_pending. Failed sends are
+    retried after a delay that doubles on every attempt, and emails left
+    claimed by a dead worker once their lease runs out.
+    """
+    PENDING = 'PENDING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed')
+    )
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker's lookup of the emails that are due
+            models.Index(fields=['status', 'next_attempt_at'],
+                         name='accounts_ou_status_096af9_idx'),
+        ]
+
+    def __unicode__(self):
+        return '{subject} to {to_email}'.format(
+            subject=self.subject, to_email=self.to_email)
@@ -61,7 +61,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
         }
 
     def get_num_posts(self, obj):
-        return obj.posts.count()
+        return obj.profile.num_posts
 
 
 class ProfileDetailSerializer(serializers.ModelSerializer):
@@ -121,4 +121,4 @@ class PublicUserSerializer(serializers.ModelSerializer):
         return obj.profile.profile_pic
 
     def get_num_posts(self, obj):
-        return obj.posts.count()
+        return obj.profile.num_posts
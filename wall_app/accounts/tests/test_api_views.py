@@ -1,3 +1,4 @@
+from django.contrib.auth.models import User
 from django.test import override_settings
 from django.urls import reverse_lazy
 from django.utils import six
@@ -8,9 +9,10 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from factories.factories import (
-    PROFILE_DATA, USER_DATA, ProfileFactory, UserFactory
+    PROFILE_DATA, USER_DATA, PostFactory, ProfileFactory, UserFactory
 )
 
+from accounts.mail import SendGridTransport, send_pending
 from accounts.models import Profile
 from accounts.tokens import account_activation_token
 from accounts.views import RegistrationView
@@ -57,6 +59,13 @@ class RegisterTestSuite(APITestCase):
                          self.data['username'])
         self.assertTrue(mock_send_mail.called)
 
+    @mock.patch('accounts.views.queue_email', side_effect=IOError)
+    def test_no_user_is_registered_without_its_email(self, mock_queue_email):
+        with self.assertRaises(IOError):
+            self.client.post(self.url, self.data, format='json')
+        self.assertFalse(Profile.objects.exists())
+        self.assertFalse(User.objects.exists())
+
     def test_with_mismatched_password(self):
         self.data['password2'] = 'password2'
         response = self.client.post(self.url, self.data, format='json')
@@ -70,6 +79,8 @@ class RegisterTestSuite(APITestCase):
     @mock.patch('sendgrid.SendGridAPIClient')
     def test_send_mail_calls_send_mail(self, mock_sendgrid_client):
         self.client.post(self.url, self.data, format='json')
+        self.assertFalse(mock_sendgrid_client.called)
+        send_pending(transport=SendGridTransport())
 
         profile = Profile.objects.get(user__username='john_doe')
         uidb64 = urlsafe_base64_encode(force_bytes(profile.user.pk))
@@ -209,6 +220,17 @@ class ProfileEndpointTestSuite(BaseTestCase):
         self.assertEqual(response.json()['about'],
                          self.profile_details['about'])
 
+    def test_profile_details_include_num_posts(self):
+        user = Profile.objects.get(user__username=USER_DATA['username']).user
+        PostFactory(author=user)
+        self.client.login(
+            username=USER_DATA['username'],
+            password=USER_DATA['password']
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['user']['num_posts'], 1)
+
     def test_unauthenticated_user_is_forbidden(self):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,121 @@
+from channels.test.base import ChannelTestCaseMixin
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse_lazy
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+from rest_framework_jwt.settings import api_settings
+
+from factories.factories import USER_DATA, ProfileFactory
+
+from accounts.cache import user_cache
+from accounts.models import Profile
+from accounts.tokens import account_activation_token
+from core.tests.http_header import APIHeaderAuthorization
+from core.tests.testing_utils import TEST_CACHES, create_post_objects
+
+
+class CachedJWTAuthenticationTestSuite(APIHeaderAuthorization):
+    def setUp(self):
+        super(CachedJWTAuthenticationTestSuite, self).setUp()
+        self.url = reverse_lazy('profile')
+        self.user_id = self.profile.user_id
+
+    def test_user_and_profile_are_cached_after_the_first_request(self):
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        self.assertEqual(user_cache.get(self.user_id).profile, self.profile)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['about'], self.profile.about)
+
+    def test_profile_update_invalidates_the_cached_user(self):
+        self.client.get(self.url)
+        user = {k: v for k, v in USER_DATA.items() if k != 'password'}
+        self.client.put(self.url, {'user': user, 'about': 'Known Soldier'},
+                        format='json')
+        self.assertIsNone(user_cache.get(self.user_id))
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['about'], 'Known Soldier')
+
+    def test_deleted_profiles_cannot_authenticate(self):
+        self.client.get(self.url)
+        self.client.delete(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_activation_invalidates_the_cached_user(self):
+        self.client.get(self.url)
+        user = self.profile.user
+        self.client.get(reverse_lazy('activate', kwargs={
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': account_activation_token.make_token(user),
+        }))
+        self.assertIsNone(user_cache.get(self.user_id))
+
+    def test_new_posts_keep_the_cached_user_until_commit(self):
+        self.client.get(self.url)
+        # TestCase never commits, so on_commit callbacks do not run
+        create_post_objects(self.profile.user, 2)
+        self.assertIsNotNone(user_cache.get(self.user_id))
+
+    def test_cached_users_are_only_used_for_their_username(self):
+        self.client.get(self.url)
+        user = user_cache.get(self.user_id)
+        user.username = 'renamed'
+        user_cache.set(user)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['user']['username'], 'john_doe')
+
+    def test_deactivated_cached_users_cannot_authenticate(self):
+        self.client.get(self.url)
+        user = user_cache.get(self.user_id)
+        user.is_active = False
+        user_cache.set(user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts',
+                   CACHES=TEST_CACHES)
+class CachedJWTAuthenticationCommitTestSuite(
+        ChannelTestCaseMixin, APITransactionTestCase):
+    """Posts are committed here, so the cached user is dropped as it is in
+    production; their broadcasts go to the in-memory channel layer"""
+
+    def setUp(self):
+        user_cache.cache.clear()
+        self.profile = ProfileFactory()
+        self.url = reverse_lazy('profile')
+        payload = api_settings.JWT_PAYLOAD_HANDLER(self.profile.user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION='JWT ' + api_settings.JWT_ENCODE_HANDLER(
+                payload))
+
+    def test_deactivated_users_cannot_authenticate(self):
+        self.client.get(self.url)
+        user = User.objects.get(id=self.profile.user_id)
+        user.is_active = False
+        user.save()
+        self.assertIsNone(user_cache.get(user.id))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_saved_profiles_invalidate_the_cached_user(self):
+        self.client.get(self.url)
+        profile = Profile.objects.get(id=self.profile.id)
+        profile.about = 'Known Soldier'
+        profile.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['about'], 'Known Soldier')
+
+    def test_new_posts_invalidate_the_cached_user(self):
+        self.client.get(self.url)
+        create_post_objects(self.profile.user, 2)
+        self.assertIsNone(user_cache.get(self.profile.user_id))
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['user']['num_posts'], 2)
@@ -0,0 +1,47 @@
+from django.urls import reverse_lazy
+
+from factories.factories import USER_DATA
+
+from core.tests.test_conditional import (
+    ConditionalGetTestCase, get_jwt_header,
+)
+from core.tests.testing_utils import create_post_objects
+
+
+class ProfileConditionalGetTestSuite(ConditionalGetTestCase):
+    def setUp(self):
+        super(ProfileConditionalGetTestSuite, self).setUp()
+        self.url = reverse_lazy('profile')
+        self.etag = self.client.get(self.url)['ETag']
+
+    def test_unchanged_profile_is_not_modified(self):
+        self.assertNotModified(self.url, self.etag)
+
+    def test_profile_update_modifies_the_profile(self):
+        user = {k: v for k, v in USER_DATA.items() if k != 'password'}
+        self.client.put(self.url, {'user': user, 'about': 'Known Soldier'},
+                        format='json')
+        response = self.assertModified(self.url, self.etag)
+        self.assertEqual(response.data['about'], 'Known Soldier')
+
+    def test_profile_update_modifies_the_anonymous_feed(self):
+        create_post_objects(self.profile.user, 1)
+        list_url = reverse_lazy('post-list')
+        self.client.credentials()
+        etag = self.client.get(list_url)['ETag']
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=get_jwt_header(self.profile.user))
+        user = {k: v for k, v in USER_DATA.items() if k != 'password'}
+        self.client.patch(self.url, {'user': user, 'about': 'Known Soldier'},
+                          format='json')
+        self.client.credentials()
+        response = self.assertModified(list_url, etag)
+        self.assertEqual(
+            response.data['results'][0]['author']['about'], 'Known Soldier')
+        self.assertNotModified(list_url, response['ETag'])
+
+    def test_new_posts_modify_the_profile(self):
+        create_post_objects(self.profile.user, 1)
+        response = self.assertModified(self.url, self.etag)
+        self.assertEqual(response.data['user']['num_posts'], 1)
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from channels.test import ChannelTestCase
+from channels.test.base import ChannelTestCaseMixin
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import six, timezone
+from django.utils.six import StringIO
+
+from accounts import mail
+from accounts.consumers import send_outbox
+from accounts.models import OutboxEmail
+
+
+class FailingTransport(object):
+    def send(self, email):
+        raise IOError('SendGrid is down')
+
+
+@override_settings(EMAIL_TRANSPORT='accounts.mail.LocmemTransport')
+class OutboxTestSuite(TestCase):
+    def setUp(self):
+        del mail.outbox[:]
+        self.email = mail.queue_email(
+            'john_doe@wall.com', 'Confirm your account', '<p>Hi</p>')
+
+    def test_send_pending_sends_due_emails(self):
+        self.assertEqual(mail.send_pending(), (1, 0))
+        self.assertEqual(
+            [email.to_email for email in mail.outbox], ['john_doe@wall.com'])
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, OutboxEmail.SENT)
+        self.assertEqual(self.email.attempts, 1)
+        self.assertIsNotNone(self.email.sent_at)
+        self.assertEqual(mail.send_pending(), (0, 0))
+
+    def test_failed_emails_are_retried_with_backoff(self):
+        self.assertEqual(
+            mail.send_pending(transport=FailingTransport()), (0, 1))
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, OutboxEmail.PENDING)
+        self.assertIn('SendGrid is down', self.email.last_error)
+        delay = (self.email.next_attempt_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(delay, settings.OUTBOX_RETRY_DELAY, delta=5)
+        # not due yet
+        self.assertEqual(mail.send_pending(), (0, 0))
+        self.assertEqual(mail.get_retry_delay(3),
+                         settings.OUTBOX_RETRY_DELAY * 4)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_emails_are_given_up_on_after_max_attempts(self):
+        for _ in range(2):
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            mail.send_pending(transport=FailingTransport())
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, OutboxEmail.FAILED)
+        self.assertEqual(self.email.attempts, 2)
+        self.assertIsNone(mail.get_next_attempt_delay())
+
+    def test_claimed_emails_are_leased(self):
+        self.assertEqual(len(mail.claim_due_emails(10)), 1)
+        self.assertEqual(mail.claim_due_emails(10), [])
+        OutboxEmail.objects.update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(mail.claim_due_emails(10)), 1)
+
+    def test_drain_outbox_command(self):
+        mail.queue_email('jane_doe@wall.com', 'Hello', '<p>Hi</p>')
+        out = StringIO()
+        call_command('drain_outbox', batch_size=1, stdout=out)
+        self.assertIn('2 emails sent, 0 failed', out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+
+
+@override_settings(EMAIL_TRANSPORT='accounts.mail.LocmemTransport')
+class OutboxConsumerTestSuite(ChannelTestCase):
+    channel = six.text_type(settings.OUTBOX_CHANNEL_NAME)
+
+    def setUp(self):
+        del mail.outbox[:]
+
+    @override_settings(OUTBOX_BATCH_SIZE=1)
+    def test_full_batch_wakes_the_worker_again(self):
+        for _ in range(2):
+            mail.queue_email('john_doe@wall.com', 'Hello', '<p>Hi</p>')
+        send_outbox(None)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIsNotNone(self.get_next_message(self.channel))
+
+    @override_settings(
+        EMAIL_TRANSPORT='accounts.tests.test_mail.FailingTransport')
+    def test_failures_schedule_a_delayed_wake_up(self):
+        mail.queue_email('john_doe@wall.com', 'Hello', '<p>Hi</p>')
+        send_outbox(None)
+        self.assertIsNone(self.get_next_message(self.channel))
+        delayed = self.get_next_message(u'asgi.delay')
+        self.assertEqual(delayed['channel'], settings.OUTBOX_CHANNEL_NAME)
+        self.assertAlmostEqual(
+            delayed['delay'], settings.OUTBOX_RETRY_DELAY * 1000, delta=5000)
+
+
+class OutboxLeaseTestSuite(ChannelTestCaseMixin, TransactionTestCase):
+    """Claims are committed here, so the wake up they schedule is sent"""
+
+    def test_claims_schedule_a_wake_up_when_the_lease_runs_out(self):
+        mail.queue_email('john_doe@wall.com', 'Hello', '<p>Hi</p>')
+        self.assertEqual(len(mail.claim_due_emails(10)), 1)
+        delayed = self.get_next_message(u'asgi.delay', require=True)
+        self.assertEqual(delayed['channel'], settings.OUTBOX_CHANNEL_NAME)
+        self.assertEqual(delayed['delay'], settings.OUTBOX_LEASE * 1000)
+        self.assertEqual(mail.claim_due_emails(10), [])
+        self.assertIsNone(self.get_next_message(u'asgi.delay'))
@@ -0,0 +1,84 @@
+from django.urls import reverse_lazy
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+import mock
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from factories.factories import (
+    PROFILE_DATA, USER_DATA, ProfileFactory, UserFactory
+)
+
+from accounts.tokens import account_activation_token
+from accounts.views import RegistrationView
+from core.tests.http_header import APIHeaderAuthorization
+from core.tests.testing_utils import QueryBudgetMixin, create_post_objects
+
+
+class AuthQueryBudgetTestSuite(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.creds = {
+            'username': USER_DATA['username'],
+            'password': USER_DATA['password'],
+        }
+
+    @mock.patch.object(RegistrationView, 'send_mail', autospec=True)
+    def test_register(self, mock_send_mail):
+        data = USER_DATA.copy()
+        data.update(PROFILE_DATA)
+        data['password1'] = data['password2'] = data.pop('password')
+        # the user and profile, in a savepoint of the transaction the
+        # activation email is queued in
+        response = self.assertWithinQueryBudget(
+            6, 'post', reverse_lazy('user-registration'), data,
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_activate(self):
+        user = UserFactory(is_active=False)
+        ProfileFactory(user=user)
+        url = reverse_lazy('activate', kwargs={
+            'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': account_activation_token.make_token(user),
+        })
+        response = self.assertWithinQueryBudget(4, 'get', url)
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+    def test_login(self):
+        ProfileFactory()
+        response = self.assertWithinQueryBudget(
+            2, 'post', reverse_lazy('user-login'), self.creds,
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_refresh_token(self):
+        ProfileFactory()
+        token = self.client.post(
+            reverse_lazy('user-login'), self.creds, format='json'
+        ).data['token']
+        response = self.assertWithinQueryBudget(
+            2, 'post', reverse_lazy('refresh-token'), {'token': token},
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ProfileQueryBudgetTestSuite(QueryBudgetMixin, APIHeaderAuthorization):
+    def setUp(self):
+        super(ProfileQueryBudgetTestSuite, self).setUp()
+        create_post_objects(self.profile.user, 5)
+        self.url = reverse_lazy('profile')
+
+    def test_retrieve_profile(self):
+        response = self.assertWithinQueryBudget(2, 'get', self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_profile(self):
+        user = {k: v for k, v in USER_DATA.items() if k != 'password'}
+        data = {'user': user, 'about': 'Known Soldier'}
+        response = self.assertWithinQueryBudget(
+            4, 'put', self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_profile(self):
+        response = self.assertWithinQueryBudget(4, 'delete', self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
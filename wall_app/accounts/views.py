@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.sites.shortcuts import get_current_site
+from django.db import transaction
 from django.shortcuts import redirect
 from django.template.loader import render_to_string
 from django.utils.encoding import force_bytes, force_text
@@ -11,12 +12,16 @@ from rest_framework.generics import RetrieveUpdateDestroyAPIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-import sendgrid
-from sendgrid.helpers.mail import Email, Content, Mail
 
+from accounts.cache import user_cache
+from accounts.mail import queue_email
 from accounts.models import Profile
 from accounts.serializers import RegisterSerializer, ProfileDetailSerializer
 from accounts.tokens import account_activation_token
+from core.cache import feed_cache
+from core.versions import (
+    ConditionalGetMixin, ContentVersions, content_versions,
+)
 
 
 class RegistrationView(APIView):
@@ -26,12 +31,13 @@ class RegistrationView(APIView):
 
     def post(self, request, format=None, *args, **kwargs):
         serializer = RegisterSerializer(data=request.data)
-        if serializer.is_valid():
-            profile = serializer.save()
-        else:
+        if not serializer.is_valid():
             return Response(
                 serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        self.send_mail(request, profile)  # should run asynchronously
+        # no account is created without its activation email
+        with transaction.atomic():
+            profile = serializer.save()
+            self.send_mail(request, profile)
         response = serializer.data
         response.update({
             'msg': 'Please confirm your email address to complete registration'
@@ -39,6 +45,7 @@ class RegistrationView(APIView):
         return Response(response, status=status.HTTP_201_CREATED)
 
     def send_mail(self, request, profile):
+        """Queues the activation email of the profile in the outbox"""
         current_site = get_current_site(request)
         subject = 'Confirm your account on Wallie'
         message = render_to_string('accounts/account_activation_email.html', {
@@ -48,12 +55,7 @@ class RegistrationView(APIView):
             'uid': urlsafe_base64_encode(force_bytes(profile.user.pk)),
             'token': account_activation_token.make_token(profile.user),
         })
-        sg = sendgrid.SendGridAPIClient(apikey=settings.SENDGRID_API_KEY)
-        from_email = Email("admin@wallie.com")
-        to_email = Email(profile.user.email)
-        content = Content("text/html", message)
-        mail = Mail(from_email, subject, to_email, content)
-        sg.client.mail.send.post(request_body=mail.get())
+        queue_email(profile.user.email, subject, message)
 
 
 class ActivationView(View):
@@ -70,6 +72,8 @@ class ActivationView(View):
             user.profile.email_confirmed = True
             user.save()
             user.profile.save()
+            user_cache.invalidate(user.id)
+            content_versions.bump(ContentVersions.user(user.id))
             status = 'success'
         else:
             status = 'failed'
@@ -77,7 +81,7 @@ class ActivationView(View):
             url=settings.FRONTEND_URL, status=status))
 
 
-class ProfileDetail(RetrieveUpdateDestroyAPIView):
+class ProfileDetail(ConditionalGetMixin, RetrieveUpdateDestroyAPIView):
     """Handles fetching user detail and deleting a user"""
     queryset = Profile.objects.all()
     serializer_class = ProfileDetailSerializer
@@ -88,6 +92,13 @@ class ProfileDetail(RetrieveUpdateDestroyAPIView):
         obj = self.request.user.profile
         return obj
 
+    def get_version_name(self):
+        return ContentVersions.user(self.request.user.id)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.profile_changed(self.request.user.id)
+
     def delete(self, request, *args, **kwargs):
         instance = self.get_object()
 
@@ -96,4 +107,15 @@ class ProfileDetail(RetrieveUpdateDestroyAPIView):
 
         instance.status = Profile.DELETED
         instance.save()
+        self.profile_changed(instance.user_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    def profile_changed(user_id):
+        """Drops the cached user and moves the versions of the profile and
+        of the wall, which shows it on every post of the user; the cached
+        feed pages are dropped too once the change commits"""
+        user_cache.invalidate(user_id)
+        transaction.on_commit(feed_cache.invalidate)
+        content_versions.bump(ContentVersions.user(user_id))
+        content_versions.bump(ContentVersions.WALL)
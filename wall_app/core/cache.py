@@ -0,0 +1,161 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.encoding import force_bytes
+from django.utils.six.moves import cPickle as pickle
+import redis
+
+from core.versions import ContentVersions, content_versions
+
+
+class RedisCache(BaseCache):
+    """
+    Django cache backend storing entries in Redis, so every process
+    serving the API shares them
+
+    LOCATION is the url of the Redis server. Integers are stored as plain
+    numbers so incr() is a single atomic INCRBY; anything else is pickled.
+    """
+
+    def __init__(self, location, params):
+        super(RedisCache, self).__init__(params)
+        self._client = redis.StrictRedis.from_url(location)
+
+    def _timeout(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else int(timeout)
+
+    @staticmethod
+    def _dumps(value):
+        if isinstance(value, (int, long)) and not isinstance(value, bool):
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(stored):
+        try:
+            return int(stored)
+        except ValueError:
+            return pickle.loads(stored)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        timeout = self._timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            return False
+        return bool(self._client.set(
+            key, self._dumps(value), ex=timeout, nx=True))
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        stored = self._client.get(key)
+        if stored is None:
+            return default
+        return self._loads(stored)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        timeout = self._timeout(timeout)
+        if timeout is not None and timeout <= 0:
+            self._client.delete(key)
+        else:
+            self._client.set(key, self._dumps(value), ex=timeout)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._client.delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._client.exists(key))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if not self._client.exists(key):
+            raise ValueError("Key '%s' not found" % key)
+        return self._client.incr(key, delta)
+
+    def clear(self):
+        """Removes the entries under this cache's KEY_PREFIX"""
+        pattern = self.make_key('*')
+        keys = list(self._client.scan_iter(match=pattern))
+        if keys:
+            self._client.delete(*keys)
+
+
+class FeedCache(object):
+    """
+    Caches the serialized feed pages served to anonymous users
+
+    An anonymous viewer loves no post, so a page of the feed is the same
+    for every logged-out client and is cached per url. Every cached page
+    is keyed under a generation number and the token of the wall version;
+    invalidate() moves to the next generation, and any change that moves
+    the wall version, a profile edit included, retires every page at once
+    without having to find them, in every process. Hits and misses are
+    counted in the cache as well.
+    """
+    GENERATION_KEY = 'feed:generation'
+    HITS_KEY = 'feed:hits'
+    MISSES_KEY = 'feed:misses'
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_key(self, request):
+        """Returns the key of the page requested under the current generation
+        and wall version
+        Args:
+            request -- the request for the page
+        """
+        generation = self.cache.get(self.GENERATION_KEY, 0)
+        version = content_versions.get(ContentVersions.WALL) or b''
+        url = force_bytes(request.build_absolute_uri())
+        return 'feed:{generation}:{version}:{digest}'.format(
+            generation=generation, version=version.decode('ascii'),
+            digest=hashlib.md5(url).hexdigest())
+
+    def get(self, key):
+        """Returns the cached page stored at key, or None"""
+        data = self.cache.get(key)
+        self._count(self.MISSES_KEY if data is None else self.HITS_KEY)
+        return data
+
+    def set(self, key, data):
+        """Stores the serialized page at key"""
+        self.cache.set(key, data)
+
+    def invalidate(self):
+        """Retires every cached page"""
+        self._count(self.GENERATION_KEY)
+
+    def stats(self):
+        """Returns the number of cache hits and misses counted so far"""
+        return {
+            'hits': self.cache.get(self.HITS_KEY, 0),
+            'misses': self.cache.get(self.MISSES_KEY, 0),
+        }
+
+    def _count(self, key):
+        if not self.cache.add(key, 1, timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # evicted between add and incr
+                self.cache.add(key, 1, timeout=None)
+
+
+feed_cache = FeedCache(settings.FEED_CACHE_ALIAS)
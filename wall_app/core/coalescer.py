@@ -0,0 +1,88 @@
+from django.conf import settings
+import redis
+
+
+class LoveUpdateCoalescer(object):
+    """
+    Merges the love_update events of a post that arrive within a short
+    window into a single frame
+
+    The first event for a post marks it pending in Redis and asks for a
+    flush once the window has passed; events arriving while the post is
+    pending are only counted. The flush reads the love count at that
+    moment, so the single frame sent carries the latest count. Events
+    received and frames sent are counted in Redis as well.
+    """
+
+    def __init__(self, url=None):
+        self._url = url
+        self._client = None
+
+    @property
+    def received_key(self):
+        return '{prefix}:received'.format(
+            prefix=settings.LOVE_UPDATE_KEY_PREFIX)
+
+    @property
+    def sent_key(self):
+        return '{prefix}:sent'.format(prefix=settings.LOVE_UPDATE_KEY_PREFIX)
+
+    def pending_key(self, post_id):
+        return '{prefix}:pending:{post_id}'.format(
+            prefix=settings.LOVE_UPDATE_KEY_PREFIX, post_id=post_id)
+
+    @property
+    def window(self):
+        """The coalescing window in milliseconds, 0 when disabled"""
+        return settings.LOVE_UPDATE_COALESCE_MS
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.StrictRedis.from_url(
+                self._url or settings.REDIS_URL)
+        return self._client
+
+    def receive(self, post_id):
+        """
+        Records a love_update event for a post
+
+        Args:
+            post_id -- the id of the post whose loves changed
+        Returns:
+            True when the caller should schedule a flush of the post in
+            window milliseconds, False when one is already scheduled
+        """
+        with self.client.pipeline() as pipe:
+            pipe.incr(self.received_key)
+            # expires after a while in case its flush is lost
+            pipe.set(self.pending_key(post_id), 1,
+                     px=max(self.window * 10, 1000), nx=True)
+            _, scheduled = pipe.execute()
+        return bool(scheduled)
+
+    def flush(self, post_id):
+        """
+        Ends the window of a post; the caller sends its frame next
+
+        Args:
+            post_id -- the id of the post whose window has passed
+        """
+        with self.client.pipeline() as pipe:
+            pipe.delete(self.pending_key(post_id))
+            pipe.incr(self.sent_key)
+            pipe.execute()
+
+    def stats(self):
+        """Returns the number of events received and frames sent"""
+        received, sent = self.client.mget(self.received_key, self.sent_key)
+        return {'received': int(received or 0), 'sent': int(sent or 0)}
+
+    def reset(self):
+        """Clears the counters and the pending posts"""
+        keys = list(self.client.scan_iter(
+            match=self.pending_key('*')))
+        self.client.delete(self.received_key, self.sent_key, *keys)
+
+
+love_update_coalescer = LoveUpdateCoalescer()
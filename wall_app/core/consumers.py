@@ -1,15 +1,29 @@
 import json
 
 from django.conf import settings
-from channels import Group
+from django.utils.six.moves.urllib.parse import parse_qs
+from channels import Channel, Group
+from channels.sessions import channel_session
 
+from . import encoders
+from .coalescer import love_update_coalescer
+from .eventlog import event_log
 
+
+def get_post_group(post_id):
+    """Returns the group of the clients showing the post with post_id"""
+    return Group('post-{id}'.format(id=post_id))
+
+
+@channel_session
 def connect_post(message):
     """
     When the user opens a WebSocket to a live post stream, adds them to the
     group for that stream so they receive new post notification
 
     The notifications are actually sent in the Post model on save.
+    Clients reconnecting with ?after=<seq> are then sent the frames they
+    missed, see replay_events.
     """
     message.reply_channel.send({'accept': True})
     # Each different client has a different 'reply_channel', which is how you
@@ -17,43 +31,240 @@ def connect_post(message):
     # channels to a single Group, and then when we send to the group,
     # they'll all get the same message
     Group(settings.GLOBAL_CHANNEL_NAME).add(message.reply_channel)
+    message.channel_session['post_ids'] = []
+
+    query_string = message.content.get('query_string') or ''
+    if isinstance(query_string, bytes):
+        query_string = query_string.decode('utf-8')
+    query = parse_qs(query_string, keep_blank_values=True)
+    if 'after' in query:
+        replay_events(message.reply_channel, query['after'][0])
+
+
+def replay_events(reply_channel, after):
+    """
+    Sends a reconnecting client the frames logged after the last one it
+    got, in "replay" frames of up to EVENT_REPLAY_CHUNK_SIZE frames, then
+    a "resumed" frame with the current sequence number
+
+    When some of the frames it missed have left the log, the client is
+    sent "resync_required" instead and should reload, or sync, the feed.
+    The client is already in the global group, so a frame may come both
+    live and replayed; clients skip the sequence numbers they have seen.
+    An empty after only gets the "resumed" frame, for clients that have
+    not seen any frame yet.
+
+    Args:
+        reply_channel -- the channel of the client
+        after -- the seq of the last frame the client got, as sent
+    """
+    if not after:
+        frames, current = [], event_log.current()
+    else:
+        try:
+            frames, current = event_log.since(int(after))
+        except ValueError:
+            reply_channel.send({'text': encoders.dumps_text({
+                'type': 'error',
+                'data': 'Expected ?after=<seq>',
+            })})
+            return
+    if frames is None or current is None:
+        reply_channel.send({'text': encoders.dumps_text({
+            'type': 'resync_required',
+            'data': {'seq': current},
+        })})
+        return
+
+    chunk_size = settings.EVENT_REPLAY_CHUNK_SIZE
+    for start in range(0, len(frames), chunk_size):
+        reply_channel.send({
+            'text': u'{{"type":"replay","data":[{frames}]}}'.format(
+                frames=u','.join(frames[start:start + chunk_size]))
+        })
+    reply_channel.send({'text': encoders.dumps_text({
+        'type': 'resumed',
+        'data': {'seq': current},
+    })})
 
 
+@channel_session
+def receive_post_stream(message):
+    """
+    Subscribes the client to, or unsubscribes it from, the updates of the
+    posts it is showing
+
+    Clients send {"action": "subscribe", "post_ids": [1, 2]}, or the same
+    with "unsubscribe". Love updates, edits and removals of a post are
+    only sent to the clients subscribed to it, see get_post_group.
+    """
+    try:
+        request = json.loads(message.content['text'])
+        action = request['action']
+        post_ids = set(int(post_id) for post_id in request['post_ids'])
+    except (KeyError, TypeError, ValueError):
+        action = None
+    if action not in ('subscribe', 'unsubscribe'):
+        message.reply_channel.send({'text': encoders.dumps_text({
+            'type': 'error',
+            'data': 'Expected {"action": "subscribe" or "unsubscribe", '
+                    '"post_ids": [...]}',
+        })})
+        return
+
+    subscribed = set(message.channel_session.get('post_ids', []))
+    if action == 'subscribe':
+        post_ids -= subscribed
+        num_allowed = settings.POST_STREAM_MAX_SUBSCRIPTIONS - len(subscribed)
+        post_ids = set(sorted(post_ids)[:max(num_allowed, 0)])
+        for post_id in post_ids:
+            get_post_group(post_id).add(message.reply_channel)
+        subscribed |= post_ids
+    else:
+        post_ids &= subscribed
+        for post_id in post_ids:
+            get_post_group(post_id).discard(message.reply_channel)
+        subscribed -= post_ids
+    message.channel_session['post_ids'] = sorted(subscribed)
+
+
+@channel_session
 def disconnect_post(message):
     """
-    Removes the user from the global group when they disconnect.
+    Removes the user from the global group, and the groups of the posts it
+    subscribed to, when they disconnect.
 
     Channels will auto-cleanup eventually, but it can take a while, and having
     old entries cluttering up the group will reduce performance.
     """
     Group(settings.GLOBAL_CHANNEL_NAME).discard(message.reply_channel)
+    for post_id in message.channel_session.get('post_ids', []):
+        get_post_group(post_id).discard(message.reply_channel)
 
 
-def send_post_to_clients(post):
+def queue_broadcast(event, post_id, encoded_post=None):
     """
-    This consumer is in charge of sending newly created or modified posts
-    to all clients in the global group
+    Hands a broadcast over to the channels worker, so the request that
+    triggered it does not wait on the fanout
 
-    This function is called from the core/models.py
-    I didn't just send it from the models to avoid circular import errors
-    when importing PostSerializer.
+    Created and updated posts travel on the channel already encoded;
+    for the other events the worker loads what it needs when it gets to
+    them, see broadcast below.
+
+    Args:
+        event -- one of 'post_create', 'post_update', 'post_delete' or
+            'love_update'
+        post_id -- the id of the post concerned
+        encoded_post -- the JSON of the post for 'post_create' and
+            'post_update', see Post.encode()
     """
-    from .serializers import PostSerializer
-    serialized_post = PostSerializer(post)
-    payload = {
-        'type': 'post_update',
-        'data': serialized_post.data
+    content = {
+        'event': event,
+        'post_id': post_id,
     }
+    if encoded_post is not None:
+        content['post'] = encoded_post.decode('utf-8')
+    Channel(settings.BROADCAST_CHANNEL_NAME).send(content)
+
+
+def queue_love_updates(post_ids):
+    """
+    Hands the love_update events of several posts over to the channels
+    worker as a single message, see Love.apply_bulk()
 
-    # Encode and send that message to the general channel
-    Group(settings.GLOBAL_CHANNEL_NAME).send({
-        'text': json.dumps(payload)
+    Args:
+        post_ids -- the ids of the posts whose loves changed
+    """
+    Channel(settings.BROADCAST_CHANNEL_NAME).send({
+        'event': 'love_bulk_update',
+        'post_ids': list(post_ids),
+    })
+
+
+def broadcast(message):
+    """
+    Worker consumer of the broadcast channel, sending the events queued
+    by queue_broadcast to the clients concerned: new posts go to the
+    global group, everything else to the group of the post
+
+    love_update events are coalesced per post; their frame is sent when
+    the love_flush scheduled for the post comes back on the channel. A
+    love_bulk_update counts as a love_update of each of its posts.
+    """
+    from .models import Love
+    event = message.content['event']
+    post_id = message.content.get('post_id')
+
+    if event in ('post_create', 'post_update'):
+        send_post_to_clients(
+            post_id, message.content['post'], created=event == 'post_create')
+    elif event == 'post_delete':
+        send_post_delete_command_to_clients(post_id)
+    elif event == 'love_update':
+        if love_update_coalescer.receive(post_id):
+            schedule_love_flush(post_id)
+    elif event == 'love_bulk_update':
+        for post_id in message.content['post_ids']:
+            if love_update_coalescer.receive(post_id):
+                schedule_love_flush(post_id)
+    elif event == 'love_flush':
+        love_update_coalescer.flush(post_id)
+        send_love_status_to_clients({
+            'post_id': post_id,
+            'num_loves': Love.get_num_post_loves(post_id),
+            'in_love': False,
+        })
+
+
+def schedule_love_flush(post_id):
+    """
+    Queues the love_flush of a post on the broadcast channel once the
+    coalescing window has passed, through the delay server (rundelay)
+
+    Args:
+        post_id -- the id of the post whose love updates are coalesced
+    """
+    content = {'event': 'love_flush', 'post_id': post_id}
+    window = love_update_coalescer.window
+    if not window:
+        Channel(settings.BROADCAST_CHANNEL_NAME).send(content)
+        return
+    Channel('asgi.delay').send({
+        'channel': settings.BROADCAST_CHANNEL_NAME,
+        'content': content,
+        'delay': window,
     })
 
 
+def send_post_to_clients(post_id, encoded_post, created=False):
+    """
+    This consumer is in charge of sending newly created posts to all
+    clients in the global group, and modified posts to the clients
+    subscribed to them
+
+    The post comes already encoded and is spliced into the frame as is,
+    so it is encoded once however many clients receive it. Like every
+    frame of the stream, it is numbered and logged, see EventLog.
+
+    Args:
+        post_id -- the id of the post
+        encoded_post -- the JSON of the post, see Post.encode()
+        created -- whether the post was just created
+    """
+    frame = u'{{"type":"post_update","data":{post}}}'.format(
+        post=encoded_post)
+
+    if created:
+        group = Group(settings.GLOBAL_CHANNEL_NAME)
+    else:
+        group = get_post_group(post_id)
+    group.send({'text': event_log.append(frame)})
+
+
 def send_post_delete_command_to_clients(post_id):
     """
-    This consumer is in charge of informing clients of post removal
+    This consumer is in charge of informing clients showing the post of
+    its removal
 
     This function is called from the core/models.py
     """
@@ -62,21 +273,23 @@ def send_post_delete_command_to_clients(post_id):
         'data': post_id,
     }
 
-    # Encode and send that message to the general channel
-    Group(settings.GLOBAL_CHANNEL_NAME).send({'text': json.dumps(payload)})
+    get_post_group(post_id).send({
+        'text': event_log.append(encoders.dumps_text(payload))
+    })
 
 
 def send_love_status_to_clients(data):
     """
     This consumer is in charge of sending love status changes to users
-    connected to the global channel
+    subscribed to the post
 
     Now, I think it just makes sense that all uses of the channel be located
     in one place
     """
-    # Encode and send that message to the general channel
     payload = {
         'type': 'love_update',
         'data': data
     }
-    Group(settings.GLOBAL_CHANNEL_NAME).send({'text': json.dumps(payload)})
+    get_post_group(data['post_id']).send({
+        'text': event_log.append(encoders.dumps_text(payload))
+    })
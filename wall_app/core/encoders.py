@@ -0,0 +1,104 @@
+"""
+JSON encoding shared by the REST renderers and the websocket consumers
+
+The backend is picked with the JSON_ENCODER setting:
+
+    'json' -- the standard library
+    'simplejson' -- simplejson and its C speedups, when installed
+    'auto' -- simplejson when installed, the standard library otherwise
+
+Every backend outputs the same bytes as DRF's JSONRenderer does with the
+standard library: datetimes, decimals and the other types DRF knows are
+converted by DRF's JSONEncoder.default and simplejson is kept from
+encoding decimals and named tuples its own way.
+"""
+import json
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+
+# DRF's compact separators
+SEPARATORS = (',', ':')
+
+_default = JSONEncoder().default
+
+
+def _dumps_json(data, ensure_ascii, separators, indent):
+    return json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=ensure_ascii,
+        separators=separators, indent=indent)
+
+
+def _dumps_simplejson(data, ensure_ascii, separators, indent):
+    return simplejson.dumps(
+        data, default=_default, ensure_ascii=ensure_ascii,
+        separators=separators, indent=indent, use_decimal=False,
+        namedtuple_as_object=False, tuple_as_array=True)
+
+
+BACKENDS = {
+    'json': _dumps_json,
+    'simplejson': _dumps_simplejson,
+}
+
+
+def get_backend_name(name=None):
+    """
+    Returns the name of the backend in use
+
+    Args:
+        name -- the configured backend, JSON_ENCODER when None
+    """
+    name = name or settings.JSON_ENCODER
+    if name == 'auto':
+        return 'json' if simplejson is None else 'simplejson'
+    if name not in BACKENDS:
+        raise ImproperlyConfigured(
+            "JSON_ENCODER must be one of 'auto', {names}, not '{name}'".format(
+                names=', '.join("'%s'" % key for key in sorted(BACKENDS)),
+                name=name))
+    if name == 'simplejson' and simplejson is None:
+        raise ImproperlyConfigured(
+            "JSON_ENCODER is 'simplejson' but simplejson is not installed")
+    return name
+
+
+def dumps(data, ensure_ascii=None, separators=SEPARATORS, indent=None,
+          backend=None):
+    """
+    Returns data encoded to JSON as UTF-8 bytes
+
+    U+2028 and U+2029 are escaped so the output is valid javascript too,
+    as DRF does.
+
+    Args:
+        data -- the data to encode
+        ensure_ascii -- escape non-ASCII characters, DRF's UNICODE_JSON
+            setting decides when None
+        separators -- item and key separators, compact by default
+        indent -- number of spaces to indent with, None for one line
+        backend -- the backend to use, JSON_ENCODER when None
+    """
+    if ensure_ascii is None:
+        ensure_ascii = not api_settings.UNICODE_JSON
+    encoded = BACKENDS[get_backend_name(backend)](
+        data, ensure_ascii, separators, indent)
+    if isinstance(encoded, six.text_type):
+        encoded = encoded.replace(u'\u2028', u'\\u2028').replace(
+            u'\u2029', u'\\u2029')
+        return encoded.encode('utf-8')
+    return encoded
+
+
+def dumps_text(data, backend=None):
+    """Returns data encoded to compact JSON, as text for websocket frames"""
+    return dumps(data, backend=backend).decode('utf-8')
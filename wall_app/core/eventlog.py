@@ -0,0 +1,99 @@
+from django.conf import settings
+import redis
+
+
+class EventLog(object):
+    """
+    The last frames broadcast on the post stream, numbered, kept in Redis
+    so reconnecting clients can be sent the ones they missed
+
+    Every frame is stamped with a "seq" taken from a Redis counter, then
+    added to a sorted set scored by it, which is trimmed to the last
+    EVENT_LOG_SIZE frames. Sequence numbers only ever grow, but a client
+    only receives the frames of the posts it subscribes to, so the ones
+    it sees have gaps. When Redis fails, frames go out unstamped and
+    clients are told to resync.
+    """
+
+    def __init__(self, url=None):
+        self._url = url
+        self._client = None
+
+    @property
+    def key(self):
+        return settings.EVENT_LOG_KEY
+
+    @property
+    def seq_key(self):
+        return '{key}:seq'.format(key=self.key)
+
+    @property
+    def size(self):
+        return settings.EVENT_LOG_SIZE
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.StrictRedis.from_url(
+                self._url or settings.REDIS_URL)
+        return self._client
+
+    def append(self, frame):
+        """
+        Stamps a frame with the next sequence number and logs it
+
+        Args:
+            frame -- the text of a frame, a JSON object
+        Returns:
+            the stamped frame, or the frame unchanged when Redis fails
+        """
+        try:
+            seq = self.client.incr(self.seq_key)
+            stamped = u'{{"seq":{seq},{rest}'.format(seq=seq, rest=frame[1:])
+            with self.client.pipeline() as pipe:
+                pipe.zadd(self.key, seq, stamped)
+                pipe.zremrangebyrank(self.key, 0, -self.size - 1)
+                pipe.execute()
+        except redis.RedisError:
+            return frame
+        return stamped
+
+    def since(self, seq):
+        """
+        Returns the frames logged after a sequence number, oldest first
+
+        Args:
+            seq -- the sequence number of the last frame the client got
+        Returns:
+            the frames and the current sequence number; the frames are None
+            when some were dropped from the log, or it is unavailable, and
+            the client should resync
+        """
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.get(self.seq_key)
+                pipe.zrange(self.key, 0, 0, withscores=True)
+                pipe.zrangebyscore(self.key, '({seq}'.format(seq=seq), '+inf')
+                current, oldest, frames = pipe.execute()
+        except redis.RedisError:
+            return None, None
+
+        current = int(current or 0)
+        first_logged = int(oldest[0][1]) if oldest else current + 1
+        if seq > current or seq + 1 < first_logged:
+            # evicted, or the counter was lost with Redis
+            return None, current
+        return [frame.decode('utf-8') for frame in frames], current
+
+    def current(self):
+        """Returns the current sequence number, None when Redis fails"""
+        try:
+            return int(self.client.get(self.seq_key) or 0)
+        except redis.RedisError:
+            return None
+
+    def clear(self):
+        self.client.delete(self.key, self.seq_key)
+
+
+event_log = EventLog()
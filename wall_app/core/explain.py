@@ -0,0 +1,102 @@
+"""
+Helpers for reading the query plans of SQL statements on PostgreSQL and
+SQLite, used to check that the hot queries of the app are served from
+indexes rather than by scanning whole tables.
+"""
+import json
+import re
+
+from django.db import connection
+from django.utils import six
+
+
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+
+# Plan lines that mean a whole table is read row by row
+SEQUENTIAL_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+    'sqlite': re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$'),
+}
+
+EXPLAINABLE_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def is_explainable(sql):
+    """Returns True for statements whose plan can be inspected"""
+    return sql.lstrip().upper().startswith(EXPLAINABLE_STATEMENTS)
+
+
+def explain(sql, params=None):
+    """
+    Returns the query plan of a SQL statement as a list of lines
+
+    The statement is planned, not executed.
+
+    Args:
+        sql -- the SQL statement
+        params -- parameters for the placeholders in sql, if any
+    """
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+    if prefix is None:
+        raise NotImplementedError(
+            'Query plans are not supported on {vendor}'.format(
+                vendor=connection.vendor))
+
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        rows = cursor.fetchall()
+    # SQLite returns (id, parent, notused, detail) rows
+    return [row[-1] for row in rows]
+
+
+def sequential_scans(sql, params=None):
+    """
+    Returns the names of the tables a SQL statement reads in full
+
+    Args:
+        sql -- the SQL statement
+        params -- parameters for the placeholders in sql, if any
+    """
+    pattern = SEQUENTIAL_SCAN_PATTERNS[connection.vendor]
+    tables = []
+    for line in explain(sql, params):
+        match = pattern.search(line.strip())
+        if match:
+            tables.append(match.group('table'))
+    return tables
+
+
+def rows_scanned(sql, params=None):
+    """
+    Returns the number of rows the scans of a SELECT statement read,
+    including those its filters then removed, or None where the database
+    cannot tell
+
+    The statement is executed, with EXPLAIN ANALYZE, on PostgreSQL only.
+
+    Args:
+        sql -- the SELECT statement
+        params -- parameters for the placeholders in sql, if any
+    """
+    if (connection.vendor != 'postgresql' or
+            not sql.lstrip().upper().startswith('SELECT')):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, six.string_types):
+        plan = json.loads(plan)
+
+    num_rows = 0
+    pending = [plan[0]['Plan']]
+    while pending:
+        node = pending.pop()
+        if 'Scan' in node['Node Type']:
+            num_rows += node.get('Actual Loops', 1) * (
+                node.get('Actual Rows', 0) +
+                node.get('Rows Removed by Filter', 0))
+        pending.extend(node.get('Plans', []))
+    return num_rows
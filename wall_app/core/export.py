@@ -0,0 +1,104 @@
+"""
+Export of the wall as NDJSON, one post per line
+
+Posts are read through a server-side cursor (QuerySet.iterator(), which
+Django runs as a named cursor on PostgreSQL) and the fans of each chunk
+of posts are looked up together, so exporting millions of posts takes the
+memory of a single chunk.
+"""
+from collections import OrderedDict, defaultdict
+from itertools import islice
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from core import encoders
+from core.models import Love, Post
+
+
+CHUNK_SIZE = 2000
+
+EXPORT_VALUES = (
+    'id', 'date_created', 'date_modified', 'content', 'num_loves',
+    'author__username', 'author__first_name', 'author__last_name',
+)
+
+_date_field = serializers.DateTimeField()
+
+
+def parse_date(value):
+    """
+    Returns the aware datetime of an ISO 8601 string, None when empty
+
+    Raises:
+        ValueError -- when the value is not a datetime
+    """
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError('{value!r} is not an ISO 8601 datetime'.format(
+            value=value))
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def get_export_queryset(author=None, since=None, until=None):
+    """
+    Returns the posts to export, oldest change first
+
+    Args:
+        author -- only export the posts of the user with this username
+        since -- only export posts modified at or after this datetime
+        until -- only export posts modified before this datetime
+    """
+    queryset = Post.objects.order_by('date_modified', 'id')
+    if author:
+        queryset = queryset.filter(author__username=author)
+    if since:
+        queryset = queryset.filter(date_modified__gte=since)
+    if until:
+        queryset = queryset.filter(date_modified__lt=until)
+    return queryset
+
+
+def iter_ndjson(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields the posts of the queryset as lines of UTF-8 NDJSON
+
+    Every line holds the post, its author and the usernames of its fans.
+
+    Args:
+        queryset -- posts, see get_export_queryset()
+        chunk_size -- number of rows fetched from the cursor at a time
+    """
+    rows = queryset.values_list(*EXPORT_VALUES).iterator()
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        fans = defaultdict(list)
+        loves = Love.objects.filter(
+            post_id__in=[row[0] for row in chunk]
+        ).order_by('id').values_list('post_id', 'fan__username')
+        for post_id, username in loves:
+            fans[post_id].append(username)
+
+        for (post_id, date_created, date_modified, content, num_loves,
+             username, first_name, last_name) in chunk:
+            yield encoders.dumps(OrderedDict((
+                ('id', post_id),
+                ('date_created', _date_field.to_representation(date_created)),
+                ('date_modified',
+                 _date_field.to_representation(date_modified)),
+                ('content', content),
+                ('author', OrderedDict((
+                    ('username', username),
+                    ('first_name', first_name),
+                    ('last_name', last_name),
+                ))),
+                ('num_loves', num_loves),
+                ('fans', fans[post_id]),
+            ))) + b'\n'
@@ -0,0 +1,185 @@
+from django.conf import settings
+import redis
+
+
+class Leaderboard(object):
+    """
+    Ranking of posts by number of loves, kept in a Redis sorted set
+
+    Posts are scored with their negated love count, so ZRANGE walks them
+    most loved first and, ties having equal scores, by ascending id, the
+    same order as Post.order_queryset_by_num_loves. Members are zero
+    padded ids so they sort lexicographically like numbers.
+
+    The ranking is only read once it has been built by the
+    rebuild_leaderboard command; until then, or whenever Redis fails,
+    readers get None and should fall back to the database. Updates made
+    while a rebuild runs are applied to the ranking being built too, so
+    they survive the swap.
+    """
+    MEMBER_FORMAT = '{0:012d}'
+
+    def __init__(self, url=None):
+        self._url = url
+        self._client = None
+
+    @property
+    def key(self):
+        return settings.LEADERBOARD_KEY
+
+    @property
+    def ready_key(self):
+        return '{key}:ready'.format(key=self.key)
+
+    @property
+    def building_key(self):
+        return '{key}:building'.format(key=self.key)
+
+    @property
+    def rebuilding_key(self):
+        """Set while a rebuild runs"""
+        return '{key}:rebuilding'.format(key=self.key)
+
+    @property
+    def removed_key(self):
+        """Posts removed while a rebuild runs"""
+        return '{key}:removed'.format(key=self.key)
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.StrictRedis.from_url(
+                self._url or settings.REDIS_URL)
+        return self._client
+
+    def _member(self, post_id):
+        return self.MEMBER_FORMAT.format(int(post_id))
+
+    def _update(self, command, *args):
+        """Runs command(key, *args) on the ranking, and on the one being
+        built while a rebuild runs"""
+        try:
+            self._run_update(command, *args)
+        except redis.RedisError:
+            # a missed update would skew the ranking; stop serving it
+            # until it is rebuilt
+            try:
+                self.client.delete(self.ready_key)
+            except redis.RedisError:
+                pass
+
+    def _run_update(self, command, *args):
+        command(self.key, *args)
+        if self.client.exists(self.rebuilding_key):
+            command(self.building_key, *args)
+
+    def add(self, post_id, num_loves=0):
+        """Ranks a post with the given number of loves"""
+        def add_to(key, member):
+            if key == self.key:
+                self.client.zadd(key, -num_loves, member)
+            else:
+                # the rebuild may already have scored the post
+                self.client.zincrby(key, member, -num_loves)
+        self._update(add_to, self._member(post_id))
+
+    def incr(self, post_id, delta):
+        """Adds delta loves to the score of a post"""
+        self._update(self.client.zincrby, self._member(post_id), -delta)
+
+    def incr_many(self, deltas):
+        """
+        Adds loves to the scores of several posts in one round trip
+
+        Args:
+            deltas -- dictionary of post ids to the number of loves to add
+        """
+        def incr_all(key):
+            with self.client.pipeline() as pipe:
+                for post_id, delta in deltas.items():
+                    pipe.zincrby(key, self._member(post_id), -delta)
+                pipe.execute()
+        self._update(incr_all)
+
+    def remove(self, post_id):
+        """Removes a post from the ranking"""
+        def remove_from(key, member):
+            self.client.zrem(key, member)
+            if key == self.building_key:
+                # the rebuild may still read the post
+                self.client.sadd(self.removed_key, member)
+        self._update(remove_from, self._member(post_id))
+
+    def top(self, limit):
+        """
+        Returns the ids of the most loved posts, most loved first, or
+        None when the ranking is not available
+
+        Args:
+            limit -- the maximum number of ids to return
+        """
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.exists(self.ready_key)
+                pipe.zrange(self.key, 0, limit - 1)
+                ready, members = pipe.execute()
+        except redis.RedisError:
+            return None
+        if not ready:
+            return None
+        return [int(member) for member in members]
+
+    def rebuild(self, rows, chunk_size=1000):
+        """
+        Replaces the ranking with the given posts
+
+        The new ranking is written to a temporary key in chunks and then
+        swapped in, so readers never see a partial one. Loves, new posts
+        and deletions applied while it is built are applied to it as well.
+        Rows only add to the scores already there, so they should be read
+        lazily, once the rebuild has started; updates committed before the
+        rows are read would otherwise be counted twice.
+
+        Args:
+            rows -- iterable of (post_id, num_loves) pairs
+            chunk_size -- number of posts written per round trip
+        Returns:
+            the number of posts ranked
+        """
+        with self.client.pipeline() as pipe:
+            pipe.delete(self.building_key, self.removed_key)
+            pipe.set(self.rebuilding_key, 1)
+            pipe.execute()
+        try:
+            num_ranked = 0
+            pipe = self.client.pipeline(transaction=False)
+            for post_id, num_loves in rows:
+                pipe.zincrby(
+                    self.building_key, self._member(post_id), -num_loves)
+                num_ranked += 1
+                if num_ranked % chunk_size == 0:
+                    pipe.execute()
+            pipe.execute()
+
+            removed = self.client.smembers(self.removed_key)
+            with self.client.pipeline() as pipe:
+                if removed:
+                    pipe.zrem(self.building_key, *removed)
+                # unlike a rename, also swaps in an empty ranking
+                pipe.zunionstore(self.key, [self.building_key])
+                pipe.delete(self.building_key, self.rebuilding_key,
+                            self.removed_key)
+                pipe.set(self.ready_key, 1)
+                pipe.execute()
+        finally:
+            self.client.delete(self.rebuilding_key)
+        return num_ranked
+
+    def clear(self):
+        """Removes the ranking; readers fall back to the database"""
+        self.client.delete(
+            self.key, self.ready_key, self.building_key,
+            self.rebuilding_key, self.removed_key)
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,74 @@
+from __future__ import unicode_literals
+
+import timeit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import Profile
+from core import encoders
+from core.models import Post
+from core.serializers import PostSerializer
+
+
+class Command(BaseCommand):
+    help = ('Times the encoding of a feed page and of a broadcast frame with '
+            'each available JSON encoder backend')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size', type=int, default=20,
+            help='Number of posts on the feed page')
+        parser.add_argument(
+            '--iterations', type=int, default=2000,
+            help='Number of times each payload is encoded')
+
+    def handle(self, *args, **options):
+        page = self.build_page(options['page_size'])
+        payloads = [
+            ('feed page', {'next': None, 'previous': None, 'results': page}),
+            ('broadcast frame', {'type': 'post_update', 'data': page[0]}),
+        ]
+        backends = [name for name in sorted(encoders.BACKENDS)
+                    if name == 'json' or encoders.simplejson is not None]
+
+        for label, payload in payloads:
+            outputs = set(
+                encoders.dumps(payload, backend=name) for name in backends)
+            if len(outputs) != 1:
+                raise CommandError(
+                    'The backends encode the {label} differently'.format(
+                        label=label))
+
+            baseline = None
+            for name in backends:
+                seconds = min(timeit.repeat(
+                    lambda: encoders.dumps(payload, backend=name),
+                    number=options['iterations'], repeat=3))
+                per_call = seconds / options['iterations'] * 1e6
+                baseline = baseline or per_call
+                self.stdout.write(
+                    '{label:<16} {name:<11} {per_call:9.1f} us  '
+                    'x{speedup:.2f}'.format(
+                        label=label, name=name, per_call=per_call,
+                        speedup=baseline / per_call))
+
+    @staticmethod
+    def build_page(page_size):
+        """Serializes unsaved posts the way the feed does"""
+        now = timezone.now()
+        posts = []
+        for index in range(page_size):
+            author = User(
+                username='author{index}'.format(index=index),
+                first_name='Ada', last_name='Lovelace')
+            author.profile = Profile(
+                about='Notes on the analytical engine \u2014 \xe9t\xe9',
+                num_posts=index)
+            posts.append(Post(
+                id=index + 1, author=author, date_created=now,
+                content='A post about caf\xe9s and \u201cquotes\u201d, '
+                        'number {index}'.format(index=index) * 4,
+                num_loves=index * 3))
+        return PostSerializer(posts, many=True).data
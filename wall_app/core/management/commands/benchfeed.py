@@ -0,0 +1,256 @@
+from collections import Counter, OrderedDict
+import io
+import json
+import math
+import random
+import timeit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.six import StringIO
+from rest_framework.test import APIClient
+from rest_framework_jwt.settings import api_settings
+
+from accounts.cache import user_cache
+from accounts.models import Profile
+from core.cache import feed_cache
+from core.explain import is_explainable, rows_scanned, sequential_scans
+from core.models import Love, Post
+
+
+SCENARIOS = ('feed', 'top', 'private', 'detail', 'love')
+
+
+def percentile(values, percent):
+    """Returns the nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(ordered))) - 1
+    return ordered[max(rank, 0)]
+
+
+class Command(BaseCommand):
+    help = ('Seeds users, posts and loves, then times the feed, top posts, '
+            'private feed, post detail and love endpoints through the test '
+            'client and writes the results as JSON. The rows it seeds are '
+            'rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help='Number of users seeded, each authoring posts')
+        parser.add_argument(
+            '--posts', type=int, default=10000,
+            help='Number of posts seeded')
+        parser.add_argument(
+            '--loves', type=int, default=50000,
+            help='Number of loves seeded')
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Number of timed requests per scenario')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows inserted at a time while seeding')
+        parser.add_argument(
+            '--output', default='-',
+            help='File to write the JSON results to, the standard output by '
+                 'default')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(42)
+        started = timezone.now()
+        # requests are made to the test client's host
+        with override_settings(
+                ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+            with transaction.atomic():
+                viewer, post_ids = self.seed(
+                    options['users'], options['posts'], options['loves'],
+                    options['batch_size'])
+                self.reset_caches(viewer)
+                results = self.run_scenarios(
+                    viewer, post_ids, options['requests'])
+                transaction.set_rollback(True)
+        self.reset_caches(viewer)
+
+        report = OrderedDict((
+            ('started', started.isoformat()),
+            ('database', connection.vendor),
+            ('options', OrderedDict(
+                (name, options[name]) for name in (
+                    'users', 'posts', 'loves', 'requests'))),
+            ('scenarios', results),
+        ))
+        self.write_report(report, options['output'])
+
+    @staticmethod
+    def reset_caches(viewer):
+        """Drops the cached feed and viewer and rebuilds the leaderboard,
+        so they match the rows in the database"""
+        feed_cache.invalidate()
+        user_cache.invalidate(viewer.id)
+        call_command('rebuild_leaderboard', stdout=StringIO())
+
+    def seed(self, num_users, num_posts, num_loves, batch_size):
+        """
+        Creates users with profiles, posts spread over them and loves
+        between random users and posts, counted as they are created
+
+        Returns:
+            the user the requests are made as, and the ids of the posts
+        """
+        self.insert(User, [
+            User(username='benchfeed{index}'.format(index=index))
+            for index in range(num_users)
+        ], batch_size)
+        user_ids = list(User.objects.filter(
+            username__startswith='benchfeed').order_by('id').values_list(
+                'id', flat=True))
+
+        authors = [self.rng.choice(user_ids) for _ in range(num_posts)]
+        num_loves = min(num_loves, num_users * num_posts)
+        loves = set()
+        while len(loves) < num_loves:
+            loves.add((self.rng.choice(user_ids),
+                       self.rng.randrange(num_posts)))
+        love_counts = Counter(index for _, index in loves)
+
+        num_posts_by_user = Counter(authors)
+        self.insert(Profile, [
+            Profile(user_id=user_id, about='Feed benchmark',
+                    num_posts=num_posts_by_user[user_id])
+            for user_id in user_ids
+        ], batch_size)
+        self.insert(Post, [
+            Post(author_id=author_id, num_loves=love_counts[index],
+                 content='Benchmark post number {index}'.format(index=index))
+            for index, author_id in enumerate(authors)
+        ], batch_size)
+        post_ids = list(Post.objects.filter(
+            author_id__in=user_ids).order_by('id').values_list(
+                'id', flat=True))
+        self.insert(Love, [
+            Love(fan_id=fan_id, post_id=post_ids[index])
+            for fan_id, index in sorted(loves)
+        ], batch_size)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        return User.objects.get(id=user_ids[0]), post_ids
+
+    def insert(self, model_class, objects, batch_size):
+        """Inserts objects batch_size at a time, each batch in as many
+        statements as the database needs"""
+        for start in range(0, len(objects), batch_size):
+            model_class.objects.bulk_create(
+                objects[start:start + batch_size])
+
+    def get_client(self, viewer):
+        payload = api_settings.JWT_PAYLOAD_HANDLER(viewer)
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION='JWT ' + api_settings.JWT_ENCODE_HANDLER(
+                payload))
+        return client
+
+    def get_requests(self, scenario, post_ids, num_requests):
+        """Returns the (method, url, params) of the requests of a
+        scenario"""
+        list_url = reverse('post-list')
+        if scenario == 'feed':
+            return [('get', list_url, {})] * num_requests
+        if scenario == 'top':
+            return [('get', list_url, {'q': 'top'})] * num_requests
+        if scenario == 'private':
+            return [('get', list_url, {'private': True})] * num_requests
+        if scenario == 'detail':
+            return [
+                ('get', reverse('post-detail', kwargs={
+                    'pk': self.rng.choice(post_ids)}), {})
+                for _ in range(num_requests)
+            ]
+        # loves and unloves, of random posts
+        requests = []
+        for _ in range(num_requests // 2 or 1):
+            url = reverse('love-view', kwargs={
+                'post_id': self.rng.choice(post_ids)})
+            requests += [('post', url, {}), ('delete', url, {})]
+        return requests[:num_requests]
+
+    def run_scenarios(self, viewer, post_ids, num_requests):
+        client = self.get_client(viewer)
+        results = OrderedDict()
+        self.stderr.write(
+            '{scenario:<8} {p50:>8} {p95:>8} {p99:>8} {queries:>8} '
+            '{rows:>10}'.format(
+                scenario='scenario', p50='p50 ms', p95='p95 ms',
+                p99='p99 ms', queries='queries', rows='rows'))
+        for scenario in SCENARIOS:
+            requests = self.get_requests(scenario, post_ids, num_requests)
+            # warms up the caches the scenario relies on
+            method, url, params = requests[0]
+            getattr(client, method)(url, params)
+
+            timings, num_queries, captured = [], [], None
+            for method, url, params in requests:
+                with CaptureQueriesContext(connection) as context:
+                    started = timeit.default_timer()
+                    response = getattr(client, method)(url, params)
+                    timings.append(
+                        (timeit.default_timer() - started) * 1000)
+                if response.status_code >= 400:
+                    self.stderr.write('{scenario}: {method} {url} {status}'
+                                      .format(scenario=scenario,
+                                              method=method.upper(), url=url,
+                                              status=response.status_code))
+                num_queries.append(len(context.captured_queries))
+                captured = captured or context.captured_queries
+
+            results[scenario] = self.summarize(timings, num_queries, captured)
+            self.stderr.write(
+                '{scenario:<8} {p50_ms:>8.2f} {p95_ms:>8.2f} {p99_ms:>8.2f} '
+                '{queries_per_request:>8.1f} {rows_scanned!s:>10}'.format(
+                    scenario=scenario, **results[scenario]))
+        return results
+
+    @staticmethod
+    def summarize(timings, num_queries, queries):
+        """
+        Returns the latency percentiles and query counts of a scenario,
+        and the rows scanned and tables read in full by the queries of its
+        first request
+
+        Rows scanned are only known on PostgreSQL, and null elsewhere.
+        """
+        statements = [
+            query['sql'] for query in queries or []
+            if is_explainable(query['sql'])
+        ]
+        scanned = [rows_scanned(sql) for sql in statements]
+        full_scans = sorted(set(
+            table for sql in statements for table in sequential_scans(sql)))
+        return OrderedDict((
+            ('requests', len(timings)),
+            ('mean_ms', round(sum(timings) / len(timings), 3)),
+            ('p50_ms', round(percentile(timings, 50), 3)),
+            ('p95_ms', round(percentile(timings, 95), 3)),
+            ('p99_ms', round(percentile(timings, 99), 3)),
+            ('queries_per_request',
+             round(float(sum(num_queries)) / len(num_queries), 2)),
+            ('rows_scanned', None if None in scanned else sum(scanned)),
+            ('sequential_scans', full_scans),
+        ))
+
+    def write_report(self, report, output):
+        encoded = json.dumps(report, indent=2)
+        if output == '-':
+            self.stdout.write(encoded)
+            return
+        with io.open(output, 'w', encoding='utf-8') as stream:
+            stream.write(u'{report}\n'.format(report=encoded))
+        self.stderr.write('Results written to {output}'.format(output=output))
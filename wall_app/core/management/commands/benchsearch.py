@@ -0,0 +1,101 @@
+import random
+import timeit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import Profile
+from core.explain import sequential_scans
+from core.models import Post
+
+
+VOCABULARY = (
+    'django channels redis websocket python wall post love feed cursor '
+    'index query cache broadcast worker profile search vector rank page '
+    'coffee weekend hiking photos music guitar garden travel recipe '
+    'football sunset library museum concert bicycle mountain river'
+).split()
+
+# Common, rare and multi-word searches
+QUERIES = ('django', 'guitar sunset', 'museum river bicycle', 'nonexistent')
+
+
+class Command(BaseCommand):
+    help = ('Times searching posts against a naive icontains filter over a '
+            'seeded corpus. The posts it seeds are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1000000,
+            help='Number of posts in the corpus')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of posts inserted at a time while seeding')
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Number of times each search is run')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['posts'], options['batch_size'],
+                      options['verbosity'])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE core_post')
+            self.compare(options['iterations'])
+            transaction.set_rollback(True)
+
+    def compare(self, iterations):
+        self.stdout.write(
+            '{query:<22} {path:<8} {ms:>9} {hits:>5}  scans'.format(
+                query='query', path='path', ms='ms/page', hits='hits'))
+        for terms in QUERIES:
+            searches = [
+                ('search', Post.search(Post.objects.all(), terms)),
+                ('naive', self.naive_search(terms)),
+            ]
+            for path, queryset in searches:
+                page = queryset[:20]
+                seconds = min(timeit.repeat(
+                    lambda: list(page.values_list('pk', flat=True)),
+                    number=iterations, repeat=3))
+                sql, params = page.values_list(
+                    'pk', flat=True).query.sql_with_params()
+                self.stdout.write(
+                    '{query:<22} {path:<8} {ms:>9.2f} {hits:>5}  '
+                    '{scans}'.format(
+                        query=terms, path=path,
+                        ms=seconds / iterations * 1000, hits=page.count(),
+                        scans=', '.join(sequential_scans(sql, params)) or
+                        '-'))
+
+    @staticmethod
+    def naive_search(terms):
+        queryset = Post.objects.all()
+        for term in terms.split():
+            queryset = queryset.filter(content__icontains=term)
+        return queryset.order_by('-id')
+
+    def seed(self, num_posts, batch_size, verbosity=1):
+        """Creates num_posts posts of random words by a few authors"""
+        rng = random.Random(42)
+        authors = []
+        for index in range(10):
+            author = User.objects.create_user(
+                'benchsearch{index}'.format(index=index))
+            Profile.objects.create(user=author, about='Search benchmark')
+            authors.append(author)
+
+        num_created = 0
+        while num_created < num_posts:
+            batch = [
+                Post(author=rng.choice(authors),
+                     content=' '.join(rng.sample(VOCABULARY, 8)))
+                for _ in range(min(batch_size, num_posts - num_created))
+            ]
+            Post.objects.bulk_create(batch)
+            num_created += len(batch)
+            if verbosity >= 2:
+                self.stdout.write('{num} posts seeded'.format(
+                    num=num_created))
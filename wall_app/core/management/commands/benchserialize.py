@@ -0,0 +1,102 @@
+import gc
+import timeit
+import types
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Profile
+from core.models import Love, Post
+from core.serializers import PostRowSerializer, PostSerializer
+
+
+SHARED_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType,
+)
+
+
+def deep_sizeof(objects):
+    """
+    Returns the bytes taken by objects and everything they refer to,
+    leaving out classes, modules and functions, which are shared
+    """
+    seen = set()
+    pending = list(objects)
+    size = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += obj.__sizeof__()
+        pending.extend(gc.get_referents(obj))
+    return size
+
+
+class Command(BaseCommand):
+    help = ('Compares loading and serializing a feed page as posts with '
+            'PostSerializer and as rows with PostRowSerializer. The posts '
+            'it seeds are rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size', type=int, default=50,
+            help='Number of posts on the page')
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Number of times each page is loaded and serialized')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            viewer = self.seed(options['page_size'])
+            self.compare(viewer, options['page_size'], options['iterations'])
+            transaction.set_rollback(True)
+
+    def compare(self, viewer, page_size, iterations):
+        queryset = Post.get_queryset(viewer.id)[:page_size]
+        paths = [
+            ('posts', queryset, PostSerializer),
+            ('rows', queryset.as_rows(), PostRowSerializer),
+        ]
+        outputs = []
+        self.stdout.write('{path:<6} {ms:>10} {queries:>8} {bytes:>11}'.format(
+            path='path', ms='ms/page', queries='queries', bytes='page bytes'))
+        for name, page_queryset, serializer_class in paths:
+            def serialize_page():
+                return serializer_class(
+                    list(page_queryset.all()), many=True).data
+
+            with CaptureQueriesContext(connection) as context:
+                outputs.append(serialize_page())
+            page = list(page_queryset.all())
+            seconds = min(timeit.repeat(
+                serialize_page, number=iterations, repeat=3))
+            self.stdout.write(
+                '{path:<6} {ms:>10.2f} {queries:>8} {bytes:>11}'.format(
+                    path=name, ms=seconds / iterations * 1000,
+                    queries=len(context.captured_queries),
+                    bytes=deep_sizeof(page)))
+
+        if outputs[0] != outputs[1]:
+            self.stderr.write('The two paths serialize the page differently')
+
+    @staticmethod
+    def seed(num_posts):
+        """Creates num_posts posts by as many authors, returns a viewer
+        who loves every other post"""
+        viewer = User.objects.create_user('benchviewer')
+        Profile.objects.create(user=viewer, about='Viewer')
+        for index in range(num_posts):
+            author = User.objects.create_user(
+                'benchauthor{index}'.format(index=index),
+                first_name='Ada', last_name='Lovelace')
+            Profile.objects.create(user=author, about='About Ada')
+            post = Post.objects.create(
+                author=author,
+                content='Benchmark post number {index}'.format(index=index))
+            if index % 2:
+                Love.objects.create(fan=viewer, post=post)
+        return viewer
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import (
+    CHUNK_SIZE, get_export_queryset, iter_ndjson, parse_date,
+)
+
+
+class Command(BaseCommand):
+    help = ('Exports the posts of the wall, their authors and fans, as '
+            'NDJSON, streaming them from the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='File to write to, the standard output by default')
+        parser.add_argument(
+            '--author', help='Only export the posts of this username')
+        parser.add_argument(
+            '--since', help='Only export posts modified at or after this '
+                            'ISO 8601 datetime')
+        parser.add_argument(
+            '--until', help='Only export posts modified before this '
+                            'ISO 8601 datetime')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Number of posts fetched from the cursor at a time')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_date(options['since'])
+            until = parse_date(options['until'])
+        except ValueError as error:
+            raise CommandError(error)
+        queryset = get_export_queryset(options['author'], since, until)
+
+        lines = iter_ndjson(queryset, options['chunk_size'])
+        num_posts = 0
+        if options['output'] == '-':
+            for num_posts, line in enumerate(lines, 1):
+                self.stdout.write(line, ending='')
+        else:
+            with open(options['output'], 'wb') as stream:
+                for num_posts, line in enumerate(lines, 1):
+                    stream.write(line)
+        self.stderr.write('{num} posts exported'.format(num=num_posts))
@@ -0,0 +1,262 @@
+from collections import Counter
+from contextlib import contextmanager
+import csv
+import io
+from itertools import islice
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.cache import user_cache
+from accounts.models import Profile
+from core.cache import feed_cache
+from core.models import Love, Post
+from core.versions import ContentVersions, content_versions
+
+
+def read_jsonl(path):
+    """Yields the line number and record of every line of a JSONL file"""
+    with io.open(path, encoding='utf-8') as lines:
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, None
+
+
+def read_csv(path):
+    """Yields the line number and record of every row of a CSV file with
+    a header row"""
+    with open(path, 'rb') as lines:
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, dict(
+                (key, value.decode('utf-8'))
+                for key, value in row.items() if key and value)
+
+
+READERS = {
+    'jsonl': read_jsonl,
+    'csv': read_csv,
+}
+
+
+@contextmanager
+def explicit_dates(*model_classes):
+    """Lets the dates of imported rows be set instead of stamped with the
+    time of the import"""
+    fields = [
+        field for model_class in model_classes
+        for field in model_class._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or
+        getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(auto_field, auto_field.auto_now, auto_field.auto_now_add)
+             for auto_field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def increment(queryset, key, field, counts):
+    """
+    Adds to a counter of several rows in a single UPDATE
+
+    Args:
+        queryset -- the rows to update
+        key -- the name of the field identifying the rows in counts
+        field -- the name of the counter
+        counts -- dictionary of key values to the amount to add
+    """
+    if not counts:
+        return
+    queryset.filter(**{key + '__in': list(counts)}).update(**{
+        field: models.F(field) + models.Case(
+            *[models.When(then=models.Value(count), **{key: value})
+              for value, count in counts.items()],
+            default=models.Value(0), output_field=models.IntegerField())
+    })
+
+
+class Command(BaseCommand):
+    help = ('Imports posts and loves from a JSONL or CSV file in chunks, '
+            'with bulk inserts and without broadcasting every row')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The JSONL or CSV file to import')
+        parser.add_argument(
+            '--format', choices=sorted(READERS), default=None,
+            help='Format of the file, guessed from its extension by default')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of records inserted per transaction')
+        parser.add_argument(
+            '--id-offset', type=int, default=0,
+            help='Added to the post ids of the file, to keep them clear of '
+                 'the posts already on the wall')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError(
+                'Unknown format {format!r}, use --format'.format(
+                    format=file_format))
+        self.id_offset = options['id_offset']
+        self.stats = Counter(rows=0, posts=0, loves=0, skipped=0)
+
+        records = READERS[file_format](path)
+        started = time.time()
+        with explicit_dates(Post, Love):
+            while True:
+                chunk = list(islice(records, options['chunk_size']))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+                self.stats['rows'] += len(chunk)
+                if options['verbosity'] >= 2:
+                    self.stdout.write('{rows} rows read'.format(
+                        rows=self.stats['rows']))
+
+        self.reset_post_sequence()
+        feed_cache.invalidate()
+        content_versions.bump(ContentVersions.WALL)
+        call_command('rebuild_leaderboard', stdout=self.stdout)
+
+        seconds = max(time.time() - started, 1e-6)
+        self.stdout.write(
+            '{rows} rows read: {posts} posts and {loves} loves imported, '
+            '{skipped} skipped in {seconds:.1f}s ({rate:.0f} rows/s)'.format(
+                seconds=seconds, rate=self.stats['rows'] / seconds,
+                **self.stats))
+
+    def skip(self, line_number, reason):
+        self.stats['skipped'] += 1
+        self.stderr.write('line {line}: {reason}'.format(
+            line=line_number, reason=reason))
+
+    def import_chunk(self, chunk):
+        """Imports the posts of a chunk, then its loves, so loves may
+        follow their post in the same chunk"""
+        posts, loves = [], []
+        for line_number, record in chunk:
+            kind = record and record.get('type')
+            if kind == 'post':
+                posts.append((line_number, record))
+            elif kind == 'love':
+                loves.append((line_number, record))
+            else:
+                self.skip(line_number, 'not a post or a love record')
+
+        user_ids = dict(User.objects.filter(username__in=set(
+            record.get('author') or record.get('fan')
+            for _, record in posts + loves
+        )).values_list('username', 'id'))
+        self.import_posts(posts, user_ids)
+        self.import_loves(loves, user_ids)
+
+    def import_posts(self, records, user_ids):
+        new_posts = {}
+        for line_number, record in records:
+            try:
+                post_id = int(record['id']) + self.id_offset
+                date_created = self.parse_date(record.get('date_created'))
+                post = Post(
+                    id=post_id, author_id=user_ids[record.get('author')],
+                    content=record['content'], date_created=date_created,
+                    date_modified=date_created)
+            except (KeyError, TypeError, ValueError):
+                self.skip(line_number, 'invalid post or unknown author')
+                continue
+            if post_id in new_posts:
+                self.skip(line_number, 'duplicate post {id}'.format(
+                    id=post_id))
+                continue
+            new_posts[post_id] = post
+
+        existing = set(Post.objects.filter(
+            id__in=list(new_posts)).values_list('id', flat=True))
+        self.stats['skipped'] += len(existing)
+        new_posts = [
+            new_post for new_post_id, new_post in sorted(new_posts.items())
+            if new_post_id not in existing
+        ]
+        Post.objects.bulk_create(new_posts)
+        num_posts = Counter(post.author_id for post in new_posts)
+        increment(Profile.objects.all(), 'user_id', 'num_posts', num_posts)
+        user_cache.invalidate_many(num_posts)
+        for user_id in num_posts:
+            content_versions.bump(ContentVersions.user(user_id))
+        self.stats['posts'] += len(new_posts)
+
+    def import_loves(self, records, user_ids):
+        new_loves = {}
+        for line_number, record in records:
+            try:
+                key = (user_ids[record.get('fan')],
+                       int(record['post_id']) + self.id_offset)
+                date_created = self.parse_date(record.get('date_created'))
+            except (KeyError, TypeError, ValueError):
+                self.skip(line_number, 'invalid love or unknown fan')
+                continue
+            if key in new_loves:
+                self.skip(line_number, 'duplicate love')
+                continue
+            new_loves[key] = (line_number, date_created)
+
+        post_ids = set(Post.objects.filter(id__in=set(
+            post_id for _, post_id in new_loves)).values_list('id', flat=True))
+        existing = set(Love.objects.filter(
+            fan_id__in=set(fan_id for fan_id, _ in new_loves),
+            post_id__in=post_ids).values_list('fan_id', 'post_id'))
+        loves = []
+        for (fan_id, post_id), (line_number, date_created) in sorted(
+                new_loves.items()):
+            if post_id not in post_ids:
+                self.skip(line_number, 'unknown post {id}'.format(id=post_id))
+            elif (fan_id, post_id) in existing:
+                self.stats['skipped'] += 1
+            else:
+                loves.append(Love(
+                    fan_id=fan_id, post_id=post_id,
+                    date_created=date_created, date_modified=date_created))
+        Love.objects.bulk_create(loves)
+        increment(Post.objects.all(), 'id', 'num_loves',
+                  Counter(love.post_id for love in loves))
+        self.stats['loves'] += len(loves)
+
+    @staticmethod
+    def parse_date(value):
+        """Returns the aware datetime of an ISO 8601 string, now when it
+        is empty"""
+        if not value:
+            return timezone.now()
+        date = parse_datetime(value)
+        if date is None:
+            raise ValueError(value)
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    @staticmethod
+    def reset_post_sequence():
+        """Moves the id sequence of posts past the imported ids"""
+        statements = connection.ops.sequence_reset_sql(no_style(), [Post])
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
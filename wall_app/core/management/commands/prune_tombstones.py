@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import PostTombstone
+
+
+class Command(BaseCommand):
+    help = ('Deletes the tombstones of posts deleted longer ago than sync '
+            'tokens are accepted')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+            help='Keep the tombstones of posts deleted in the last days')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        num_deleted = PostTombstone.prune(before)
+        self.stdout.write('{num} tombstones pruned'.format(num=num_deleted))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.leaderboard import leaderboard
+from core.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the top posts leaderboard from the stored love counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of posts written to Redis per round trip')
+
+    def handle(self, *args, **options):
+        rows = Post.objects.order_by().values_list(
+            'id', 'num_loves').iterator()
+        num_ranked = leaderboard.rebuild(rows, options['chunk_size'])
+        self.stdout.write('{ranked} posts ranked'.format(ranked=num_ranked))
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from core.cache import feed_cache
+from core.leaderboard import leaderboard
+from core.models import Love, Post
+from core.versions import ContentVersions, content_versions
+
+
+class Command(BaseCommand):
+    help = 'Recounts the loves of every post and repairs drifted num_loves'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of posts locked and recounted per transaction')
+        parser.add_argument(
+            '--dry-run', action='store_true', default=False,
+            help='Report drifted posts without repairing them')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        num_checked = num_repaired = 0
+        last_id = 0
+
+        while True:
+            with transaction.atomic():
+                stored = list(
+                    Post.objects.select_for_update()
+                    .filter(id__gt=last_id).order_by('id')
+                    .values_list('id', 'num_loves')[:chunk_size]
+                )
+                if not stored:
+                    break
+                post_ids = [post_id for post_id, _ in stored]
+                actual = dict(
+                    Love.objects.filter(post_id__in=post_ids).order_by()
+                    .values_list('post').annotate(num_loves=models.Count('id'))
+                )
+                deltas = {}
+                for post_id, num_loves in stored:
+                    expected = actual.get(post_id, 0)
+                    if num_loves == expected:
+                        continue
+                    num_repaired += 1
+                    self.stdout.write(
+                        'post {id}: {stored} -> {expected}'.format(
+                            id=post_id, stored=num_loves, expected=expected))
+                    if not dry_run:
+                        Post.objects.filter(id=post_id).update(
+                            num_loves=expected)
+                        deltas[post_id] = expected - num_loves
+                if deltas:
+                    self.publish_repairs(deltas)
+            num_checked += len(stored)
+            last_id = post_ids[-1]
+
+        self.stdout.write(
+            '{checked} posts checked, {repaired} {verb}'.format(
+                checked=num_checked, repaired=num_repaired,
+                verb='drifted' if dry_run else 'repaired'))
+
+    @staticmethod
+    def publish_repairs(deltas):
+        """
+        Moves the repaired posts on the leaderboard by as many loves as
+        their counters moved, and retires the cached feed pages and
+        validators showing the old counts, once the chunk commits
+
+        Args:
+            deltas -- dictionary of post ids to the number of loves added
+        """
+        content_versions.bump(ContentVersions.WALL)
+        transaction.on_commit(feed_cache.invalidate)
+        transaction.on_commit(lambda: leaderboard.incr_many(deltas))
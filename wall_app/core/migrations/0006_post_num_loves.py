@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 20:17
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_auto_20170411_0821'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='num_loves',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
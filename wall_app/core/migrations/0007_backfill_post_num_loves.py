@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def backfill_num_loves(apps, schema_editor):
+    """Stores the current number of loves of every loved post"""
+    Love = apps.get_model('core', 'Love')
+    Post = apps.get_model('core', 'Post')
+    counts = Love.objects.order_by().values_list('post').annotate(
+        num_loves=models.Count('id'))
+    for post_id, num_loves in counts.iterator():
+        Post.objects.filter(id=post_id).update(num_loves=num_loves)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_post_num_loves'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_num_loves, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# The search vector of posts only exists on PostgreSQL, where a trigger
+# keeps it in step with the content, however the posts are written, and a
+# GIN index serves the searches; see Post.search
+FORWARD_SQL = [
+    'ALTER TABLE core_post ADD COLUMN search_vector tsvector',
+    "UPDATE core_post SET search_vector = "
+    "to_tsvector('pg_catalog.english', content)",
+    'CREATE INDEX core_post_search_vector_gin ON core_post '
+    'USING gin (search_vector)',
+    'CREATE TRIGGER core_post_search_vector_update '
+    'BEFORE INSERT OR UPDATE OF content ON core_post FOR EACH ROW '
+    'EXECUTE PROCEDURE tsvector_update_trigger('
+    "search_vector, 'pg_catalog.english', content)",
+]
+BACKWARD_SQL = [
+    'DROP TRIGGER IF EXISTS core_post_search_vector_update ON core_post',
+    'ALTER TABLE core_post DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_auto_20261018_2123'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(FORWARD_SQL), run_on_postgresql(BACKWARD_SQL)),
+    ]
@@ -1,23 +1,178 @@
 from __future__ import unicode_literals
 
+from collections import OrderedDict, namedtuple
+
+from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.query import ModelIterable
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
 
-from accounts.models import Base
+from accounts.models import Base, Profile
 
-from .consumers import (
-    send_post_delete_command_to_clients, send_love_status_to_clients,
-    send_post_to_clients,
-)
+from .cache import feed_cache
+from .leaderboard import leaderboard
+from .versions import ContentVersions, content_versions
+from .consumers import queue_broadcast, queue_love_updates
+
+
+# Compact read-only stand-ins for a post and its author, see
+# PostQuerySet.as_rows()
+PostRow = namedtuple('PostRow', [
+    'id', 'date_created', 'date_modified', 'content', 'num_loves',
+    'in_love', 'author',
+])
+AuthorRow = namedtuple('AuthorRow', [
+    'username', 'first_name', 'last_name', 'about', 'profile_pic',
+    'num_posts',
+])
+
+
+class PostQuerySet(models.QuerySet):
+    """
+    Queryset of posts that can be evaluated in two phases
+
+    Once for_viewer() is applied, evaluating the queryset first selects
+    only the ids of the matching posts, which a suitable index can serve
+    without touching the table. The posts, their authors and profiles and
+    whether the viewer loves them are then loaded for those ids alone, so
+    the cost of a page depends on its size rather than on the number of
+    posts and loves on the wall.
+    """
+
+    # The columns loaded for a PostRow, in the order of its fields
+    ROW_VALUES = (
+        'id', 'date_created', 'date_modified', 'content', 'num_loves',
+        'author__username', 'author__first_name', 'author__last_name',
+        'author__profile__about', 'author__profile__profile_pic',
+        'author__profile__num_posts',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(PostQuerySet, self).__init__(*args, **kwargs)
+        self._viewer_id = None
+        self._two_phase = False
+        self._as_rows = False
+
+    def for_viewer(self, user_id):
+        """
+        Returns the posts as seen by a user, with in_love set on each
+
+        Args:
+            user_id -- the id of the current user, None when anonymous
+        """
+        clone = self._clone()
+        clone._viewer_id = user_id
+        clone._two_phase = True
+        return clone
+
+    def as_rows(self):
+        """
+        Returns the posts as PostRow tuples rather than model instances
+
+        The second phase reads flat rows with values_list() and builds no
+        Post, User or Profile instances. The rows are read only and only
+        carry the fields PostRowSerializer needs; annotations are not
+        kept. Only applies after for_viewer().
+        """
+        clone = self._clone()
+        clone._as_rows = True
+        return clone
+
+    def _clone(self, **kwargs):
+        clone = super(PostQuerySet, self)._clone(**kwargs)
+        clone._viewer_id = self._viewer_id
+        clone._two_phase = self._two_phase
+        clone._as_rows = self._as_rows
+        return clone
+
+    def _fetch_all(self):
+        if (self._result_cache is None and self._two_phase and
+                self._iterable_class is ModelIterable):
+            self._result_cache = self._fetch_in_two_phases()
+        super(PostQuerySet, self)._fetch_all()
+
+    def _fetch_in_two_phases(self):
+        # Phase one: the ids of the page, plus any annotations the
+        # queryset selects, e.g. ones it is ordered by
+        annotation_names = list(self.query.annotation_select)
+        rows = list(self.values_list('pk', *annotation_names))
+        post_ids = [row[0] for row in rows]
+        if not post_ids:
+            return []
+
+        # Phase two: everything needed to serialize those posts
+        if self._as_rows:
+            posts = self._fetch_rows(post_ids)
+        else:
+            posts = self.model._base_manager.using(self.db).select_related(
+                'author__profile').in_bulk(post_ids)
+        loved_post_ids = set()
+        if self._viewer_id is not None:
+            loved_post_ids = set(Love.objects.using(self.db).filter(
+                fan_id=self._viewer_id, post_id__in=post_ids
+            ).values_list('post_id', flat=True))
+
+        results = []
+        for row in rows:
+            post = posts.get(row[0])
+            if post is None:
+                # deleted since the ids were selected
+                continue
+            in_love = post.id in loved_post_ids
+            if self._as_rows:
+                results.append(post._replace(in_love=in_love))
+                continue
+            for name, value in zip(annotation_names, row[1:]):
+                setattr(post, name, value)
+            post.in_love = in_love
+            results.append(post)
+        return results
+
+    def _fetch_rows(self, post_ids):
+        rows = self.model._base_manager.using(self.db).filter(
+            id__in=post_ids).values_list(*self.ROW_VALUES)
+        posts = {}
+        for row in rows:
+            posts[row[0]] = PostRow(
+                *row[:5], in_love=False, author=AuthorRow(*row[5:]))
+        return posts
+
+
+# ts_rank is a float; ranks are multiplied by this and rounded to compare
+# them exactly, see Post.search()
+SEARCH_RANK_SCALE = 1000000
 
 
 class Post(Base):
     """Represents posts on the app"""
     content = models.TextField()
     author = models.ForeignKey('auth.user', related_name='posts')
+    num_loves = models.PositiveIntegerField(default=0, editable=False)
+
+    # Whether the viewer loves the post; set by PostQuerySet.for_viewer()
+    in_love = False
+    # The post encoded to JSON on its last save; set by encode()
+    encoded = None
+
+    COUNTER_FIELDS = ('num_loves',)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('date_modified',)
+        indexes = [
+            # the feed, ?private= and ?q=top orderings
+            models.Index(fields=['-date_modified', '-id'],
+                         name='core_post_date_mo_4f24fa_idx'),
+            models.Index(fields=['author', '-date_modified', '-id'],
+                         name='core_post_author__131485_idx'),
+            models.Index(fields=['-num_loves', 'id'],
+                         name='core_post_num_lov_290105_idx'),
+        ]
 
     def __unicode__(self):
         return '{author} {date_created}'.format(
@@ -29,34 +184,78 @@ class Post(Base):
         """
         Hooking send_notification into the save of the object rather than
         use signals.
+
+        New posts are also counted on their author's profile and ranked
+        on the leaderboard once committed.
         """
-        result = super(Post, self).save(*args, **kwargs)
-        self.update_connected_users_on_save()
+        adding = self._state.adding
+        with transaction.atomic():
+            result = super(Post, self).save(*args, **kwargs)
+            if adding:
+                Profile.update_num_posts(self.author, 1)
+                post_id = self.id
+                transaction.on_commit(lambda: leaderboard.add(post_id))
+        self.update_connected_users_on_save(created=adding)
         return result
 
     def delete(self, *args, **kwargs):
         """
         Trigger the notifying of users on the websocket about the removal
         of models
+
+        The post leaves the leaderboard through unrank_deleted_post(), its
+        tombstone is left by bury_deleted_post() and its author's post
+        count moved by uncount_deleted_post().
         """
         post_id = self.id
-        result = super(Post, self).delete(*args, **kwargs)
+        with transaction.atomic():
+            # the counter and rank of the post go away with it
+            Love.delete_uncounted(Love.objects.filter(post_id=post_id))
+            result = super(Post, self).delete(*args, **kwargs)
         Post.update_connected_users_on_delete(post_id)
         return result
 
-    def update_connected_users_on_save(self):
+    def update_connected_users_on_save(self, created=False):
         """
-        Send a notification to everyone connected to our websocket
+        Drop the cached feed, move the version of the wall and, once the
+        transaction commits, have the worker notify our websocket clients
         of the post just created or updated
+
+        The post is encoded here, from this instance, so the worker only
+        has to pass the frame on.
+
+        Args:
+            created -- whether the post was just created
         """
-        queryset = Post.get_queryset(None)
-        post = queryset.filter(id=self.id)[0]
-        send_post_to_clients(post)
+        feed_cache.invalidate()
+        content_versions.bump(ContentVersions.WALL)
+        post_id = self.id
+        event = 'post_create' if created else 'post_update'
+        encoded = self.encode()
+        transaction.on_commit(
+            lambda: queue_broadcast(event, post_id, encoded))
+
+    def encode(self):
+        """
+        Encodes the post to JSON as the API renders it to viewers who do
+        not love it, and keeps the result on the post as encoded
+
+        The stored num_loves of this instance is used as is.
+        """
+        from .serializers import encode_post
+        self.encoded = encode_post(self)
+        return self.encoded
 
     @staticmethod
     def update_connected_users_on_delete(post_id):
-        """Send notification of delete on websocket channel"""
-        send_post_delete_command_to_clients(post_id)
+        """
+        Send notification of delete on websocket channel once the
+        transaction commits
+        """
+        feed_cache.invalidate()
+        content_versions.bump(ContentVersions.WALL)
+        transaction.on_commit(
+            lambda: queue_broadcast('post_delete', post_id))
 
     @staticmethod
     def get_queryset(user_id):
@@ -65,23 +264,103 @@ class Post(Base):
 
         This function appends to each object the field: in_love,
          which indicates whether the current user loves the post or not
-        and the field: num_loves, which represents the number of
-        loves the post has.
+        The number of loves each post has is read from the stored
+        num_loves column. The queryset is evaluated in two phases, see
+        PostQuerySet, so only the posts that are returned have their
+        authors, profiles and love status loaded.
 
         Args:
             user_id -- the id of the current user
         """
-        loves = Love.objects.filter(post=models.OuterRef('pk'),
-                                    fan__id=user_id)
-        qs = Post.objects.annotate(
-            num_loves=models.Count('loves__post')).annotate(
-                in_love=models.Exists(loves.values('id'))
-        ).order_by('-date_modified')
+        qs = Post.objects.for_viewer(user_id).order_by(
+            '-date_modified', '-id')
         return qs
 
     @staticmethod
-    def order_queryset_by_num_loves(queryset, limit):
-        return queryset.order_by('-num_loves')[0:limit]
+    def update_num_loves(post_id, delta):
+        """
+        Adjusts the stored love count of a post in the database
+
+        Args:
+            post_id -- a post id
+            delta -- the number of loves to add, negative to remove
+        """
+        Post.objects.filter(id=post_id).update(
+            num_loves=models.F('num_loves') + delta)
+
+    @staticmethod
+    def order_queryset_by_num_loves(queryset, limit=None):
+        """Returns the posts ordered by number of loves, most loved first
+
+        Args:
+            queryset -- queryset of posts
+            limit -- maximum number of posts to return, all when None
+        """
+        queryset = queryset.order_by('-num_loves', 'id')
+        if limit is None:
+            return queryset
+        return queryset[0:limit]
+
+    @staticmethod
+    def filter_top_ranked(queryset, limit):
+        """Returns the posts narrowed to the most loved ones on the
+        leaderboard, or unchanged when the leaderboard is not available
+
+        Reading the ids from the leaderboard spares the database from
+        ranking every post on the wall; the posts are still loaded and
+        ordered from the database. Twice as many ids as wanted are read,
+        so a few stale ones do not cut the page short, and when fewer than
+        limit of them match the queryset it is returned unchanged.
+
+        Args:
+            queryset -- queryset of posts
+            limit -- the number of top posts wanted
+        """
+        post_ids = leaderboard.top(limit * 2)
+        if post_ids is None:
+            return queryset
+        ranked = queryset.filter(id__in=post_ids)
+        num_matching = len(
+            ranked.order_by().values_list('id', flat=True)[:limit])
+        if num_matching < min(limit, len(post_ids)):
+            return queryset
+        return ranked
+
+    @staticmethod
+    def search(queryset, terms):
+        """Returns the posts whose content matches the search terms, best
+        match first, annotated with their search_rank
+
+        On PostgreSQL the terms are matched against the search vector of
+        the posts, which a GIN index serves, and ranked with ts_rank,
+        scaled to an integer so pages can be cut on it exactly; equal
+        ranks are ordered by id, newest first. Elsewhere posts containing
+        every term are returned newest first, all with a rank of 0.
+
+        Args:
+            queryset -- queryset of posts
+            terms -- the search string
+        """
+        if connection.vendor == 'postgresql':
+            vector = '{table}.search_vector'.format(
+                table=connection.ops.quote_name(Post._meta.db_table))
+            tsquery = "plainto_tsquery('pg_catalog.english', %s)"
+            queryset = queryset.extra(
+                where=['{vector} @@ {tsquery}'.format(
+                    vector=vector, tsquery=tsquery)],
+                params=[terms])
+            rank = RawSQL(
+                '(ts_rank({vector}, {tsquery}) * {scale})::integer'.format(
+                    vector=vector, tsquery=tsquery, scale=SEARCH_RANK_SCALE),
+                [terms], output_field=models.IntegerField())
+            return queryset.annotate(search_rank=rank).order_by(
+                '-search_rank', '-id')
+
+        for term in terms.split():
+            queryset = queryset.filter(content__icontains=term)
+        return queryset.annotate(
+            search_rank=models.Value(0, output_field=models.IntegerField())
+        ).order_by('-id')
 
     @staticmethod
     def filter_others_post(queryset, auth_user):
@@ -97,11 +376,138 @@ class Post(Base):
             return queryset
 
 
+@receiver(post_delete, sender=Post)
+def unrank_deleted_post(sender, instance, **kwargs):
+    """
+    Removes a deleted post from the leaderboard once the transaction
+    commits
+
+    A signal, unlike Post.delete(), is also sent for the posts deleted with
+    a queryset or along with their author.
+    """
+    post_id = instance.id
+    transaction.on_commit(lambda: leaderboard.remove(post_id))
+
+
+@receiver(post_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    """
+    Keeps the num_posts counter of the author's profile in step with
+    removed posts, whether deleted alone, with a queryset or along with
+    their author
+    """
+    if Post.author.is_cached(instance):
+        author = instance.author
+    else:
+        # spares a query per post when deleting in bulk
+        author = User(id=instance.author_id)
+    Profile.update_num_posts(author, -1)
+
+
+class PostTombstone(models.Model):
+    """
+    Records the deletion of a post, so clients syncing the feed with
+    ?since= learn of it; see core.sync
+
+    Tombstones are kept for SYNC_TOMBSTONE_RETENTION_DAYS, after which
+    the prune_tombstones command removes them.
+    """
+    post_id = models.IntegerField()
+    author_id = models.IntegerField()
+    date_deleted = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date_deleted', 'post_id'],
+                         name='core_postto_date_de_8b8d65_idx'),
+        ]
+
+    def __unicode__(self):
+        return 'post {post_id} deleted {date_deleted}'.format(
+            post_id=self.post_id, date_deleted=self.date_deleted)
+
+    @staticmethod
+    def prune(before):
+        """
+        Deletes the tombstones of posts deleted before a datetime
+
+        Returns:
+            the number of tombstones deleted
+        """
+        num_deleted, _ = PostTombstone.objects.filter(
+            date_deleted__lt=before).delete()
+        return num_deleted
+
+
+@receiver(post_delete, sender=Post)
+def bury_deleted_post(sender, instance, **kwargs):
+    """
+    Leaves a tombstone of a deleted post for clients syncing the feed and
+    moves the version of the wall
+
+    Like unrank_deleted_post(), this also runs for the posts deleted with a
+    queryset or along with their author.
+    """
+    PostTombstone.objects.create(
+        post_id=instance.id, author_id=instance.author_id)
+    content_versions.bump(ContentVersions.WALL)
+
+
+# Loves or unloves a post and returns its new love count in one statement
+# on PostgreSQL, see Love.set_love(). The counter is only moved when a row
+# was actually inserted or deleted, and the second column is the count as
+# it stood when nothing changed or NULL when the post does not exist.
+LOVE_SQL = """
+WITH inserted AS (
+    INSERT INTO {love} (fan_id, post_id, date_created, date_modified)
+    SELECT %s, id, %s, %s FROM {post} WHERE id = %s
+    ON CONFLICT (fan_id, post_id) DO NOTHING
+    RETURNING post_id
+), counted AS (
+    UPDATE {post} SET num_loves = num_loves + 1
+    WHERE id IN (SELECT post_id FROM inserted)
+    RETURNING num_loves
+)
+SELECT (SELECT num_loves FROM counted),
+       (SELECT num_loves FROM {post} WHERE id = %s)
+"""
+UNLOVE_SQL = """
+WITH deleted AS (
+    DELETE FROM {love} WHERE fan_id = %s AND post_id = %s
+    RETURNING post_id
+), counted AS (
+    UPDATE {post} SET num_loves = num_loves - 1
+    WHERE id IN (SELECT post_id FROM deleted)
+    RETURNING num_loves
+)
+SELECT (SELECT num_loves FROM counted),
+       (SELECT num_loves FROM {post} WHERE id = %s)
+"""
+
+# The bulk forms of LOVE_SQL and UNLOVE_SQL, see Love.apply_bulk(); they
+# return the post ids whose love was actually inserted or deleted
+BULK_LOVE_SQL = """
+INSERT INTO {love} (fan_id, post_id, date_created, date_modified)
+SELECT %s, post_id, %s, %s FROM unnest(%s::integer[]) AS post_id
+ON CONFLICT (fan_id, post_id) DO NOTHING
+RETURNING post_id
+"""
+BULK_UNLOVE_SQL = """
+DELETE FROM {love} WHERE fan_id = %s AND post_id = ANY(%s::integer[])
+RETURNING post_id
+"""
+
+
 class Love(Base):
+    LOVE = 'love'
+    UNLOVE = 'unlove'
+    ACTIONS = (LOVE, UNLOVE)
+
     fan = models.ForeignKey('auth.User', related_name='loves')
     post = models.ForeignKey('core.Post', related_name='loves')
 
     class Meta:
+        # also serves the in_love lookup of the posts on a page
         unique_together = ('fan', 'post')
 
     def __unicode__(self):
@@ -111,18 +517,47 @@ class Love(Base):
             author=self.post.author.username
         )
 
+    def save(self, *args, **kwargs):
+        """
+        Keeps the num_loves counter of the post, and its rank on the
+        leaderboard, in step with new loves
+        """
+        adding = self._state.adding
+        with transaction.atomic():
+            result = super(Love, self).save(*args, **kwargs)
+            if adding:
+                post_id = self.post_id
+                Post.update_num_loves(post_id, 1)
+                transaction.on_commit(lambda: leaderboard.incr(post_id, 1))
+        return result
+
+    @staticmethod
+    def delete_uncounted(queryset):
+        """
+        Deletes loves in one statement without moving the counters of
+        their posts, for callers that move them themselves
+
+        Unlike QuerySet.delete(), no post_delete signal is sent, so
+        uncount_deleted_love() does not run.
+        Args:
+            queryset -- the loves to delete
+        Returns:
+            the number of loves deleted
+        """
+        return queryset._raw_delete(queryset.db)
+
     def update_connected_users(self):
         """
         Send updates to everyone connected to our websocket
-        when object is created/updated
+        when object is created/updated, and drop the cached feed
+
+        The update is queued for the worker once the transaction commits.
         """
-        num_loves = Love.get_num_post_loves(self.post.id)
-        payload = {
-            'post_id': self.post.id,
-            'num_loves': num_loves,
-            'in_love': False,
-        }
-        send_love_status_to_clients(payload)
+        feed_cache.invalidate()
+        content_versions.bump(ContentVersions.WALL)
+        post_id = self.post_id
+        transaction.on_commit(
+            lambda: queue_broadcast('love_update', post_id))
 
     @staticmethod
     def create_love(fan, post_id):
@@ -155,9 +590,220 @@ class Love(Base):
         except ObjectDoesNotExist:
             pass
 
+    @staticmethod
+    def set_love(fan, post_id, in_love):
+        """
+        Makes fan love or stop loving a post, idempotently, and returns
+        the new love count of the post
+
+        On PostgreSQL 9.5+ this is a single insert-or-ignore (or delete)
+        statement that also moves the counter and reads it back, see
+        LOVE_SQL; elsewhere it runs in a transaction holding the row of
+        the post. Either way concurrent calls count a love once. Only an
+        actual change is broadcast and moves the leaderboard.
+        Args:
+            fan -- a user object
+            post_id -- a post id
+            in_love -- True to love the post, False to unlove it
+        Returns:
+            the number of loves of the post, None when it does not exist
+        """
+        post_id = int(post_id)
+        if (connection.vendor == 'postgresql' and
+                connection.pg_version >= 90500):
+            num_loves, changed = Love._set_love_in_one_statement(
+                fan, post_id, in_love)
+        else:
+            num_loves, changed = Love._set_love_in_a_transaction(
+                fan, post_id, in_love)
+
+        if changed:
+            delta = 1 if in_love else -1
+            feed_cache.invalidate()
+            content_versions.bump(ContentVersions.WALL)
+            transaction.on_commit(lambda: leaderboard.incr(post_id, delta))
+            transaction.on_commit(
+                lambda: queue_broadcast('love_update', post_id))
+        return num_loves
+
+    @staticmethod
+    def _set_love_in_one_statement(fan, post_id, in_love):
+        tables = {
+            'love': connection.ops.quote_name(Love._meta.db_table),
+            'post': connection.ops.quote_name(Post._meta.db_table),
+        }
+        if in_love:
+            now = timezone.now()
+            sql = LOVE_SQL.format(**tables)
+            params = [fan.id, now, now, post_id, post_id]
+        else:
+            sql = UNLOVE_SQL.format(**tables)
+            params = [fan.id, post_id, post_id]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            new_num_loves, num_loves = cursor.fetchone()
+        if new_num_loves is not None:
+            return new_num_loves, True
+        return num_loves, False
+
+    @staticmethod
+    def _set_love_in_a_transaction(fan, post_id, in_love):
+        try:
+            with transaction.atomic():
+                rows = list(Post.objects.select_for_update().filter(
+                    id=post_id).order_by().values_list('num_loves', flat=True))
+                if not rows:
+                    return None, False
+                num_loves = rows[0]
+                if in_love:
+                    # bulk_create skips Love.save, the counter is moved below
+                    Love.objects.bulk_create([Love(fan=fan, post_id=post_id)])
+                    delta = 1
+                else:
+                    num_deleted = Love.delete_uncounted(
+                        Love.objects.filter(fan=fan, post_id=post_id))
+                    if not num_deleted:
+                        return num_loves, False
+                    delta = -1
+                Post.update_num_loves(post_id, delta)
+                return num_loves + delta, True
+        except IntegrityError:
+            # the love already exists
+            return Love.get_num_post_loves(post_id), False
+
+    @staticmethod
+    def apply_bulk(fan, items):
+        """
+        Applies a batch of loves and unloves by fan in one transaction
+
+        The loves are inserted and deleted in bulk, the counters of the
+        posts adjusted in a single UPDATE and one love_bulk_update queued
+        for the broadcast of all the posts that changed. When several items
+        target the same post, the last one wins. Like set_love(), only the
+        loves actually inserted or deleted are counted, so loves and
+        unloves of the same posts running concurrently count once.
+        Args:
+            fan -- a user object
+            items -- list of (post_id, action) pairs, action being LOVE or
+                UNLOVE
+        Returns:
+            a dictionary per item, in order, with the post_id and either
+            its num_loves and in_love after the batch, or an error when
+            the post does not exist
+        """
+        wanted = OrderedDict(
+            (int(post_id), action == Love.LOVE) for post_id, action in items)
+        with transaction.atomic():
+            # the posts are locked in id order, so concurrent loves of the
+            # same posts wait for this batch and batches cannot deadlock
+            post_ids = set(Post.objects.select_for_update().filter(
+                id__in=list(wanted)).order_by('id').values_list(
+                    'id', flat=True))
+            to_love = [post_id for post_id, in_love in wanted.items()
+                       if in_love and post_id in post_ids]
+            to_unlove = [post_id for post_id, in_love in wanted.items()
+                         if not in_love and post_id in post_ids]
+            if (connection.vendor == 'postgresql' and
+                    connection.pg_version >= 90500):
+                loved, unloved = Love._apply_bulk_returning(
+                    fan, to_love, to_unlove)
+            else:
+                loved, unloved = Love._apply_bulk_locked(
+                    fan, to_love, to_unlove)
+            # only the rows actually inserted or deleted move the counters
+            deltas = OrderedDict()
+            for post_id in wanted:
+                if post_id in loved:
+                    deltas[post_id] = 1
+                elif post_id in unloved:
+                    deltas[post_id] = -1
+
+            if deltas:
+                Post.objects.filter(id__in=list(deltas)).update(
+                    num_loves=models.F('num_loves') + models.Case(
+                        *[models.When(id=post_id, then=models.Value(delta))
+                          for post_id, delta in deltas.items()],
+                        default=models.Value(0),
+                        output_field=models.IntegerField()))
+                transaction.on_commit(feed_cache.invalidate)
+                content_versions.bump(ContentVersions.WALL)
+                transaction.on_commit(lambda: leaderboard.incr_many(deltas))
+                transaction.on_commit(lambda: queue_love_updates(deltas))
+            num_loves = dict(Post.objects.filter(
+                id__in=post_ids).values_list('id', 'num_loves'))
+
+        results = []
+        for post_id, _ in items:
+            post_id = int(post_id)
+            if post_id in num_loves:
+                results.append({
+                    'post_id': post_id,
+                    'num_loves': num_loves[post_id],
+                    'in_love': wanted[post_id],
+                })
+            else:
+                results.append(
+                    {'post_id': post_id, 'error': 'Invalid Post ID'})
+        return results
+
+    @staticmethod
+    def _apply_bulk_returning(fan, to_love, to_unlove):
+        """Inserts and deletes the loves of fan, ignoring loves that
+        already exist or are already gone, and returns the sets of post ids
+        whose love was inserted and deleted"""
+        tables = {
+            'love': connection.ops.quote_name(Love._meta.db_table),
+        }
+        loved, unloved = set(), set()
+        with connection.cursor() as cursor:
+            if to_love:
+                now = timezone.now()
+                cursor.execute(BULK_LOVE_SQL.format(**tables),
+                               [fan.id, now, now, to_love])
+                loved = set(row[0] for row in cursor.fetchall())
+            if to_unlove:
+                cursor.execute(BULK_UNLOVE_SQL.format(**tables),
+                               [fan.id, to_unlove])
+                unloved = set(row[0] for row in cursor.fetchall())
+        return loved, unloved
+
+    @staticmethod
+    def _apply_bulk_locked(fan, to_love, to_unlove):
+        """Same as _apply_bulk_returning, for databases without
+        ON CONFLICT; the posts must be locked by the caller"""
+        existing = set(Love.objects.filter(
+            fan=fan, post_id__in=to_love + to_unlove
+        ).values_list('post_id', flat=True))
+        loved = set(to_love) - existing
+        unloved = set(to_unlove) & existing
+        if loved:
+            # bulk_create skips Love.save, the counters are moved by the
+            # caller
+            Love.objects.bulk_create(
+                [Love(fan=fan, post_id=post_id) for post_id in sorted(loved)])
+        if unloved:
+            Love.delete_uncounted(
+                Love.objects.filter(fan=fan, post_id__in=unloved))
+        return loved, unloved
+
     @staticmethod
     def get_num_post_loves(post_id):
         """
         Returns the number of loves the post with the supplied post_id has
         """
-        return Love.objects.filter(post__id=post_id).count()
+        return Post.objects.filter(id=post_id).values_list(
+            'num_loves', flat=True).first() or 0
+
+
+@receiver(post_delete, sender=Love)
+def uncount_deleted_love(sender, instance, **kwargs):
+    """
+    Keeps the num_loves counter of the post, and its rank on the
+    leaderboard, in step with removed loves
+
+    The signal is sent for the loves deleted one by one, with a queryset or
+    along with their fan or post.
+    """
+    post_id = instance.post_id
+    Post.update_num_loves(post_id, -1)
+    transaction.on_commit(lambda: leaderboard.incr(post_id, -1))
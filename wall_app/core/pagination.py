@@ -1,7 +1,248 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+import json
+
+from django.db import models
+from django.db.models import Q
+from django.utils import six, timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination, CursorPagination, PageNumberPagination, _positive_int,
+    _reverse_ordering,
+)
+from rest_framework.utils.urls import replace_query_param
+
+
+Cursor = namedtuple('Cursor', ['reverse', 'position'])
 
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 50
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on a unique, composite ordering such as
+    ('-date_modified', '-id')
+
+    Each page is selected with a WHERE clause on the position of the row
+    the client last saw instead of an OFFSET, and no COUNT(*) is run, so
+    every page costs the same however deep it is and rows inserted ahead
+    of the cursor never shift the pages that follow. The ordering is
+    read from the queryset handed in by the view.
+    """
+    page_size = StandardResultsSetPagination.page_size
+    page_size_query_params = ('page_size', 'limit')
+    max_page_size = StandardResultsSetPagination.max_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(queryset.query.order_by)
+        assert self.ordering, (
+            'KeysetPagination requires an explicitly ordered queryset')
+        self.ordering_fields = self._get_ordering_fields(queryset)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, position = False, None
+        else:
+            reverse, position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        if position is not None:
+            queryset = queryset.filter(
+                self._get_position_filter(position, reverse))
+
+        # Fetch an extra row to find out whether a following page exists
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following_page = len(results) > len(self.page)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following_page
+        else:
+            self.has_next = has_following_page
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_page_size(self, request):
+        for query_param in self.page_size_query_params:
+            try:
+                return _positive_int(
+                    request.query_params[query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.get_link_after(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(
+            self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(reverse=True, position=position))
+
+    def get_link_after(self, instance):
+        """Returns the url of the page that follows the given instance"""
+        position = self._get_position_from_instance(instance, self.ordering)
+        return self.encode_cursor(Cursor(reverse=False, position=position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            tokens = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            reverse = bool(tokens.get('r', 0))
+            position = tokens['p']
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list) or
+                len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            position = [
+                self._parse_position_value(field, value)
+                for field, value in zip(self.ordering_fields, position)
+            ]
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(reverse=reverse, position=position)
+
+    @staticmethod
+    def _get_ordering_fields(queryset):
+        """Returns the model field, or annotation output field, of each
+        field of the ordering of queryset"""
+        fields = []
+        for order in queryset.query.order_by:
+            name = order.lstrip('-')
+            if name in queryset.query.annotations:
+                fields.append(queryset.query.annotations[name].output_field)
+            else:
+                fields.append(queryset.model._meta.get_field(
+                    'id' if name == 'pk' else name))
+        return fields
+
+    @staticmethod
+    def _parse_position_value(field, value):
+        """
+        Returns a value of a cursor position as the type of its field
+
+        Raises:
+            ValueError -- when the value is not one of the field
+        """
+        if isinstance(field, models.DateTimeField):
+            date = parse_datetime(value)
+            if date is None:
+                raise ValueError(value)
+            if timezone.is_naive(date):
+                date = timezone.make_aware(date)
+            return date
+        if isinstance(field, (models.AutoField, models.IntegerField)):
+            if isinstance(value, bool) or not isinstance(
+                    value, six.integer_types):
+                raise ValueError(value)
+        elif not isinstance(value, six.string_types + six.integer_types):
+            raise ValueError(value)
+        return value
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': cursor.position}
+        if cursor.reverse:
+            tokens['r'] = 1
+        encoded = urlsafe_b64encode(
+            json.dumps(tokens, separators=(',', ':')).encode('utf-8')
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for order in ordering:
+            value = getattr(instance, order.lstrip('-'))
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def _get_position_filter(self, position, reverse):
+        """
+        Returns a filter for the rows strictly after position, e.g. for
+        ('-date_modified', '-id'):
+            date_modified < d OR (date_modified = d AND id < i)
+        """
+        position_filter = Q()
+        preceding = {}
+        for order, value in zip(self.ordering, position):
+            field_name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            position_filter |= Q(**dict(preceding, **{
+                '{field}__{lookup}'.format(field=field_name, lookup=lookup):
+                    value
+            }))
+            preceding[field_name] = value
+        return position_filter
+
+
+class FeedPagination(BasePagination):
+    """
+    Paginates the feed with keyset cursors, unless the client asks for a
+    page number with ?page=, which older clients rely on. Pages of top
+    posts hold 10 posts unless ?limit= says otherwise, as they always did.
+    """
+    page_query_param = StandardResultsSetPagination.page_query_param
+    display_page_controls = False
+    # the default ?limit= of top posts, from before they had cursors
+    top_page_size = 10
+
+    def uses_page_numbers(self, request):
+        return self.page_query_param in request.query_params
+
+    def uses_cursor(self, request):
+        return KeysetPagination.cursor_query_param in request.query_params
+
+    def get_keyset_paginator(self, request):
+        paginator = KeysetPagination()
+        if request.query_params.get('q', '').lower() == 'top':
+            paginator.page_size = self.top_page_size
+        return paginator
+
+    def get_page_size(self, request):
+        if self.uses_page_numbers(request):
+            return StandardResultsSetPagination().get_page_size(request)
+        return self.get_keyset_paginator(request).get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.uses_page_numbers(request):
+            self.paginator = StandardResultsSetPagination()
+        else:
+            self.paginator = self.get_keyset_paginator(request)
+        page = self.paginator.paginate_queryset(queryset, request, view)
+        self.display_page_controls = self.paginator.display_page_controls
+        return page
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
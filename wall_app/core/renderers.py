@@ -0,0 +1,45 @@
+from rest_framework import renderers
+
+from core import encoders
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    DRF's JSONRenderer encoding with the backend set by JSON_ENCODER, see
+    core.encoders; the output is the same whichever backend is used
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return bytes()
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent is None:
+            separators = (
+                renderers.SHORT_SEPARATORS if self.compact
+                else renderers.LONG_SEPARATORS)
+        else:
+            separators = renderers.INDENT_SEPARATORS
+
+        return encoders.dumps(
+            data, ensure_ascii=self.ensure_ascii, separators=separators,
+            indent=indent)
+
+
+class PreEncodedJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that sends the body a view has already encoded, when it
+    has one, instead of encoding the response data again
+
+    Views set encoded_content to the UTF-8 JSON of their response data,
+    e.g. the post encoded once for its broadcast, see Post.encode().
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        view = (renderer_context or {}).get('view')
+        encoded_content = getattr(view, 'encoded_content', None)
+        if encoded_content is not None:
+            return encoded_content
+        return super(PreEncodedJSONRenderer, self).render(
+            data, accepted_media_type, renderer_context)
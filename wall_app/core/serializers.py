@@ -1,7 +1,11 @@
+from collections import OrderedDict
+
+from django.conf import settings
 from rest_framework import serializers
 
 from accounts.serializers import PublicUserSerializer
-from core.models import Post
+from core import encoders
+from core.models import Love, Post
 
 
 class PostSerializer(serializers.ModelSerializer):
@@ -14,3 +18,74 @@ class PostSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'date_created', 'content', 'author', 'num_loves', 'in_love'
         )
+
+
+class PostRowSerializer(object):
+    """
+    Read-only serializer of the PostRow tuples of PostQuerySet.as_rows()
+
+    Outputs the same data as PostSerializer without going through DRF's
+    field machinery for every field of every post.
+    """
+    date_field = serializers.DateTimeField()
+
+    def __init__(self, instance, many=False):
+        self.instance = instance
+        self.many = many
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(row) for row in self.instance]
+        return self.to_representation(self.instance)
+
+    def to_representation(self, row):
+        author = row.author
+        return OrderedDict((
+            ('id', row.id),
+            ('date_created', self.date_field.to_representation(
+                row.date_created)),
+            ('content', row.content),
+            ('author', OrderedDict((
+                ('username', author.username),
+                ('first_name', author.first_name),
+                ('last_name', author.last_name),
+                ('about', author.about),
+                ('profile_pic', author.profile_pic),
+                ('num_posts', author.num_posts),
+            ))),
+            ('num_loves', row.num_loves),
+            ('in_love', row.in_love),
+        ))
+
+
+def encode_post(post):
+    """
+    Returns the post as the API renders it to viewers who do not love it,
+    as UTF-8 encoded JSON
+
+    Args:
+        post -- a post with its author and counters loaded
+    """
+    data = PostSerializer(post).data
+    data['in_love'] = False
+    return encoders.dumps(data)
+
+
+class LoveItemSerializer(serializers.Serializer):
+    post_id = serializers.IntegerField(min_value=1)
+    action = serializers.ChoiceField(choices=Love.ACTIONS)
+
+
+class BulkLoveSerializer(serializers.Serializer):
+    """Validates a batch of loves and unloves, see Love.apply_bulk()"""
+    items = LoveItemSerializer(many=True)
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError('No items to apply')
+        if len(items) > settings.BULK_LOVE_MAX_ITEMS:
+            raise serializers.ValidationError(
+                'At most {max} items may be applied at once'.format(
+                    max=settings.BULK_LOVE_MAX_ITEMS))
+        return items
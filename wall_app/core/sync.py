@@ -0,0 +1,131 @@
+"""
+Incremental sync of the feed, for clients coming back online
+
+A client asks for the changes since a token: the posts created or
+modified after it and the ids of the posts deleted after it, read from
+their tombstones, along with the token to ask with next time. Both are
+read through indexes on their dates, so a sync costs the changes it
+returns rather than the size of the wall.
+
+A token is the position, (date, id), of the last change the client has
+seen. Changes are returned oldest first, at most a page of them at a
+time; when more are left, the token points right after the last change
+returned. Only the changes older than SYNC_SETTLE_SECONDS are returned,
+and once the client is caught up the token trails the present by as
+much, so no token ever passes a change written by a transaction still
+running; such changes are picked up by the next sync rather than
+skipped.
+
+Loves do not modify posts, so new love counts reach clients through the
+websocket, not through syncs.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import timedelta
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.export import parse_date
+from core.models import PostTombstone
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(ValueError):
+    """The tombstones the token would need have been pruned"""
+
+
+def encode_token(position):
+    date, post_id = position
+    return urlsafe_b64encode(json.dumps(
+        [date.isoformat(), post_id], separators=(',', ':')
+    ).encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    """
+    Returns the position of a token
+
+    Raises:
+        InvalidToken -- when the token is not one issued by encode_token()
+        ExpiredToken -- when the token is older than the tombstones kept
+    """
+    try:
+        date, post_id = json.loads(
+            urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+        position = (parse_date(date), int(post_id))
+    except (TypeError, ValueError, AttributeError):
+        raise InvalidToken('Invalid sync token')
+    if position[0] is None:
+        raise InvalidToken('Invalid sync token')
+    retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    if position[0] < timezone.now() - retention:
+        raise ExpiredToken('Sync token expired, reload the feed')
+    return position
+
+
+def get_settled_position():
+    """Returns the position up to which changes are surely committed"""
+    return (
+        timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS), 0)
+
+
+def after(position, date_field, id_field):
+    """Returns a filter for the rows strictly after a position"""
+    date, row_id = position
+    return Q(**{date_field + '__gt': date}) | Q(**{
+        date_field: date, id_field + '__gt': row_id})
+
+
+def up_to(position, date_field, id_field):
+    """Returns a filter for the rows at or before a position"""
+    date, row_id = position
+    return Q(**{date_field + '__lt': date}) | Q(**{
+        date_field: date, id_field + '__lte': row_id})
+
+
+def get_changes(queryset, position, limit, author_id=None):
+    """
+    Returns the changes to the feed after a position
+
+    Args:
+        queryset -- posts, see Post.get_queryset()
+        position -- the (date, id) of the last change seen
+        limit -- the most changes to return
+        author_id -- only return changes to the posts of this user
+    Returns:
+        the changed posts, the ids of the deleted posts, the next token and
+        whether more changes are left
+    """
+    settled = get_settled_position()
+    posts = list(
+        queryset.filter(after(position, 'date_modified', 'id'))
+        .filter(up_to(settled, 'date_modified', 'id'))
+        .order_by('date_modified', 'id')[:limit + 1])
+    tombstones = PostTombstone.objects.filter(
+        after(position, 'date_deleted', 'post_id')).filter(
+            up_to(settled, 'date_deleted', 'post_id'))
+    if author_id is not None:
+        tombstones = tombstones.filter(author_id=author_id)
+    tombstones = list(tombstones.order_by(
+        'date_deleted', 'post_id'
+    ).values_list('date_deleted', 'post_id')[:limit + 1])
+
+    changes = sorted(
+        [((post.date_modified, post.id), post) for post in posts] +
+        [(tombstone, None) for tombstone in tombstones],
+        key=lambda change: change[0])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if has_more:
+        next_position = changes[-1][0]
+    else:
+        next_position = max(position, settled)
+
+    changed_posts = [post for _, post in changes if post is not None]
+    deleted = [post_id for (_, post_id), post in changes if post is None]
+    return changed_posts, deleted, encode_token(next_position), has_more
@@ -1,14 +1,27 @@
+from django.test import override_settings
 from rest_framework.test import APITestCase
 from rest_framework_jwt.settings import api_settings
 
 from factories.factories import ProfileFactory
 
+from accounts.cache import user_cache
 
+from core.cache import feed_cache
+from core.leaderboard import leaderboard
+from core.tests.testing_utils import TEST_CACHES
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts',
+                   CACHES=TEST_CACHES)
 class APIHeaderAuthorization(APITestCase):
     """Base class used to attach header to all request on setup."""
 
     def setUp(self):
         """Include an appropriate `Authorization:` header on all requests"""
+        # feed pages cached by earlier tests outlive their rolled back posts
+        feed_cache.cache.clear()
+        user_cache.cache.clear()
+        leaderboard.clear()
         self.profile = ProfileFactory()
         jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
         jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
@@ -0,0 +1,193 @@
+import json
+
+from channels import Channel
+from channels.test import Client, TransactionChannelTestCase
+from django.conf import settings
+from django.db import transaction
+from django.test import override_settings
+from django.utils import six
+
+from factories.factories import ProfileFactory
+
+from core.coalescer import love_update_coalescer
+from core.eventlog import event_log
+from core.models import Love
+from core.tests.testing_utils import create_post_objects
+
+# the test channel layer only accepts unicode channel names
+BROADCAST_CHANNEL = six.text_type(settings.BROADCAST_CHANNEL_NAME)
+DELAY_CHANNEL = u'asgi.delay'
+
+
+@override_settings(EVENT_LOG_KEY='test:events:posts',
+                   LEADERBOARD_KEY='test:leaderboard:posts',
+                   LOVE_UPDATE_KEY_PREFIX='test:love_updates')
+class BroadcastTestSuite(TransactionChannelTestCase):
+    def setUp(self):
+        love_update_coalescer.reset()
+        self.addCleanup(love_update_coalescer.reset)
+        event_log.clear()
+        self.addCleanup(event_log.clear)
+        self.user = ProfileFactory().user
+        self.client = Client()
+        self.client.join_group(settings.GLOBAL_CHANNEL_NAME)
+
+    def get_queued_broadcast(self):
+        return self.get_next_message(BROADCAST_CHANNEL)
+
+    def consume_broadcast(self):
+        """Runs the worker on the next queued broadcast, returns the frame
+        the clients received"""
+        self.client.consume(BROADCAST_CHANNEL)
+        message = self.client.receive()
+        return message and json.loads(message['text'])
+
+    def subscribe(self, post):
+        self.client.join_group('post-{id}'.format(id=post.id))
+
+    def test_saving_a_post_queues_a_broadcast(self):
+        post = create_post_objects(self.user, 1)[0]
+        self.assertIsNone(self.client.receive())
+        frame = self.consume_broadcast()
+        self.assertEqual(frame['type'], 'post_update')
+        self.assertEqual(frame['data']['id'], post.id)
+
+    def test_rolled_back_posts_are_not_announced(self):
+        try:
+            with transaction.atomic():
+                create_post_objects(self.user, 1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertIsNone(self.get_queued_broadcast())
+
+    def test_broadcast_waits_for_the_outer_transaction(self):
+        with transaction.atomic():
+            post = create_post_objects(self.user, 1)[0]
+            self.assertIsNone(self.get_queued_broadcast())
+        content = self.get_queued_broadcast().content
+        self.assertEqual(content['event'], 'post_create')
+        self.assertEqual(content['post_id'], post.id)
+
+    def test_edits_are_only_sent_to_subscribers(self):
+        post = create_post_objects(self.user, 1)[0]
+        self.consume_broadcast()
+        post.content = 'Edited'
+        post.save()
+        self.assertIsNone(self.consume_broadcast())
+
+        self.subscribe(post)
+        post.save()
+        frame = self.consume_broadcast()
+        self.assertEqual(frame['type'], 'post_update')
+        self.assertEqual(frame['data']['content'], 'Edited')
+
+    @override_settings(LOVE_UPDATE_COALESCE_MS=0)
+    def test_love_update_carries_the_committed_count(self):
+        post = create_post_objects(self.user, 1)[0]
+        self.consume_broadcast()
+        self.subscribe(post)
+        Love.create_love(self.user, post.id)
+        self.assertIsNone(self.consume_broadcast())
+        frame = self.consume_broadcast()
+        self.assertIsInstance(frame.pop('seq'), int)
+        self.assertEqual(frame, {
+            'type': 'love_update',
+            'data': {'post_id': post.id, 'num_loves': 1, 'in_love': False},
+        })
+
+    @override_settings(LOVE_UPDATE_COALESCE_MS=150)
+    def test_love_updates_within_the_window_are_coalesced(self):
+        post = create_post_objects(self.user, 1)[0]
+        self.consume_broadcast()
+        self.subscribe(post)
+        for fan in (self.user, ProfileFactory(user__username='jane').user):
+            Love.create_love(fan, post.id)
+            self.assertIsNone(self.consume_broadcast())
+
+        delayed = self.get_next_message(DELAY_CHANNEL)
+        self.assertIsNone(self.get_next_message(DELAY_CHANNEL))
+        self.assertEqual(delayed['delay'], 150)
+        Channel(delayed['channel']).send(delayed['content'])
+        self.assertEqual(self.consume_broadcast()['data']['num_loves'], 2)
+        self.assertEqual(
+            love_update_coalescer.stats(), {'received': 2, 'sent': 1})
+
+        # the window has closed, the next love starts another
+        Love.delete_love(self.user, post.id)
+        self.consume_broadcast()
+        self.assertIsNotNone(self.get_next_message(DELAY_CHANNEL))
+
+    @override_settings(LOVE_UPDATE_COALESCE_MS=0)
+    def test_bulk_loves_are_queued_as_one_broadcast(self):
+        posts = create_post_objects(self.user, 3)
+        for post in posts:
+            self.consume_broadcast()
+            self.subscribe(post)
+        Love.apply_bulk(self.user, [
+            (posts[0].id, Love.LOVE), (posts[2].id, Love.LOVE),
+            (posts[1].id, Love.UNLOVE)])
+        # the unlove of a post not loved changes nothing
+        message = self.get_queued_broadcast()
+        self.assertEqual(message.content, {
+            'event': 'love_bulk_update',
+            'post_ids': [posts[0].id, posts[2].id],
+        })
+        self.assertIsNone(self.get_queued_broadcast())
+
+        Channel(BROADCAST_CHANNEL).send(message.content)
+        self.assertIsNone(self.consume_broadcast())
+        frames = [self.consume_broadcast(), self.consume_broadcast()]
+        self.assertEqual(
+            [frame['data'] for frame in frames],
+            [{'post_id': posts[0].id, 'num_loves': 1, 'in_love': False},
+             {'post_id': posts[2].id, 'num_loves': 1, 'in_love': False}])
+
+    def test_posts_are_sent_as_encoded_on_save(self):
+        post = create_post_objects(self.user, 1)[0]
+        with self.assertNumQueries(0):
+            frame = self.consume_broadcast()
+        self.assertEqual(frame['data'], json.loads(post.encoded))
+        self.assertEqual(frame['data']['num_loves'], 0)
+        self.assertEqual(frame['data']['author']['num_posts'], 1)
+
+    def test_post_delete(self):
+        post = create_post_objects(self.user, 1)[0]
+        self.consume_broadcast()
+        self.subscribe(post)
+        post_id = post.id
+        post.delete()
+        frame = self.consume_broadcast()
+        self.assertIsInstance(frame.pop('seq'), int)
+        self.assertEqual(frame, {'type': 'post_delete', 'data': post_id})
+
+    def test_frames_are_numbered_and_logged(self):
+        post = create_post_objects(self.user, 1)[0]
+        created = self.consume_broadcast()
+        self.subscribe(post)
+        post.save()
+        updated = self.consume_broadcast()
+        self.assertEqual(updated['seq'], created['seq'] + 1)
+        frames, current = event_log.since(created['seq'] - 1)
+        self.assertEqual([json.loads(frame) for frame in frames],
+                         [created, updated])
+        self.assertEqual(current, updated['seq'])
+
+
+@override_settings(EVENT_LOG_KEY='test:events:posts',
+                   LEADERBOARD_KEY='test:leaderboard:posts',
+                   LOVE_UPDATE_KEY_PREFIX='test:love_updates')
+class QueueBroadcastTestSuite(TransactionChannelTestCase):
+    def setUp(self):
+        event_log.clear()
+        self.addCleanup(event_log.clear)
+
+    def test_broadcast_channel_is_routed_to_the_worker(self):
+        client = Client()
+        Channel(BROADCAST_CHANNEL).send(
+            {'event': 'post_delete', 'post_id': 1})
+        client.join_group('post-1')
+        client.consume(BROADCAST_CHANNEL)
+        self.assertEqual(
+            json.loads(client.receive()['text']),
+            {'seq': 1, 'type': 'post_delete', 'data': 1})
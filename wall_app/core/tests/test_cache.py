@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.urls import reverse_lazy
+from rest_framework import status
+
+from factories.factories import PostFactory
+
+from core.cache import RedisCache, feed_cache
+from core.tests.http_header import APIHeaderAuthorization
+from core.tests.testing_utils import create_post_objects
+
+
+class FeedCacheTestSuite(APIHeaderAuthorization):
+    def setUp(self):
+        super(FeedCacheTestSuite, self).setUp()
+        self.url = reverse_lazy('post-list')
+        create_post_objects(self.profile.user, 3)
+
+    def test_anonymous_feed_is_served_from_cache(self):
+        self.client.credentials()
+        response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(self.url)
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_response.data, response.data)
+        self.assertEqual(feed_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_pages_are_cached_per_query_string(self):
+        self.client.credentials()
+        self.client.get(self.url)
+        response = self.client.get(self.url, {'page_size': 1})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_new_post_invalidates_cached_feed(self):
+        self.client.credentials()
+        self.client.get(self.url)
+        PostFactory(author=self.profile.user)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_authenticated_feed_is_not_cached(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(feed_cache.stats(), {'hits': 0, 'misses': 0})
+
+
+class RedisCacheTestSuite(SimpleTestCase):
+    def setUp(self):
+        self.cache = RedisCache(settings.REDIS_URL, {
+            'KEY_PREFIX': 'wall_app_test', 'TIMEOUT': 60,
+        })
+        self.cache.clear()
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def test_set_and_get(self):
+        self.cache.set('page', {'results': [1, 2]})
+        self.assertEqual(self.cache.get('page'), {'results': [1, 2]})
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_add_only_sets_missing_keys(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.get('counter'), 1)
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertRaises(ValueError, self.cache.incr, 'missing')
+
+    def test_clear_only_removes_prefixed_keys(self):
+        other = RedisCache(settings.REDIS_URL, {'KEY_PREFIX': 'other'})
+        other.set('page', 1)
+        self.cache.set('page', 2)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('page'))
+        self.assertEqual(other.get('page'), 1)
+        other.clear()
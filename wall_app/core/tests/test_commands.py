@@ -0,0 +1,223 @@
+import json
+import os
+import shutil
+import tempfile
+
+from channels.test.base import ChannelTestCaseMixin
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils.six import StringIO
+
+from factories.factories import ProfileFactory
+
+from core.cache import feed_cache
+from core.leaderboard import leaderboard
+from core.models import Love, Post
+from core.tests.testing_utils import (
+    TEST_CACHES, create_love_relationship, create_post_objects
+)
+from core.versions import ContentVersions, content_versions
+
+
+class RecountLovesTestSuite(TestCase):
+    def setUp(self):
+        self.user = ProfileFactory().user
+        self.posts = create_post_objects(self.user, 3)
+        create_love_relationship(self.user, self.posts[:2])
+        Post.objects.filter(id=self.posts[0].id).update(num_loves=5)
+        Post.objects.filter(id=self.posts[2].id).update(num_loves=2)
+
+    def test_recount_loves_repairs_drifted_posts(self):
+        out = StringIO()
+        call_command('recount_loves', chunk_size=2, stdout=out)
+        num_loves = dict(Post.objects.values_list('id', 'num_loves'))
+        self.assertEqual(num_loves, {
+            self.posts[0].id: 1, self.posts[1].id: 1, self.posts[2].id: 0,
+        })
+        self.assertIn('3 posts checked, 2 repaired', out.getvalue())
+
+    def test_recount_loves_dry_run_leaves_posts_untouched(self):
+        out = StringIO()
+        call_command('recount_loves', dry_run=True, stdout=out)
+        self.assertEqual(Post.objects.get(id=self.posts[0].id).num_loves, 5)
+        self.assertIn('3 posts checked, 2 drifted', out.getvalue())
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts')
+class RecountLovesCommitTestSuite(ChannelTestCaseMixin, TransactionTestCase):
+    """Repairs are committed here, so what they publish on commit runs"""
+
+    def setUp(self):
+        leaderboard.clear()
+        self.addCleanup(leaderboard.clear)
+        self.user = ProfileFactory().user
+        self.posts = create_post_objects(self.user, 2)
+        create_love_relationship(self.user, self.posts[1:])
+        Post.objects.filter(id=self.posts[0].id).update(num_loves=3)
+        call_command('rebuild_leaderboard', stdout=StringIO())
+
+    def test_repairs_move_the_leaderboard_and_the_wall_version(self):
+        self.assertEqual(leaderboard.top(1), [self.posts[0].id])
+        version = content_versions.get(ContentVersions.WALL)
+        generation = feed_cache.cache.get(feed_cache.GENERATION_KEY, 0)
+        call_command('recount_loves', stdout=StringIO())
+        self.assertEqual(leaderboard.top(1), [self.posts[1].id])
+        self.assertNotEqual(
+            content_versions.get(ContentVersions.WALL), version)
+        self.assertEqual(
+            feed_cache.cache.get(feed_cache.GENERATION_KEY, 0),
+            generation + 1)
+
+
+class BenchSerializeTestSuite(TestCase):
+    def test_benchserialize_compares_both_paths_and_rolls_back(self):
+        out, err = StringIO(), StringIO()
+        call_command('benchserialize', page_size=3, iterations=1,
+                     stdout=out, stderr=err)
+        self.assertIn('posts', out.getvalue())
+        self.assertIn('rows', out.getvalue())
+        self.assertEqual(err.getvalue(), '')
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts')
+class ImportWallTestSuite(TestCase):
+    def setUp(self):
+        self.jane = ProfileFactory(user__username='jane').user
+        self.john = ProfileFactory(user__username='john').user
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(leaderboard.clear)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as output:
+            output.write(content.encode('utf-8'))
+        return path
+
+    def import_wall(self, path, **options):
+        out = StringIO()
+        call_command('import_wall', path, stdout=out, stderr=StringIO(),
+                     **options)
+        return out.getvalue()
+
+    def test_import_jsonl_keeps_counters_consistent(self):
+        records = [
+            {'type': 'post', 'id': 10, 'author': 'jane',
+             'content': u'Caf\xe9', 'date_created': '2017-03-01T10:00:00Z'},
+            {'type': 'post', 'id': 11, 'author': 'john', 'content': 'Hi'},
+            {'type': 'love', 'post_id': 10, 'fan': 'john'},
+            {'type': 'love', 'post_id': 10, 'fan': 'jane'},
+            {'type': 'love', 'post_id': 11, 'fan': 'jane'},
+        ]
+        path = self.write('wall.jsonl', u'\n'.join(
+            json.dumps(record) for record in records))
+        out = self.import_wall(path, chunk_size=2)
+
+        self.assertIn('5 rows read: 2 posts and 3 loves imported, 0 skipped',
+                      out)
+        self.assertIn('rows/s', out)
+        post = Post.objects.get(id=10)
+        self.assertEqual(post.content, u'Caf\xe9')
+        self.assertEqual(post.author, self.jane)
+        self.assertEqual(post.date_created.year, 2017)
+        self.assertEqual(
+            dict(Post.objects.values_list('id', 'num_loves')), {10: 2, 11: 1})
+        self.jane.profile.refresh_from_db()
+        self.assertEqual(self.jane.profile.num_posts, 1)
+        self.assertEqual(leaderboard.top(2), [10, 11])
+
+    def test_import_csv_skips_unknown_references_and_duplicates(self):
+        path = self.write('wall.csv', u'\n'.join([
+            'type,id,author,content,date_created,post_id,fan',
+            'post,1,jane,"Hello, world",,,',
+            'post,2,nobody,Lost,,,',
+            'love,,,,,1,john',
+            'love,,,,,1,john',
+            'love,,,,,2,john',
+            'like,,,,,,',
+        ]))
+        out = self.import_wall(path)
+        self.assertIn(
+            '6 rows read: 1 posts and 1 loves imported, 4 skipped', out)
+        self.assertEqual(Post.objects.get().content, 'Hello, world')
+        self.assertEqual(Post.objects.get().num_loves, 1)
+
+        # importing again adds nothing
+        out = self.import_wall(path)
+        self.assertIn('0 posts and 0 loves imported', out)
+        self.assertEqual(Love.objects.count(), 1)
+
+    def test_id_offset_moves_imported_posts(self):
+        create_post_objects(self.jane, 1)
+        path = self.write('wall.jsonl', u'\n'.join([
+            json.dumps({'type': 'post', 'id': 1, 'author': 'jane',
+                        'content': 'Imported'}),
+            json.dumps({'type': 'love', 'post_id': 1, 'fan': 'john'}),
+        ]))
+        self.import_wall(path, id_offset=1000)
+        self.assertEqual(Post.objects.get(id=1001).num_loves, 1)
+        self.assertEqual(Post.objects.get(id=1).num_loves, 0)
+        self.assertGreater(create_post_objects(self.jane, 1)[0].id, 1001)
+
+
+class ExportPostsTestSuite(TestCase):
+    def setUp(self):
+        self.user = ProfileFactory().user
+        self.posts = create_post_objects(self.user, 3)
+        create_love_relationship(self.user, self.posts[1:2])
+
+    def test_export_posts_writes_ndjson(self):
+        out, err = StringIO(), StringIO()
+        call_command('export_posts', chunk_size=2, stdout=out, stderr=err)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [line['id'] for line in lines], [post.id for post in self.posts])
+        self.assertEqual(lines[1]['fans'], [self.user.username])
+        self.assertIn('3 posts exported', err.getvalue())
+
+    def test_export_posts_to_a_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'posts.ndjson')
+        call_command('export_posts', output=path, author='nobody',
+                     stderr=StringIO())
+        with open(path, 'rb') as export:
+            self.assertEqual(export.read(), b'')
+
+
+class BenchSearchTestSuite(TestCase):
+    def test_benchsearch_times_both_paths_and_rolls_back(self):
+        out = StringIO()
+        call_command('benchsearch', posts=30, batch_size=7, iterations=1,
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 1 + 4 * 2)
+        self.assertIn('search', lines[1])
+        self.assertIn('naive', lines[2])
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts',
+                   CACHES=TEST_CACHES)
+class BenchFeedTestSuite(TestCase):
+    def test_benchfeed_reports_every_scenario_and_rolls_back(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'bench.json')
+        err = StringIO()
+        call_command('benchfeed', users=3, posts=30, loves=40, requests=4,
+                     batch_size=7, output=path, stderr=err)
+        with open(path) as results:
+            report = json.load(results)
+        self.assertEqual(
+            sorted(report['scenarios']),
+            ['detail', 'feed', 'love', 'private', 'top'])
+        for result in report['scenarios'].values():
+            self.assertEqual(result['requests'], 4)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertGreater(result['queries_per_request'], 0)
+            self.assertEqual(result['sequential_scans'], [])
+        self.assertIn('Results written to', err.getvalue())
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(leaderboard.top(10), [])
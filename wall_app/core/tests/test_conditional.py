@@ -0,0 +1,115 @@
+from channels.test.base import ChannelTestCaseMixin
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse_lazy
+from rest_framework import status
+from rest_framework.test import APITransactionTestCase
+from rest_framework_jwt.settings import api_settings
+
+from factories.factories import ProfileFactory
+
+from accounts.cache import user_cache
+from core.cache import feed_cache
+from core.leaderboard import leaderboard
+from core.models import Love, Post
+from core.tests.testing_utils import TEST_CACHES, create_post_objects
+from core.versions import ContentVersions, content_versions
+
+
+def get_jwt_header(user):
+    payload = api_settings.JWT_PAYLOAD_HANDLER(user)
+    return 'JWT ' + api_settings.JWT_ENCODE_HANDLER(payload)
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts',
+                   CACHES=TEST_CACHES)
+class ConditionalGetTestCase(ChannelTestCaseMixin, APITransactionTestCase):
+    """Changes are committed here, so the versions move as they do in
+    production; their broadcasts go to the in-memory channel layer"""
+
+    def setUp(self):
+        feed_cache.cache.clear()
+        user_cache.cache.clear()
+        leaderboard.clear()
+        self.profile = ProfileFactory()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=get_jwt_header(self.profile.user))
+
+    def assertNotModified(self, url, etag, params=None):
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertIn(response['ETag'], etag)
+
+    def assertModified(self, url, etag, params=None):
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts')
+class PostConditionalGetTestSuite(ConditionalGetTestCase):
+    def setUp(self):
+        super(PostConditionalGetTestSuite, self).setUp()
+        self.posts = create_post_objects(self.profile.user, 3)
+        self.list_url = reverse_lazy('post-list')
+        self.detail_url = reverse_lazy(
+            'post-detail', kwargs={'pk': self.posts[0].id})
+
+    def test_unchanged_feed_is_not_modified_without_queries(self):
+        etag = self.client.get(self.list_url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertNotModified(self.list_url, etag)
+        self.assertNotModified(self.list_url, 'W/' + etag)
+
+    def test_etags_differ_per_page_viewer_and_format(self):
+        etag = self.client.get(self.list_url)['ETag']
+        self.assertModified(self.list_url, etag, {'page_size': 1})
+        response = self.client.get(
+            self.list_url, HTTP_ACCEPT='application/json; indent=4')
+        self.assertNotEqual(response['ETag'], etag)
+        self.client.credentials()
+        self.assertModified(self.list_url, etag)
+
+    def test_posts_and_loves_modify_the_feed(self):
+        etag = self.client.get(self.list_url)['ETag']
+        create_post_objects(self.profile.user, 1)
+        etag = self.assertModified(self.list_url, etag)['ETag']
+        Love.set_love(self.profile.user, self.posts[1].id, True)
+        etag = self.assertModified(self.list_url, etag)['ETag']
+        Post.objects.get(id=self.posts[2].id).delete()
+        self.assertModified(self.list_url, etag)
+
+    def test_post_detail(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.assertNotModified(self.detail_url, etag)
+        post = Post.objects.get(id=self.posts[0].id)
+        post.content = 'Edited'
+        post.save()
+        response = self.assertModified(self.detail_url, etag)
+        self.assertEqual(response.data['content'], 'Edited')
+
+    def test_missing_posts_have_no_etag(self):
+        url = reverse_lazy('post-detail', kwargs={'pk': 9999})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_responses_have_no_etag_when_redis_fails(self):
+        original = content_versions.get
+        content_versions.get = lambda name: None
+        self.addCleanup(setattr, content_versions, 'get', original)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_rolled_back_changes_keep_the_version(self):
+        before = content_versions.get(ContentVersions.WALL)
+        try:
+            with transaction.atomic():
+                create_post_objects(self.profile.user, 1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(content_versions.get(ContentVersions.WALL), before)
@@ -0,0 +1,144 @@
+import json
+
+from channels import Group
+from channels.test import ChannelTestCase, Client
+from django.conf import settings
+from django.test import override_settings
+import mock
+import redis
+
+from core.eventlog import event_log
+
+
+STREAM_PATH = '/api/v1/core/posts/stream/'
+
+
+class PostStreamTestSuite(ChannelTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.send_and_consume(u'websocket.connect', {
+            'path': STREAM_PATH,
+        })
+        self.assertEqual(self.client.receive(), {'accept': True})
+
+    def send(self, content):
+        self.client.send_and_consume(u'websocket.receive', {
+            'path': STREAM_PATH,
+            'text': json.dumps(content),
+        })
+
+    def assertReceives(self, group_name, received=True):
+        Group(group_name).send({'text': 'ping'})
+        message = self.client.receive()
+        if received:
+            self.assertEqual(message, {'text': 'ping'})
+        else:
+            self.assertIsNone(message)
+
+    def test_clients_join_the_global_group_on_connect(self):
+        self.assertReceives(settings.GLOBAL_CHANNEL_NAME)
+
+    def test_subscribe_and_unsubscribe(self):
+        self.send({'action': 'subscribe', 'post_ids': [1, 2]})
+        self.assertReceives('post-1')
+        self.assertReceives('post-2')
+        self.assertReceives('post-3', received=False)
+
+        self.send({'action': 'unsubscribe', 'post_ids': [1]})
+        self.assertReceives('post-1', received=False)
+        self.assertReceives('post-2')
+
+    def test_disconnect_leaves_every_group(self):
+        self.send({'action': 'subscribe', 'post_ids': [1]})
+        self.client.send_and_consume(u'websocket.disconnect', {
+            'path': STREAM_PATH,
+        })
+        self.assertReceives(settings.GLOBAL_CHANNEL_NAME, received=False)
+        self.assertReceives('post-1', received=False)
+
+    @override_settings(POST_STREAM_MAX_SUBSCRIPTIONS=2)
+    def test_subscriptions_are_capped(self):
+        self.send({'action': 'subscribe', 'post_ids': [1]})
+        self.send({'action': 'subscribe', 'post_ids': [2, 3]})
+        self.assertReceives('post-2')
+        self.assertReceives('post-3', received=False)
+
+    def test_invalid_messages_get_an_error(self):
+        self.send({'action': 'subscribe', 'post_ids': ['one']})
+        self.assertEqual(
+            json.loads(self.client.receive()['text'])['type'], 'error')
+
+
+@override_settings(EVENT_LOG_KEY='test:events:posts', EVENT_LOG_SIZE=3,
+                   EVENT_REPLAY_CHUNK_SIZE=2)
+class PostStreamReplayTestSuite(ChannelTestCase):
+    def setUp(self):
+        event_log.clear()
+        self.addCleanup(event_log.clear)
+        self.client = Client()
+
+    def log_frames(self, num_frames):
+        return [
+            event_log.append(json.dumps({'type': 'post_delete', 'data': i}))
+            for i in range(num_frames)
+        ]
+
+    def connect(self, query_string):
+        self.client.send_and_consume(u'websocket.connect', {
+            'path': STREAM_PATH,
+            'query_string': query_string,
+        })
+        self.assertEqual(self.client.receive(), {'accept': True})
+        frames = []
+        message = self.client.receive()
+        while message is not None:
+            frames.append(json.loads(message['text']))
+            message = self.client.receive()
+        return frames
+
+    def test_missed_frames_are_replayed(self):
+        logged = [json.loads(frame) for frame in self.log_frames(4)]
+        self.assertEqual([frame['seq'] for frame in logged], [1, 2, 3, 4])
+        self.assertEqual(self.connect('after=1'), [
+            {'type': 'replay', 'data': logged[1:3]},
+            {'type': 'replay', 'data': logged[3:]},
+            {'type': 'resumed', 'data': {'seq': 4}},
+        ])
+
+    def test_up_to_date_clients_only_resume(self):
+        self.log_frames(2)
+        self.assertEqual(
+            self.connect('after=2'), [{'type': 'resumed', 'data': {'seq': 2}}])
+        self.assertEqual(
+            self.connect('after='), [{'type': 'resumed', 'data': {'seq': 2}}])
+
+    def test_clients_resync_when_frames_were_evicted(self):
+        self.log_frames(5)
+        self.assertEqual(self.connect('after=1'), [
+            {'type': 'resync_required', 'data': {'seq': 5}}])
+        self.assertEqual(self.connect('after=2')[-1]['type'], 'resumed')
+
+    def test_clients_resync_when_the_log_was_lost(self):
+        self.log_frames(2)
+        self.assertEqual(self.connect('after=7'), [
+            {'type': 'resync_required', 'data': {'seq': 2}}])
+
+    def test_clients_resync_when_redis_fails(self):
+        with mock.patch.object(event_log.client, 'pipeline',
+                               side_effect=redis.RedisError):
+            frames = self.connect('after=1')
+        self.assertEqual(
+            frames, [{'type': 'resync_required', 'data': {'seq': None}}])
+
+    def test_frames_go_out_unstamped_when_redis_fails(self):
+        frame = json.dumps({'type': 'post_delete', 'data': 1})
+        with mock.patch.object(event_log.client, 'incr',
+                               side_effect=redis.RedisError):
+            self.assertEqual(event_log.append(frame), frame)
+
+    def test_invalid_sequence_numbers_get_an_error(self):
+        self.assertEqual(self.connect('after=one')[0]['type'], 'error')
+
+    def test_connecting_without_after_replays_nothing(self):
+        self.log_frames(2)
+        self.assertEqual(self.connect(''), [])
@@ -0,0 +1,62 @@
+from __future__ import unicode_literals
+
+from collections import OrderedDict, namedtuple
+import datetime
+from decimal import Decimal
+import unittest
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+from django.utils.translation import ugettext_lazy
+from rest_framework import renderers
+
+from core import encoders
+from core.renderers import JSONRenderer
+
+
+Point = namedtuple('Point', ['x', 'y'])
+
+SAMPLE = OrderedDict([
+    ('id', 1),
+    ('content', 'Caf\xe9 \u2028 \u2029 "quoted" </script>'),
+    ('created', datetime.datetime(
+        2017, 4, 9, 6, 22, 1, 5, tzinfo=timezone.utc)),
+    ('day', datetime.date(2017, 4, 9)),
+    ('price', Decimal('10.50')),
+    ('ratio', 0.1),
+    ('point', Point(1, 2)),
+    ('lazy', ugettext_lazy('Active')),
+    ('nested', [{'in_love': False, 'num_loves': None}]),
+])
+
+
+class EncodersTestSuite(SimpleTestCase):
+    def test_stdlib_backend_matches_drf(self):
+        self.assertEqual(
+            encoders.dumps(SAMPLE, backend='json'),
+            renderers.JSONRenderer().render(SAMPLE))
+
+    @unittest.skipIf(encoders.simplejson is None, 'simplejson not installed')
+    def test_simplejson_backend_matches_drf(self):
+        self.assertEqual(
+            encoders.dumps(SAMPLE, backend='simplejson'),
+            renderers.JSONRenderer().render(SAMPLE))
+
+    def test_renderer_matches_drf_when_indented(self):
+        context = {'indent': 4}
+        self.assertEqual(
+            JSONRenderer().render(SAMPLE, renderer_context=context),
+            renderers.JSONRenderer().render(SAMPLE, renderer_context=context))
+
+    @override_settings(JSON_ENCODER='ujson')
+    def test_unknown_backend(self):
+        self.assertRaises(ImproperlyConfigured, encoders.dumps, SAMPLE)
+
+    def test_benchencode_command(self):
+        out = StringIO()
+        call_command('benchencode', page_size=2, iterations=1, stdout=out)
+        self.assertIn('feed page', out.getvalue())
+        self.assertIn('broadcast frame', out.getvalue())
@@ -0,0 +1,79 @@
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse_lazy
+from django.utils import timezone
+from rest_framework import status
+
+from factories.factories import ProfileFactory, UserFactory
+
+from core.explain import sequential_scans
+from core.models import Post
+from core.sync import encode_token
+from core.tests.http_header import APIHeaderAuthorization
+from core.tests.testing_utils import (
+    IndexUsageMixin, create_love_relationship, create_post_objects
+)
+
+
+class IndexUsageTestSuite(IndexUsageMixin, APIHeaderAuthorization):
+    def setUp(self):
+        super(IndexUsageTestSuite, self).setUp()
+        author = ProfileFactory(user=UserFactory(username='jane_doe')).user
+        self.posts = create_post_objects(author, 30)
+        create_post_objects(self.profile.user, 5)
+        create_love_relationship(self.profile.user, self.posts[::3])
+        self.list_url = reverse_lazy('post-list')
+
+    def test_post_list_uses_indexes(self):
+        response = self.assertUsesIndexes('get', self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertUsesIndexes('get', response.data['next'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_top_post_list_uses_indexes(self):
+        response = self.assertUsesIndexes(
+            'get', self.list_url, {'q': 'top', 'limit': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.assertUsesIndexes('get', response.data['next'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_private_post_list_uses_indexes(self):
+        response = self.assertUsesIndexes(
+            'get', self.list_url, {'private': True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_post_detail_uses_indexes(self):
+        url = reverse_lazy('post-detail', kwargs={'pk': self.posts[0].id})
+        response = self.assertUsesIndexes('get', url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_love_view_uses_indexes(self):
+        url = reverse_lazy('love-view', kwargs={'post_id': self.posts[1].id})
+        response = self.assertUsesIndexes('post', url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.assertUsesIndexes('delete', url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_post_sync_uses_indexes(self):
+        self.posts[0].delete()
+        token = encode_token((timezone.now() - timedelta(hours=1), 0))
+        response = self.assertUsesIndexes(
+            'get', self.list_url, {'since': token, 'page_size': 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['deleted']), 1)
+
+    @skipUnless(connection.vendor == 'postgresql',
+                'only PostgreSQL indexes the search vector of posts')
+    def test_post_search_uses_indexes(self):
+        response = self.assertUsesIndexes(
+            'get', self.list_url, {'q': 'post', 'page_size': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sequential_scans_are_reported(self):
+        queryset = Post.objects.order_by('content')[:5]
+        sql, params = queryset.query.sql_with_params()
+        self.assertEqual(sequential_scans(sql, params), ['core_post'])
@@ -0,0 +1,149 @@
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse_lazy
+from django.utils.six import StringIO
+import mock
+import redis
+from rest_framework.test import APIClient
+
+from factories.factories import ProfileFactory
+
+from core.leaderboard import leaderboard
+from core.models import Love, Post
+from core.tests.http_header import APIHeaderAuthorization
+from core.tests.testing_utils import create_post_objects
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts')
+class LeaderboardTestSuite(SimpleTestCase):
+    def setUp(self):
+        leaderboard.clear()
+        self.addCleanup(leaderboard.clear)
+
+    def test_top_is_none_until_built(self):
+        leaderboard.add(1, 3)
+        self.assertIsNone(leaderboard.top(10))
+
+    def test_top_orders_by_loves_then_id(self):
+        leaderboard.rebuild([(1, 2), (2, 5), (3, 2), (10, 2)])
+        self.assertEqual(leaderboard.top(10), [2, 1, 3, 10])
+        self.assertEqual(leaderboard.top(2), [2, 1])
+
+    def test_updates_move_posts_in_the_ranking(self):
+        leaderboard.rebuild([(1, 2), (2, 1)])
+        leaderboard.incr(2, 2)
+        leaderboard.add(3, 0)
+        leaderboard.remove(1)
+        self.assertEqual(leaderboard.top(10), [2, 3])
+        leaderboard.incr(2, -3)
+        self.assertEqual(leaderboard.top(10), [2, 3])
+
+    def test_rebuild_replaces_the_ranking(self):
+        leaderboard.rebuild([(1, 2), (2, 1)])
+        self.assertEqual(leaderboard.rebuild([(3, 1)], chunk_size=1), 1)
+        self.assertEqual(leaderboard.top(10), [3])
+        self.assertEqual(leaderboard.rebuild([]), 0)
+        self.assertEqual(leaderboard.top(10), [])
+
+    def test_updates_made_during_a_rebuild_survive_it(self):
+        def rows():
+            yield (1, 2)
+            leaderboard.incr(1, 3)
+            leaderboard.incr(2, 1)
+            leaderboard.remove(3)
+            leaderboard.add(4)
+            yield (2, 1)
+            yield (3, 4)
+        leaderboard.rebuild(rows())
+        self.assertEqual(leaderboard.top(10), [1, 2, 4])
+        leaderboard.incr(4, 1)
+        self.assertFalse(leaderboard.client.exists(leaderboard.building_key))
+
+    def test_failed_update_stops_the_ranking_from_being_read(self):
+        leaderboard.rebuild([(1, 2)])
+        with mock.patch.object(leaderboard.client, 'zincrby',
+                               side_effect=redis.ConnectionError):
+            leaderboard.incr(1, 1)
+        self.assertIsNone(leaderboard.top(10))
+
+    def test_top_is_none_when_redis_is_down(self):
+        with mock.patch.object(leaderboard.client, 'pipeline',
+                               side_effect=redis.ConnectionError):
+            self.assertIsNone(leaderboard.top(10))
+
+
+@override_settings(LEADERBOARD_KEY='test:leaderboard:posts')
+class LeaderboardMaintenanceTestSuite(TransactionTestCase):
+    def setUp(self):
+        leaderboard.clear()
+        self.addCleanup(leaderboard.clear)
+        self.user = ProfileFactory().user
+        self.posts = create_post_objects(self.user, 3)
+        call_command('rebuild_leaderboard', stdout=StringIO())
+
+    def test_rebuild_command_ranks_every_post(self):
+        out = StringIO()
+        call_command('rebuild_leaderboard', chunk_size=2, stdout=out)
+        self.assertIn('3 posts ranked', out.getvalue())
+        self.assertEqual(
+            leaderboard.top(10), [post.id for post in self.posts])
+
+    def test_loves_and_deletes_update_the_ranking_on_commit(self):
+        Love.create_love(self.user, self.posts[2].id)
+        self.assertEqual(leaderboard.top(1), [self.posts[2].id])
+        Love.delete_love(self.user, self.posts[2].id)
+        self.assertEqual(leaderboard.top(1), [self.posts[0].id])
+        self.posts[0].delete()
+        self.assertNotIn(self.posts[0].id, leaderboard.top(10))
+
+    def test_bulk_loves_update_the_ranking_on_commit(self):
+        Love.apply_bulk(self.user, [
+            (self.posts[1].id, Love.LOVE), (self.posts[2].id, Love.LOVE)])
+        self.assertEqual(
+            leaderboard.top(2), [self.posts[1].id, self.posts[2].id])
+        Love.apply_bulk(self.user, [(self.posts[1].id, Love.UNLOVE)])
+        self.assertEqual(leaderboard.top(1), [self.posts[2].id])
+
+    def test_queryset_and_cascade_deletes_update_the_ranking(self):
+        Post.objects.filter(id=self.posts[0].id).delete()
+        self.assertNotIn(self.posts[0].id, leaderboard.top(10))
+        self.user.delete()
+        self.assertEqual(leaderboard.top(10), [])
+
+    def test_new_posts_are_ranked(self):
+        post = create_post_objects(self.user, 1)[0]
+        self.assertEqual(leaderboard.top(10)[-1], post.id)
+
+    def test_top_posts_are_picked_from_the_leaderboard(self):
+        posts = self.posts + create_post_objects(self.user, 2)
+        # loves the database knows nothing about, so without the
+        # leaderboard the first post would be on top
+        for post in posts[1:]:
+            leaderboard.incr(post.id, 1)
+        response = APIClient().get(
+            reverse_lazy('post-list'), {'q': 'top', 'limit': 1})
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            [self.posts[1].id])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_stale_leaderboard_ids_fall_back_to_the_database(self):
+        # posts deleted without the leaderboard knowing
+        for post_id in range(9000, 9004):
+            leaderboard.add(post_id, 10)
+        response = APIClient().get(
+            reverse_lazy('post-list'), {'q': 'top', 'limit': 1})
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            [self.posts[0].id])
+        self.assertIsNotNone(response.data['next'])
+
+
+class TopPostsFallbackTestSuite(APIHeaderAuthorization):
+    def test_top_posts_are_ranked_by_the_database_without_leaderboard(self):
+        posts = create_post_objects(self.profile.user, 2)
+        Post.objects.filter(id=posts[1].id).update(num_loves=1)
+        response = self.client.get(
+            reverse_lazy('post-list'), {'q': 'top', 'limit': 1})
+        self.assertEqual(
+            [post['id'] for post in response.data['results']], [posts[1].id])
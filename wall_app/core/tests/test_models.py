@@ -1,8 +1,15 @@
-from django.test import TestCase
+import threading
+from unittest import skipUnless
+
+from django.db import connection, connections, models
+from django.test import TestCase, TransactionTestCase
 
 from factories.factories import UserFactory, ProfileFactory
 
+from accounts.models import Profile
+from core.cache import feed_cache
 from core.models import Post, Love
+from core.serializers import PostRowSerializer, PostSerializer
 from core.tests.testing_utils import (
     create_love_relationship, create_post_objects
 )
@@ -53,6 +60,50 @@ class PostTestSuite(Base):
         for post in queryset_with_loved_posts:
             self.assertIn(post, expected)
 
+    def test_get_queryset_sets_in_love_for_the_viewer(self):
+        loved = self.posts_with_2_loves + self.posts_with_1_love
+        for post in Post.get_queryset(self.user_2.id):
+            self.assertEqual(post.in_love, post in loved)
+
+    def test_get_queryset_sets_in_love_false_for_anonymous_viewer(self):
+        for post in Post.get_queryset(None):
+            self.assertFalse(post.in_love)
+
+    def test_get_queryset_loads_a_page_in_three_queries(self):
+        with self.assertNumQueries(3):
+            posts = list(Post.get_queryset(self.user_1.id)[1:4])
+            for post in posts:
+                post.author.profile.num_posts
+        expected = Post.objects.order_by('-date_modified', '-id')[1:4]
+        self.assertEqual(posts, list(expected))
+
+    def test_get_queryset_serializes_like_an_annotated_queryset(self):
+        loves = Love.objects.filter(post=models.OuterRef('pk'),
+                                    fan=self.user_2)
+        annotated = Post.objects.annotate(
+            in_love=models.Exists(loves.values('id'))
+        ).order_by('-date_modified', '-id')
+        self.assertEqual(
+            PostSerializer(Post.get_queryset(self.user_2.id), many=True).data,
+            PostSerializer(annotated, many=True).data
+        )
+
+    def test_rows_serialize_like_posts(self):
+        Profile.objects.filter(user=self.user_2).update(about=u'Caf\xe9')
+        for user_id in (self.user_2.id, None):
+            queryset = Post.get_queryset(user_id)
+            self.assertEqual(
+                PostRowSerializer(queryset.as_rows(), many=True).data,
+                PostSerializer(queryset, many=True).data
+            )
+
+    def test_rows_load_a_page_in_three_queries(self):
+        with self.assertNumQueries(3):
+            rows = list(Post.get_queryset(self.user_1.id).as_rows()[1:4])
+        expected = Post.objects.order_by('-date_modified', '-id')[1:4]
+        self.assertEqual(
+            [row.id for row in rows], [post.id for post in expected])
+
     def test_order_queryset_by_num_loves_returns_posts_ordered_by_num_loves(self):
         queryset = Post.get_queryset(self.user_1.id)
         queryset = Post.order_queryset_by_num_loves(queryset, limit=10)
@@ -62,6 +113,20 @@ class PostTestSuite(Base):
         for index, post in enumerate(queryset):
             self.assertEqual(post.id, expected[index].id)
 
+    def test_creating_posts_increments_author_num_posts(self):
+        self.assertEqual(Profile.objects.get(user=self.user_1).num_posts, 3)
+        self.assertEqual(Profile.objects.get(user=self.user_2).num_posts, 2)
+
+    def test_deleting_post_decrements_author_num_posts(self):
+        self.posts_with_no_love[0].delete()
+        self.assertEqual(Profile.objects.get(user=self.user_1).num_posts, 2)
+
+    def test_queryset_deletes_decrement_author_num_posts(self):
+        Post.objects.filter(
+            id__in=[post.id for post in self.posts_with_no_love]).delete()
+        self.assertEqual(Profile.objects.get(user=self.user_1).num_posts, 2)
+        self.assertEqual(Profile.objects.get(user=self.user_2).num_posts, 1)
+
 
 class LoveTestSuite(Base):
     def test_create_love_creates_new_love_object(self):
@@ -81,6 +146,42 @@ class LoveTestSuite(Base):
         self.assertFalse(
             Love.objects.filter(fan=self.user_1, post=post).exists())
 
+    def test_create_love_increments_num_loves(self):
+        post = self.posts_with_1_love[0]
+        Love.create_love(self.user_1, post.id)
+        self.assertEqual(Post.objects.get(id=post.id).num_loves, 2)
+
+    def test_create_existing_love_does_not_increment_num_loves(self):
+        post = self.posts_with_2_loves[0]
+        Love.create_love(self.user_1, post.id)
+        self.assertEqual(Post.objects.get(id=post.id).num_loves, 2)
+
+    def test_delete_love_decrements_num_loves(self):
+        post = self.posts_with_2_loves[0]
+        Love.delete_love(self.user_1, post.id)
+        self.assertEqual(Post.objects.get(id=post.id).num_loves, 1)
+
+    def test_queryset_deletes_decrement_num_loves(self):
+        Love.objects.filter(fan=self.user_2).delete()
+        self.assertEqual(
+            Post.objects.get(id=self.posts_with_2_loves[0].id).num_loves, 1)
+        self.assertEqual(
+            Post.objects.get(id=self.posts_with_1_love[0].id).num_loves, 0)
+
+    def test_deleting_a_fan_decrements_num_loves(self):
+        fan = UserFactory(username='jack_doe')
+        post = self.posts_with_no_love[0]
+        Love.create_love(fan, post.id)
+        fan.delete()
+        self.assertEqual(Post.objects.get(id=post.id).num_loves, 0)
+
+    def test_saving_stale_post_does_not_overwrite_num_loves(self):
+        post = Post.objects.get(id=self.posts_with_no_love[0].id)
+        Love.create_love(self.user_1, post.id)
+        post.content = 'Edited'
+        post.save()
+        self.assertEqual(Post.objects.get(id=post.id).num_loves, 1)
+
     def test_get_num_post_loves(self):
         for post in self.posts_with_2_loves:
             self.assertEqual(Love.get_num_post_loves(post.id), 2)
@@ -88,3 +189,97 @@ class LoveTestSuite(Base):
             self.assertEqual(Love.get_num_post_loves(post.id), 1)
         for post in self.posts_with_no_love:
             self.assertEqual(Love.get_num_post_loves(post.id), 0)
+
+    def test_set_love_is_idempotent(self):
+        post = self.posts_with_1_love[0]
+        self.assertEqual(Love.set_love(self.user_1, post.id, True), 2)
+        self.assertEqual(Love.set_love(self.user_1, post.id, True), 2)
+        self.assertEqual(Love.objects.filter(post=post).count(), 2)
+        self.assertEqual(Love.set_love(self.user_2, post.id, False), 1)
+        self.assertEqual(Love.set_love(self.user_2, post.id, False), 1)
+        self.assertEqual(Post.objects.get(id=post.id).num_loves, 1)
+
+    def test_set_love_on_a_missing_post_returns_none(self):
+        self.assertIsNone(Love.set_love(self.user_1, 9999, True))
+        self.assertIsNone(Love.set_love(self.user_1, 9999, False))
+        self.assertFalse(Love.objects.filter(post_id=9999).exists())
+
+    def test_apply_bulk_only_counts_loves_it_changes(self):
+        loved_post = self.posts_with_1_love[0]
+        unloved_post = self.posts_with_no_love[0]
+        results = Love.apply_bulk(self.user_2, [
+            (loved_post.id, Love.LOVE), (unloved_post.id, Love.UNLOVE)])
+        self.assertEqual([result['num_loves'] for result in results], [1, 0])
+        self.assertEqual(Post.objects.get(id=loved_post.id).num_loves, 1)
+        self.assertEqual(Post.objects.get(id=unloved_post.id).num_loves, 0)
+
+    def test_apply_bulk_keeps_the_feed_cache_until_commit(self):
+        generation = feed_cache.cache.get(feed_cache.GENERATION_KEY, 0)
+        # TestCase never commits, so on_commit callbacks do not run
+        Love.apply_bulk(
+            self.user_1, [(self.posts_with_no_love[0].id, Love.LOVE)])
+        self.assertEqual(
+            feed_cache.cache.get(feed_cache.GENERATION_KEY, 0), generation)
+
+
+@skipUnless(connection.features.has_select_for_update,
+            'needs a database that serves concurrent writers')
+class ConcurrentLoveTestSuite(TransactionTestCase):
+    def setUp(self):
+        self.post = create_post_objects(ProfileFactory().user, 1)[0]
+        self.fans = [
+            UserFactory(username='fan{index}'.format(index=index))
+            for index in range(4)
+        ]
+
+    def run_concurrently(self, target, args_list):
+        def run(*args):
+            try:
+                target(*args)
+            finally:
+                connections.close_all()
+        threads = [threading.Thread(target=run, args=args)
+                   for args in args_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_double_taps_count_each_fan_once(self):
+        self.run_concurrently(Love.set_love, [
+            (fan, self.post.id, True) for fan in self.fans for _ in range(3)
+        ])
+        self.assertEqual(Love.objects.filter(post=self.post).count(), 4)
+        self.assertEqual(Post.objects.get(id=self.post.id).num_loves, 4)
+
+        self.run_concurrently(Love.set_love, [
+            (fan, self.post.id, False) for fan in self.fans[:2]
+            for _ in range(3)
+        ])
+        self.assertEqual(Post.objects.get(id=self.post.id).num_loves, 2)
+
+    def test_concurrent_bulk_and_single_loves_count_each_fan_once(self):
+        errors = []
+
+        def love(fan, in_love, bulk):
+            try:
+                if bulk:
+                    action = Love.LOVE if in_love else Love.UNLOVE
+                    Love.apply_bulk(fan, [(self.post.id, action)])
+                else:
+                    Love.set_love(fan, self.post.id, in_love)
+            except Exception as error:
+                errors.append(error)
+
+        self.run_concurrently(love, [
+            (fan, True, bulk) for fan in self.fans for bulk in (True, False)
+        ])
+        self.assertEqual(errors, [])
+        self.assertEqual(Post.objects.get(id=self.post.id).num_loves, 4)
+
+        self.run_concurrently(love, [
+            (fan, False, bulk) for fan in self.fans[:2]
+            for bulk in (True, False, True)
+        ])
+        self.assertEqual(errors, [])
+        self.assertEqual(Post.objects.get(id=self.post.id).num_loves, 2)
@@ -0,0 +1,130 @@
+from django.urls import reverse_lazy
+from rest_framework import status
+
+from factories.factories import PostFactory, ProfileFactory, UserFactory
+
+from core.tests.http_header import APIHeaderAuthorization
+from core.tests.testing_utils import (
+    QueryBudgetMixin, create_love_relationship, create_post_objects
+)
+
+
+class PostListQueryBudgetTestSuite(QueryBudgetMixin, APIHeaderAuthorization):
+    def setUp(self):
+        super(PostListQueryBudgetTestSuite, self).setUp()
+        self.url = reverse_lazy('post-list')
+        for username in ('jane_doe', 'jack_doe', 'jill_doe'):
+            author = ProfileFactory(user=UserFactory(username=username)).user
+            posts = create_post_objects(author, 20)
+            create_love_relationship(self.profile.user, posts[::2])
+
+    def test_list_posts_does_not_depend_on_page_size(self):
+        for page_size in (5, 50):
+            response = self.assertWithinQueryBudget(
+                4, 'get', self.url, {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_list_posts_anonymously(self):
+        self.client.credentials()
+        response = self.assertWithinQueryBudget(
+            2, 'get', self.url, {'page_size': 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_posts_by_page_number(self):
+        response = self.assertWithinQueryBudget(
+            5, 'get', self.url, {'page': 2, 'page_size': 20})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_top_posts(self):
+        response = self.assertWithinQueryBudget(
+            4, 'get', self.url, {'q': 'top', 'limit': 50})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_private_posts(self):
+        create_post_objects(self.profile.user, 10)
+        response = self.assertWithinQueryBudget(
+            4, 'get', self.url, {'private': True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_create_post(self):
+        response = self.assertWithinQueryBudget(
+            6, 'post', self.url, {'content': 'Hello World!'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class PostDetailQueryBudgetTestSuite(QueryBudgetMixin,
+                                     APIHeaderAuthorization):
+    def setUp(self):
+        super(PostDetailQueryBudgetTestSuite, self).setUp()
+        self.post = PostFactory(author=self.profile.user)
+        self.url = reverse_lazy('post-detail', kwargs={'pk': self.post.id})
+
+    def test_retrieve_post(self):
+        response = self.assertWithinQueryBudget(4, 'get', self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_post(self):
+        response = self.assertWithinQueryBudget(
+            7, 'put', self.url, {'content': 'Updated Post'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_delete_post(self):
+        # includes the tombstone left for syncing clients and the loves,
+        # deleted before the collector looks for them
+        response = self.assertWithinQueryBudget(11, 'delete', self.url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class LoveViewQueryBudgetTestSuite(QueryBudgetMixin, APIHeaderAuthorization):
+    def setUp(self):
+        super(LoveViewQueryBudgetTestSuite, self).setUp()
+        self.post = PostFactory(author=self.profile.user)
+        self.url = reverse_lazy('love-view', kwargs={'post_id': self.post.id})
+
+    def test_love_post(self):
+        response = self.assertWithinQueryBudget(6, 'post', self.url)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_unlove_post(self):
+        create_love_relationship(self.profile.user, [self.post])
+        response = self.assertWithinQueryBudget(6, 'delete', self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BulkLoveQueryBudgetTestSuite(QueryBudgetMixin, APIHeaderAuthorization):
+    def setUp(self):
+        super(BulkLoveQueryBudgetTestSuite, self).setUp()
+        self.url = reverse_lazy('love-bulk')
+        self.posts = create_post_objects(self.profile.user, 40)
+        create_love_relationship(self.profile.user, self.posts[::2])
+
+    def test_bulk_love_does_not_depend_on_the_number_of_items(self):
+        for num_items in (4, 40):
+            items = [
+                {'post_id': post.id,
+                 'action': 'unlove' if index % 2 == 0 else 'love'}
+                for index, post in enumerate(self.posts[:num_items])
+            ]
+            response = self.assertWithinQueryBudget(
+                9, 'post', self.url, {'items': items}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class PostExportQueryBudgetTestSuite(QueryBudgetMixin, APIHeaderAuthorization):
+    def setUp(self):
+        super(PostExportQueryBudgetTestSuite, self).setUp()
+        self.url = reverse_lazy('post-export')
+        self.profile.user.is_staff = True
+        self.profile.user.save()
+        for username in ('jane_doe', 'jack_doe', 'jill_doe'):
+            author = ProfileFactory(user=UserFactory(username=username)).user
+            posts = create_post_objects(author, 20)
+            create_love_relationship(self.profile.user, posts[::2])
+            create_love_relationship(author, posts[::3])
+
+    def test_export_posts(self):
+        # the viewer, then the posts and their fans, a chunk at a time
+        response = self.assertWithinQueryBudget(3, 'get', self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 60)
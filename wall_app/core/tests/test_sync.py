@@ -0,0 +1,152 @@
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.six import StringIO
+from rest_framework import status
+
+from factories.factories import ProfileFactory
+
+from core.models import Post, PostTombstone
+from core.sync import decode_token, encode_token
+from core.tests.http_header import APIHeaderAuthorization
+from core.tests.testing_utils import QueryBudgetMixin, create_post_objects
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class PostSyncTestSuite(QueryBudgetMixin, APIHeaderAuthorization):
+    @classmethod
+    def setUpClass(cls):
+        super(PostSyncTestSuite, cls).setUpClass()
+        cls.url = reverse_lazy('post-list')
+
+    def sync(self, token, **params):
+        params['since'] = token
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_empty_token_starts_a_sync(self):
+        create_post_objects(self.profile.user, 2)
+        data = self.sync('')
+        self.assertEqual(data['posts'], [])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.sync(data['since'])['posts'], [])
+
+    def test_sync_returns_changes_and_tombstones(self):
+        posts = create_post_objects(self.profile.user, 3)
+        token = self.sync('')['since']
+
+        new_post = create_post_objects(self.profile.user, 1)[0]
+        posts[0].content = 'Edited'
+        posts[0].save()
+        deleted_id = posts[1].id
+        posts[1].delete()
+
+        data = self.sync(token)
+        self.assertEqual([post['id'] for post in data['posts']],
+                         [new_post.id, posts[0].id])
+        self.assertEqual(data['posts'][1]['content'], 'Edited')
+        self.assertEqual(data['deleted'], [deleted_id])
+        self.assertFalse(data['has_more'])
+
+        data = self.sync(data['since'])
+        self.assertEqual((data['posts'], data['deleted']), ([], []))
+
+    def test_queryset_and_cascade_deletes_leave_tombstones(self):
+        other = ProfileFactory(user__username='jane').user
+        posts = create_post_objects(self.profile.user, 2)
+        other_post = create_post_objects(other, 1)[0]
+        token = self.sync('')['since']
+
+        Post.objects.filter(id=posts[0].id).delete()
+        other.delete()
+        data = self.sync(token)
+        self.assertEqual(data['posts'], [])
+        self.assertEqual(sorted(data['deleted']),
+                         sorted([posts[0].id, other_post.id]))
+
+    def test_changes_are_paged(self):
+        token = self.sync('')['since']
+        posts = create_post_objects(self.profile.user, 5)
+        deleted_id = posts[0].id
+        posts[0].delete()
+
+        seen, deleted, pages = [], [], 0
+        has_more = True
+        while has_more:
+            data = self.sync(token, page_size=2)
+            seen += [post['id'] for post in data['posts']]
+            deleted += data['deleted']
+            token, has_more = data['since'], data['has_more']
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [post.id for post in posts[1:]])
+        self.assertEqual(deleted, [deleted_id])
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_changes_inside_the_settle_window_are_left_for_later(self):
+        posts = create_post_objects(self.profile.user, 3)
+        Post.objects.filter(id__in=[posts[0].id, posts[1].id]).update(
+            date_modified=timezone.now() - timedelta(minutes=5))
+        token = encode_token((timezone.now() - timedelta(minutes=10), 0))
+
+        data = self.sync(token, page_size=1)
+        self.assertEqual([post['id'] for post in data['posts']],
+                         [posts[0].id])
+        self.assertTrue(data['has_more'])
+        data = self.sync(data['since'], page_size=1)
+        self.assertEqual([post['id'] for post in data['posts']],
+                         [posts[1].id])
+        self.assertFalse(data['has_more'])
+        self.assertLessEqual(decode_token(data['since'])[0],
+                             timezone.now() - timedelta(seconds=60))
+        self.assertEqual(self.sync(data['since'])['posts'], [])
+
+    def test_private_sync_only_has_own_changes(self):
+        other = ProfileFactory(user__username='jane').user
+        token = self.sync('')['since']
+        own = create_post_objects(self.profile.user, 1)[0]
+        create_post_objects(other, 2)[0].delete()
+
+        data = self.sync(token, private=True)
+        self.assertEqual([post['id'] for post in data['posts']], [own.id])
+        self.assertEqual(data['deleted'], [])
+
+    def test_sync_costs_the_changes_only(self):
+        create_post_objects(self.profile.user, 30)
+        token = self.sync('')['since']
+        post = create_post_objects(self.profile.user, 1)[0]
+        # the viewer, whose num_posts just changed, then ids, rows, loves of
+        # the viewer and tombstones
+        response = self.assertWithinQueryBudget(
+            5, 'get', self.url, {'since': token})
+        self.assertEqual(
+            [row['id'] for row in response.data['posts']], [post.id])
+
+    def test_invalid_token(self):
+        response = self.client.get(self.url, {'since': 'not-a-token'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_token(self):
+        token = encode_token((timezone.now() - timedelta(days=31), 0))
+        response = self.client.get(self.url, {'since': token})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_prune_tombstones(self):
+        post_ids = []
+        for post in create_post_objects(self.profile.user, 2):
+            post_ids.append(post.id)
+            post.delete()
+        PostTombstone.objects.filter(post_id=post_ids[0]).update(
+            date_deleted=timezone.now() - timedelta(days=31))
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertIn('1 tombstones pruned', out.getvalue())
+        self.assertEqual(
+            list(PostTombstone.objects.values_list('post_id', flat=True)),
+            post_ids[1:])
+        self.assertFalse(Post.objects.exists())
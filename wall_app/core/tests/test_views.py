@@ -1,3 +1,6 @@
+from base64 import urlsafe_b64encode
+import json
+
 from django.urls import reverse_lazy
 from rest_framework import status
 import mock
@@ -11,6 +14,11 @@ from core.tests.testing_utils import (
 )
 
 
+def encode_cursor(position):
+    """Returns a ?cursor= value for a keyset position"""
+    return urlsafe_b64encode(json.dumps({'p': position}).encode('utf-8'))
+
+
 class PostListTestSuite(APIHeaderAuthorization):
     @classmethod
     def setUpClass(cls):
@@ -43,12 +51,20 @@ class PostListTestSuite(APIHeaderAuthorization):
             Post.objects.filter(content=post['content']).exists()
         )
 
+    def test_new_post_response_is_the_broadcast_encoding(self):
+        response = self.client.post(
+            self.url, data={'content': 'Hello World!'})
+        post = Post.objects.get(id=response.data['id'])
+        post.encode()
+        self.assertEqual(response.content, post.encoded)
+        self.assertEqual(json.loads(response.content), response.data)
+
     @mock.patch('core.pagination.StandardResultsSetPagination.page_size')
     def test_posts_response_are_paginated(self, mocked_page_size):
         mocked_page_size.return_value = 1
         num_posts = 3
         create_post_objects(self.profile.user, num_posts)
-        response = self.client.get(self.url)
+        response = self.client.get(self.url, {'page': 1})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(
             len(response.data['results']),
@@ -57,6 +73,67 @@ class PostListTestSuite(APIHeaderAuthorization):
         self.assertEqual(response.data['count'], num_posts)
         self.assertTrue(response.data['next'])
 
+    def test_posts_are_paginated_by_cursor_by_default(self):
+        posts = create_post_objects(self.profile.user, 5)
+        posts.reverse()
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        returned = []
+        while True:
+            returned += [post['id'] for post in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(returned, [post.id for post in posts])
+
+    def test_previous_cursor_returns_preceding_page(self):
+        create_post_objects(self.profile.user, 5)
+        first_page = self.client.get(self.url, {'page_size': 2})
+        second_page = self.client.get(first_page.data['next'])
+        response = self.client.get(second_page.data['previous'])
+        self.assertEqual(response.data['results'],
+                         first_page.data['results'])
+
+    def test_cursor_pages_are_stable_when_new_posts_arrive(self):
+        posts = create_post_objects(self.profile.user, 4)
+        response = self.client.get(self.url, {'page_size': 2})
+        create_post_objects(self.profile.user, 3)
+        response = self.client.get(response.data['next'])
+        returned = [post['id'] for post in response.data['results']]
+        self.assertEqual(returned, [posts[1].id, posts[0].id])
+
+    def test_invalid_cursor_returns_not_found(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursors_with_malformed_positions_return_not_found(self):
+        create_post_objects(self.profile.user, 2)
+        positions = [
+            ['notadate', 1], [{'a': 1}, 1], [None, None],
+            ['2017-01-01T00:00:00', 'x'], ['2017-01-01T00:00:00', True],
+        ]
+        for position in positions:
+            response = self.client.get(
+                self.url, {'cursor': encode_cursor(position)})
+            self.assertEqual(
+                response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+        for position in [['1', 1], [1, None], [1, 1.5]]:
+            response = self.client.get(
+                self.url, {'q': 'top', 'cursor': encode_cursor(position)})
+            self.assertEqual(
+                response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    def test_cursors_with_naive_dates_are_accepted(self):
+        posts = create_post_objects(self.profile.user, 2)
+        response = self.client.get(self.url, {'cursor': encode_cursor(
+            ['2999-01-01T00:00:00', 0])})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), len(posts))
+
     def test_get_top_posts(self):
         user_2 = UserFactory(username='jane_doe')
         num_posts = 3
@@ -86,6 +163,26 @@ class PostListTestSuite(APIHeaderAuthorization):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 2)
 
+    def test_top_posts_default_to_10_posts(self):
+        create_post_objects(self.profile.user, 15)
+        response = self.client.get(self.url, {'q': 'top'})
+        self.assertEqual(len(response.data['results']), 10)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_top_posts_next_cursor_continues_by_num_loves(self):
+        user_2 = UserFactory(username='jane_doe')
+        posts = create_post_objects(self.profile.user, 3)
+        create_love_relationship(self.profile.user, posts[:2])
+        create_love_relationship(user_2, posts[:1])
+
+        response = self.client.get(self.url, {'q': 'top', 'limit': 2})
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        returned = [post['id'] for post in response.data['results']]
+        self.assertEqual(returned, [posts[2].id])
+        self.assertIsNone(response.data['next'])
+
 
 class PostDetailTestSuite(APIHeaderAuthorization):
     @classmethod
@@ -110,6 +207,12 @@ class PostDetailTestSuite(APIHeaderAuthorization):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data[self.CONTENT], data[self.CONTENT])
 
+    def test_update_post_response_shows_the_authors_love(self):
+        Love.create_love(self.profile.user, self.post.id)
+        response = self.client.put(self.url, data={self.CONTENT: 'Updated'})
+        self.assertTrue(json.loads(response.content)['in_love'])
+        self.assertEqual(json.loads(response.content)['num_loves'], 1)
+
     def test_delete_post(self):
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
@@ -153,6 +256,20 @@ class LoveCreateTestSuite(APIHeaderAuthorization):
         love = Love.objects.filter(fan=self.profile.user, post=post)
         self.assertTrue(love.exists())
 
+    def test_love_create_is_idempotent(self):
+        self.url = reverse_lazy(
+            'love-view', kwargs={'post_id': self.post.id})
+        for _ in range(2):
+            response = self.client.post(self.url, self.data)
+            self.assertEqual(response.data['num_loves'], 1)
+        self.assertEqual(Love.objects.filter(post=self.post).count(), 1)
+
+    def test_love_missing_post(self):
+        self.url = reverse_lazy('love-view', kwargs={'post_id': 9999})
+        response = self.client.post(self.url, self.data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'error': 'Invalid Post ID'})
+
 
 class LoveDeleteTestSuite(APIHeaderAuthorization):
     def setUp(self):
@@ -189,3 +306,184 @@ class LoveDeleteTestSuite(APIHeaderAuthorization):
 
         love = Love.objects.filter(fan=self.profile.user, post=post)
         self.assertFalse(love.exists())
+
+
+class BulkLoveTestSuite(APIHeaderAuthorization):
+    def setUp(self):
+        super(BulkLoveTestSuite, self).setUp()
+        self.url = reverse_lazy('love-bulk')
+        self.posts = create_post_objects(self.profile.user, 3)
+        create_love_relationship(self.profile.user, self.posts[2:])
+
+    def post_items(self, *items):
+        return self.client.post(
+            self.url,
+            {'items': [{'post_id': post_id, 'action': action}
+                       for post_id, action in items]},
+            format='json')
+
+    def test_bulk_love_applies_every_item(self):
+        response = self.post_items(
+            (self.posts[0].id, 'love'), (self.posts[1].id, 'love'),
+            (self.posts[2].id, 'unlove'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'post_id': self.posts[0].id, 'num_loves': 1, 'in_love': True},
+            {'post_id': self.posts[1].id, 'num_loves': 1, 'in_love': True},
+            {'post_id': self.posts[2].id, 'num_loves': 0, 'in_love': False},
+        ])
+        self.assertEqual(
+            set(Love.objects.values_list('post_id', flat=True)),
+            {self.posts[0].id, self.posts[1].id})
+        self.assertEqual(
+            [post.num_loves for post in Post.objects.order_by('id')],
+            [1, 1, 0])
+
+    def test_bulk_love_is_idempotent(self):
+        for _ in range(2):
+            response = self.post_items(
+                (self.posts[0].id, 'love'), (self.posts[1].id, 'unlove'))
+        self.assertEqual(
+            [result['num_loves'] for result in response.data['results']],
+            [1, 0])
+        self.assertEqual(Post.objects.get(id=self.posts[0].id).num_loves, 1)
+
+    def test_last_item_on_a_post_wins(self):
+        response = self.post_items(
+            (self.posts[0].id, 'love'), (self.posts[0].id, 'unlove'))
+        self.assertEqual(
+            response.data['results'],
+            [{'post_id': self.posts[0].id, 'num_loves': 0, 'in_love': False}]
+            * 2)
+        self.assertFalse(Love.objects.filter(post=self.posts[0]).exists())
+
+    def test_unknown_posts_are_reported_per_item(self):
+        response = self.post_items(
+            (self.posts[0].id, 'love'), (9999, 'love'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][1],
+                         {'post_id': 9999, 'error': 'Invalid Post ID'})
+        self.assertEqual(response.data['results'][0]['num_loves'], 1)
+
+    def test_invalid_batches_are_rejected(self):
+        response = self.post_items((self.posts[0].id, 'like'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('items', response.data)
+
+        response = self.post_items()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.settings(BULK_LOVE_MAX_ITEMS=1):
+            response = self.post_items(
+                (self.posts[0].id, 'love'), (self.posts[1].id, 'love'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Love.objects.filter(post=self.posts[0]).exists())
+
+    def test_anonymous_users_cannot_bulk_love(self):
+        self.client.credentials()
+        response = self.post_items((self.posts[0].id, 'love'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PostExportTestSuite(APIHeaderAuthorization):
+    def setUp(self):
+        super(PostExportTestSuite, self).setUp()
+        self.url = reverse_lazy('post-export')
+        self.user = self.profile.user
+        self.user.is_staff = True
+        self.user.save()
+        self.jane = ProfileFactory(user__username='jane').user
+        self.posts = create_post_objects(self.user, 2)
+        self.posts += create_post_objects(self.jane, 1)
+        create_love_relationship(self.jane, self.posts[:1])
+
+    def export(self, params=None):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        content = b''.join(response.streaming_content)
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_export_streams_a_post_per_line(self):
+        lines = self.export()
+        self.assertEqual(
+            [line['id'] for line in lines], [post.id for post in self.posts])
+        self.assertEqual(lines[0]['fans'], ['jane'])
+        self.assertEqual(lines[0]['num_loves'], 1)
+        self.assertEqual(lines[2]['author']['username'], 'jane')
+        self.assertEqual(lines[2]['fans'], [])
+
+    def test_export_filters_by_author_and_date_modified(self):
+        self.assertEqual(
+            [line['id'] for line in self.export({'author': 'jane'})],
+            [self.posts[2].id])
+        Post.objects.filter(id=self.posts[0].id).update(
+            date_modified='2017-01-01T00:00:00Z')
+        lines = self.export({'until': '2017-01-02T00:00:00Z'})
+        self.assertEqual([line['id'] for line in lines], [self.posts[0].id])
+        lines = self.export({'since': '2017-01-02T00:00:00'})
+        self.assertEqual(len(lines), 2)
+
+    def test_export_rejects_invalid_dates(self):
+        response = self.client.get(self.url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_is_for_admins_only(self):
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PostSearchTestSuite(APIHeaderAuthorization):
+    def setUp(self):
+        super(PostSearchTestSuite, self).setUp()
+        self.url = reverse_lazy('post-list')
+        jane = ProfileFactory(user__username='jane').user
+        contents = [
+            (self.profile.user, 'Learning Django channels'),
+            (jane, 'Redis caching for django views'),
+            (jane, 'Weekend hiking photos'),
+            (self.profile.user, 'Django REST framework tips'),
+        ]
+        self.posts = [PostFactory(author=author, content=content)
+                      for author, content in contents]
+
+    def search(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def ids(self, response):
+        return [post['id'] for post in response.data['results']]
+
+    def test_search_returns_matching_posts_only(self):
+        response = self.search({'q': 'django'})
+        self.assertEqual(
+            sorted(self.ids(response)),
+            [self.posts[0].id, self.posts[1].id, self.posts[3].id])
+        self.assertEqual(
+            self.ids(self.search({'q': 'django views'})), [self.posts[1].id])
+        self.assertEqual(self.ids(self.search({'q': 'kubernetes'})), [])
+
+    def test_search_results_are_paginated_by_cursor(self):
+        response = self.search({'q': 'django', 'page_size': 2})
+        ids = self.ids(response)
+        self.assertEqual(len(ids), 2)
+        response = self.client.get(response.data['next'])
+        ids += self.ids(response)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(
+            sorted(ids),
+            [self.posts[0].id, self.posts[1].id, self.posts[3].id])
+
+    def test_search_can_be_combined_with_private(self):
+        response = self.search({'q': 'django', 'private': True})
+        self.assertEqual(
+            sorted(self.ids(response)), [self.posts[0].id, self.posts[3].id])
+
+    def test_anonymous_users_can_search(self):
+        self.client.credentials()
+        response = self.search({'q': 'hiking'})
+        self.assertEqual(self.ids(response), [self.posts[2].id])
+        self.assertFalse(response.data['results'][0]['in_love'])
@@ -1,5 +1,16 @@
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from factories.factories import LoveFactory, PostFactory
 
+from core.explain import is_explainable, sequential_scans
+
+# the users cache is shared in Redis; tests keep theirs apart from the one
+# of any running app, see override_settings(CACHES=TEST_CACHES)
+TEST_CACHES = dict(settings.CACHES, users=dict(
+    settings.CACHES['users'], KEY_PREFIX='test:wall_app:users'))
+
 
 def create_post_objects(user, num_posts):
     """Creates post objects
@@ -28,3 +39,79 @@ def create_love_relationship(user, posts):
     for post in posts:
         loves.append(LoveFactory(fan=user, post=post))
     return loves
+
+
+class QueryBudgetMixin(object):
+    """Mixin for test cases that guard the number of queries per request"""
+
+    def assertWithinQueryBudget(self, budget, method, url, *args, **kwargs):
+        """Makes a request and fails if it ran more queries than budgeted
+
+        A streaming response is read within the budget, since it queries as
+        it is read; its content is kept so the test can read it again.
+        Args:
+            budget -- the maximum number of queries the request may run
+            method -- name of the test client method, e.g. 'get'
+            url -- the url to request
+        Returns:
+            the response
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, *args, **kwargs)
+            if response.streaming:
+                response.streaming_content = [
+                    b''.join(response.streaming_content)]
+        executed = [query['sql'] for query in context.captured_queries]
+        self.assertLessEqual(
+            len(executed), budget,
+            '{method} {url} ran {num} queries, budget is {budget}:\n'
+            '{queries}'.format(
+                method=method.upper(), url=url, num=len(executed),
+                budget=budget, queries='\n'.join(executed))
+        )
+        return response
+
+
+class IndexUsageMixin(object):
+    """
+    Mixin for test cases that check requests are served from indexes
+
+    Works on SQLite and PostgreSQL. On PostgreSQL sequential scans are
+    disabled for the test, since scanning the tiny test tables would
+    otherwise be cheaper than any index; the planner then only falls back
+    to one when no index can serve the query.
+    """
+
+    def setUp(self):
+        super(IndexUsageMixin, self).setUp()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('RESET enable_seqscan')
+        super(IndexUsageMixin, self).tearDown()
+
+    def assertUsesIndexes(self, method, url, *args, **kwargs):
+        """Makes a request and fails if any query it ran scans a table
+        Args:
+            method -- name of the test client method, e.g. 'get'
+            url -- the url to request
+        Returns:
+            the response
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, *args, **kwargs)
+        for query in context.captured_queries:
+            if not is_explainable(query['sql']):
+                continue
+            tables = sequential_scans(query['sql'])
+            self.assertEqual(
+                tables, [],
+                '{method} {url} scans {tables} in:\n{sql}'.format(
+                    method=method.upper(), url=url,
+                    tables=', '.join(tables), sql=query['sql'])
+            )
+        return response
@@ -5,6 +5,9 @@ from core import views
 
 urlpatterns = [
     url(r'^posts/$', views.PostList.as_view(), name='post-list'),
+    url(r'^posts/export/$',
+        views.PostExportView.as_view(), name='post-export'),
+    url(r'^posts/loves/$', views.BulkLoveView.as_view(), name='love-bulk'),
     url(r'^posts/(?P<pk>[0-9]+)/$',
         views.PostDetail.as_view(), name='post-detail'),
     url(r'^posts/(?P<post_id>[0-9]+)/loves/$',
@@ -0,0 +1,116 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.encoding import force_bytes
+from django.utils.http import parse_etags, quote_etag
+import redis
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ContentVersions(object):
+    """
+    Version tokens of what the API serves, kept in Redis, from which
+    validators are computed without querying the database
+
+    'wall' changes whenever a post, a love or an author's profile changes;
+    'user:<id>' whenever the profile of that user does. A version is a
+    random token rather than a counter, so a token lost with Redis is
+    never handed out again for other content. When Redis fails, get()
+    returns None and responses go without a validator.
+    """
+    KEY = 'versions:{name}'
+    WALL = 'wall'
+
+    def __init__(self, url=None):
+        self._url = url
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis.StrictRedis.from_url(
+                self._url or settings.REDIS_URL)
+        return self._client
+
+    @staticmethod
+    def user(user_id):
+        return 'user:{user_id}'.format(user_id=user_id)
+
+    def get(self, name):
+        """Returns the current token of a version, or None"""
+        key = self.KEY.format(name=name)
+        try:
+            token = self.client.get(key)
+            if token is None:
+                self.client.set(key, uuid.uuid4().hex, nx=True)
+                token = self.client.get(key)
+        except redis.RedisError:
+            return None
+        return token
+
+    def bump(self, name):
+        """
+        Moves a version to a new token once the current transaction
+        commits, so no validator is computed for the new token before
+        the change is visible
+        """
+        key = self.KEY.format(name=name)
+
+        def set_new_token():
+            try:
+                self.client.set(key, uuid.uuid4().hex)
+            except redis.RedisError:
+                pass
+        transaction.on_commit(set_new_token)
+
+
+content_versions = ContentVersions()
+
+
+class ConditionalGetMixin(object):
+    """
+    Answers GET requests with 304 Not Modified when the client already
+    has the current response
+
+    The ETag is computed from the token of the version returned by
+    get_version_name(), the viewer and the url and Accept header of the
+    request, before any query is run to build the response. It is only
+    attached to successful responses.
+    """
+
+    def get_version_name(self):
+        raise NotImplementedError
+
+    def get_etag(self, request):
+        token = content_versions.get(self.get_version_name())
+        if token is None:
+            return None
+        key = ':'.join([
+            token.decode('ascii'),
+            str(request.user.id),
+            request.get_full_path(),
+            request.META.get('HTTP_ACCEPT', ''),
+        ])
+        return quote_etag(hashlib.md5(force_bytes(key)).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        # If-None-Match compares weakly, e.g. after GZipMiddleware
+        client_etags = [
+            tag[2:] if tag.startswith('W/') else tag
+            for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        ]
+        if etag is not None and etag in client_etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super(ConditionalGetMixin, self).get(
+                request, *args, **kwargs)
+        if etag is not None and response.status_code in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Authorization',))
+        return response
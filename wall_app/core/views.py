@@ -1,23 +1,57 @@
+from django.http import StreamingHttpResponse
 from rest_framework import generics, permissions, status
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.cache import feed_cache
+from core.export import get_export_queryset, iter_ndjson, parse_date
 from core.models import Love, Post
-from core.pagination import StandardResultsSetPagination
-from core.serializers import PostSerializer
+from core.pagination import FeedPagination
+from core.renderers import PreEncodedJSONRenderer
+from core.serializers import (
+    BulkLoveSerializer, PostRowSerializer, PostSerializer,
+)
+from core.sync import (
+    ExpiredToken, InvalidToken, decode_token, encode_token, get_changes,
+    get_settled_position,
+)
+from core.versions import ConditionalGetMixin, ContentVersions
 
 
-class PostList(generics.ListCreateAPIView):
+class EncodedPostMixin(object):
+    """
+    Answers the creation or update of a post with the JSON encoded for
+    its broadcast, when the author sees the post as everyone else does
+    """
+    renderer_classes = (PreEncodedJSONRenderer, BrowsableAPIRenderer)
+    encoded_content = None
+
+    def set_encoded_content(self, post):
+        # the broadcast shows the post to viewers who do not love it
+        if not post.in_love:
+            self.encoded_content = post.encoded
+
+
+class PostList(ConditionalGetMixin, EncodedPostMixin,
+               generics.ListCreateAPIView):
     """Handles the creation and Listing of all Posts on the database"""
     queryset = Post.objects.all()
     serializer_class = PostSerializer
-    pagination_class = StandardResultsSetPagination
+    pagination_class = FeedPagination
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
+    def get_version_name(self):
+        return ContentVersions.WALL
+
     def get_queryset(self):
         """Returns queryset in order of date last modified by default
         However, if the query string says top posts, order posts by number
         of loves
+
+        Ties are broken by id so the ordering can be paginated by cursor.
+        The first page of top posts is picked from the leaderboard. Any
+        other q is a search, see Post.search().
         """
         search_str = self.request.query_params.get('q', '')
         limit = self.request.query_params.get('limit', 10)
@@ -27,54 +61,156 @@ class PostList(generics.ListCreateAPIView):
         if private:
             qs = Post.filter_others_post(qs, self.request.user)
         if search_str.lower() == 'top':
-            qs = Post.order_queryset_by_num_loves(qs, int(limit))
+            if self.paginator.uses_page_numbers(self.request):
+                if not private:
+                    qs = Post.filter_top_ranked(qs, int(limit))
+                qs = Post.order_queryset_by_num_loves(qs, int(limit))
+            else:
+                # keyset pages read ?limit= as their page size; one more
+                # post tells the paginator a next page exists
+                if not (private or self.paginator.uses_cursor(self.request)):
+                    qs = Post.filter_top_ranked(
+                        qs, self.paginator.get_page_size(self.request) + 1)
+                qs = Post.order_queryset_by_num_loves(qs)
+        elif search_str.strip():
+            qs = Post.search(qs, search_str)
 
         return qs
 
+    def is_search(self):
+        search_str = self.request.query_params.get('q', '')
+        return bool(search_str.strip()) and search_str.lower() != 'top'
+
+    def list(self, request, *args, **kwargs):
+        """Serves anonymous users from the shared feed cache"""
+        if 'since' in request.query_params:
+            return self.list_changes()
+        if request.user.is_authenticated:
+            return self.list_rows()
+
+        key = feed_cache.get_key(request)
+        data = feed_cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = self.list_rows()
+        feed_cache.set(key, response.data)
+        return response
+
+    def list_rows(self):
+        """Lists the posts read as rows, see PostQuerySet.as_rows()
+
+        Search results are read as posts instead: their pages are cut on
+        the search_rank annotation, which rows do not keep.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.is_search():
+            serializer_class = PostSerializer
+        else:
+            queryset = queryset.as_rows()
+            serializer_class = PostRowSerializer
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer_class(page, many=True).data)
+        return Response(serializer_class(queryset, many=True).data)
+
+    def list_changes(self):
+        """Lists the changes to the feed since the token in ?since=, see
+        core.sync
+
+        An empty token returns no changes, only the token to start syncing
+        from. Only ?private= and the page size apply to the changes.
+        """
+        since = self.request.query_params['since']
+        if not since:
+            return self.get_changes_response(
+                [], [], encode_token(get_settled_position()), False)
+        try:
+            position = decode_token(since)
+        except InvalidToken as error:
+            return Response(
+                {'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredToken as error:
+            return Response({'error': str(error)}, status=status.HTTP_410_GONE)
+
+        queryset = Post.get_queryset(self.request.user.id).as_rows()
+        author_id = None
+        if (self.request.query_params.get('private', False) and
+                self.request.user.is_authenticated):
+            author_id = self.request.user.id
+            queryset = queryset.filter(author_id=author_id)
+        return self.get_changes_response(*get_changes(
+            queryset, position, self.paginator.get_page_size(self.request),
+            author_id))
+
+    @staticmethod
+    def get_changes_response(posts, deleted, token, has_more):
+        return Response({
+            'posts': PostRowSerializer(posts, many=True).data,
+            'deleted': deleted,
+            'since': token,
+            'has_more': has_more,
+        })
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        self.set_encoded_content(post)
 
 
-class PostDetail(generics.RetrieveUpdateDestroyAPIView):
+class PostDetail(ConditionalGetMixin, EncodedPostMixin,
+                 generics.RetrieveUpdateDestroyAPIView):
     """Handles fetching, updating and deleting a single user"""
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = (permissions.IsAuthenticated,)
 
+    def get_version_name(self):
+        return ContentVersions.WALL
+
     def get_queryset(self):
-        """Returns queryset in order of date last modified by default"""
+        """Returns queryset in order of date last modified by default
+
+        Reads get the post as a row, see PostQuerySet.as_rows().
+        """
         qs = Post.get_queryset(self.request.user.id)
+        if self.request.method in ('GET', 'HEAD'):
+            qs = qs.as_rows()
         return qs
 
+    def retrieve(self, request, *args, **kwargs):
+        return Response(PostRowSerializer(self.get_object()).data)
+
+    def perform_update(self, serializer):
+        post = serializer.save()
+        self.set_encoded_content(post)
+
 
 class LoveView(APIView):
     """Handles users loving or unloving a post"""
     permission_classes = (permissions.IsAuthenticated,)
 
     def post(self, request, post_id, format=None):
-        if Post.objects.filter(id=post_id).exists():
-            Love.create_love(request.user, post_id)
-            num_loves = Love.get_num_post_loves(post_id)
+        num_loves = Love.set_love(request.user, post_id, True)
+        if num_loves is not None:
             response_payload = self._get_success_response_payload(
                 int(post_id), num_loves, True
             )
             return Response(response_payload, status=status.HTTP_201_CREATED)
         return Response(
-            self._get_failure_response_payload,
+            self._get_failure_response_payload(),
             status=status.HTTP_400_BAD_REQUEST
         )
 
     def delete(self, request, post_id, format=None):
-        if Post.objects.filter(id=post_id).exists():
-            Love.delete_love(request.user, post_id)
-            num_loves = Love.get_num_post_loves(post_id)
+        num_loves = Love.set_love(request.user, post_id, False)
+        if num_loves is not None:
             response_payload = self._get_success_response_payload(
                 int(post_id), num_loves, False
             )
             return Response(
                 response_payload, status=status.HTTP_200_OK)
         return Response(
-            self._get_failure_response_payload,
+            self._get_failure_response_payload(),
             status=status.HTTP_400_BAD_REQUEST)
 
     @staticmethod
@@ -90,3 +226,46 @@ class LoveView(APIView):
     def _get_failure_response_payload():
         """Returns failure response payload"""
         return {'error': 'Invalid Post ID'}
+
+
+class BulkLoveView(APIView):
+    """
+    Handles users loving or unloving several posts at once, e.g. to replay
+    the loves a client queued while offline
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request, format=None):
+        serializer = BulkLoveSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        items = [(item['post_id'], item['action'])
+                 for item in serializer.validated_data['items']]
+        results = Love.apply_bulk(request.user, items)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class PostExportView(APIView):
+    """
+    Streams every post of the wall as NDJSON, for admins
+
+    Accepts the author (a username), since and until (ISO 8601 datetimes
+    bounding date_modified) query parameters. The response is written as
+    the posts are read, see core.export.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, format=None):
+        try:
+            since = parse_date(request.query_params.get('since'))
+            until = parse_date(request.query_params.get('until'))
+        except ValueError as error:
+            return Response(
+                {'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = get_export_queryset(
+            request.query_params.get('author'), since, until)
+        response = StreamingHttpResponse(
+            iter_ndjson(queryset), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="posts.ndjson"'
+        return response
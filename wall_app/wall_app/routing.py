@@ -1,5 +1,9 @@
+from django.conf import settings
 from channels import route
-from core.consumers import connect_post, disconnect_post
+from accounts.consumers import send_outbox
+from core.consumers import (
+    broadcast, connect_post, disconnect_post, receive_post_stream,
+)
 
 
 """
@@ -21,6 +25,15 @@ channel_routing = [
           disconnect_post,
           path=r'^/api/v1/core/posts/stream/$'),
 
-    # Called when the client sends message on the WebSocket
-    # route('websocket.receive', save_post, path=r'^/posts/stream/$'),
+    # Called on the worker for the broadcasts queued by the models
+    route(settings.BROADCAST_CHANNEL_NAME, broadcast),
+
+    # Called on the worker to send the emails queued in the outbox
+    route(settings.OUTBOX_CHANNEL_NAME, send_outbox),
+
+    # Called when the client sends message on the WebSocket, to subscribe
+    # to the posts it shows
+    route('websocket.receive',
+          receive_post_stream,
+          path=r'^/api/v1/core/posts/stream/$'),
 ]
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'channels',
+    'channels.delay',
     'corsheaders',
     'rest_framework',
     'accounts',
@@ -150,12 +151,20 @@ STATICFILES_STORAGE = 'whitenoise.django.GzipManifestStaticFilesStorage'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_jwt.authentication.JSONWebTokenAuthentication',
+        'accounts.authentication.CachedJSONWebTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# JSON encoder of the API and websocket frames: 'json', 'simplejson' or
+# 'auto' for simplejson when it is installed, see core.encoders
+JSON_ENCODER = config('JSON_ENCODER', default='auto')
+
 # settings for JWT
 JWT_AUTH = {
     'JWT_ALLOW_REFRESH': True,
@@ -193,13 +202,87 @@ if config('ENV') == 'production':
 elif config('ENV') == 'development':
     FRONTEND_URL = 'http://localhost:3000'
 
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379')
+
+# Cache settings
+# The feed cache is local to each process by default; point
+# FEED_CACHE_BACKEND at core.cache.RedisCache and FEED_CACHE_LOCATION at
+# REDIS_URL to share it between processes. The user cache is shared in
+# Redis by default, so a change invalidated by one process is not served
+# from a stale copy by another.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'feed': {
+        'BACKEND': config(
+            'FEED_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('FEED_CACHE_LOCATION', default='feed'),
+        'TIMEOUT': config('FEED_CACHE_TIMEOUT', default=60, cast=int),
+        'KEY_PREFIX': 'wall_app',
+    },
+    'users': {
+        'BACKEND': config(
+            'USER_CACHE_BACKEND', default='core.cache.RedisCache'),
+        'LOCATION': config('USER_CACHE_LOCATION', default=REDIS_URL),
+        'TIMEOUT': config('USER_CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_PREFIX': 'wall_app:users',
+    },
+}
+FEED_CACHE_ALIAS = 'feed'
+# users authenticated by JWT, with their profile, see accounts.authentication
+USER_CACHE_ALIAS = 'users'
+
+# Redis sorted set ranking posts for ?q=top, see core.leaderboard
+LEADERBOARD_KEY = config('LEADERBOARD_KEY', default='leaderboard:posts')
+
+# the most loves and unloves POST /posts/loves/ applies at once
+BULK_LOVE_MAX_ITEMS = 100
+
+# Syncs of the feed with ?since=, see core.sync. Tombstones of deleted
+# posts are pruned after SYNC_TOMBSTONE_RETENTION_DAYS, older tokens are
+# refused; caught up tokens trail the present by SYNC_SETTLE_SECONDS.
+SYNC_TOMBSTONE_RETENTION_DAYS = config(
+    'SYNC_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+SYNC_SETTLE_SECONDS = 2
+
+# Outbox of the emails sent by the app, see accounts.mail. Set
+# EMAIL_TRANSPORT to accounts.mail.LocmemTransport to keep emails local.
+EMAIL_TRANSPORT = config(
+    'EMAIL_TRANSPORT', default='accounts.mail.SendGridTransport')
+OUTBOX_CHANNEL_NAME = 'accounts.outbox'
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_MAX_ATTEMPTS = 6
+# seconds before the first retry, doubled on every further attempt
+OUTBOX_RETRY_DELAY = 30
+# seconds an email claimed by a worker is hidden from the others
+OUTBOX_LEASE = 300
+
 # settings for the Channel package
 GLOBAL_CHANNEL_NAME = 'global'
+# the most posts a websocket client may follow the updates of
+POST_STREAM_MAX_SUBSCRIPTIONS = 200
+# channel the worker reads the broadcasts queued by the models from
+BROADCAST_CHANNEL_NAME = 'core.broadcast'
+# love_update events of a post within this many milliseconds are sent as
+# one frame; 0 sends a frame per event
+LOVE_UPDATE_COALESCE_MS = config(
+    'LOVE_UPDATE_COALESCE_MS', default=150, cast=int)
+# prefix of the Redis keys of the coalesced love_update events
+LOVE_UPDATE_KEY_PREFIX = config(
+    'LOVE_UPDATE_KEY_PREFIX', default='love_updates')
+# Redis sorted set of the last frames sent on the post stream, replayed
+# to clients reconnecting with ?after=<seq>, see core.eventlog
+EVENT_LOG_KEY = config('EVENT_LOG_KEY', default='events:posts')
+EVENT_LOG_SIZE = config('EVENT_LOG_SIZE', default=1000, cast=int)
+# the most logged frames sent in one replay frame
+EVENT_REPLAY_CHUNK_SIZE = 100
 CHANNEL_LAYERS = {
     'default': {
         'BACKEND': 'asgi_redis.RedisChannelLayer',
         'CONFIG': {
-            'hosts': [os.environ.get('REDIS_URL', 'redis://localhost:6379')],
+            'hosts': [REDIS_URL],
         },
         'ROUTING': 'wall_app.routing.channel_routing',
     }